@@ -1,14 +1,28 @@
-from flask import Flask, g, request
+from flask import Flask, g, request, jsonify
 from flask_cors import CORS
 import logging
+import random
+import time
 
-from lib.db import Db
+from lib.db import Db, READ_METHODS
+from lib.review_queue import ReviewQueue
+from lib.response_cache import ResponseCache
+from lib.metrics import Metrics
+from lib.profiler import QueryProfiler
+from lib.json_provider import FastJSONProvider
+from lib.snapshot import Snapshot
+from lib.shards import LEARNER_ID
+import lib.activity
 
 import routes.words
 import routes.groups
 import routes.study_sessions
 import routes.dashboard
 import routes.study_activities
+import routes.system
+import routes.export
+import routes.batch
+from routes.batch import BATCH_ENVIRON_KEY
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -33,18 +47,89 @@ def get_allowed_origins(app):
     except:
         return ["*"]  # Fallback to allow all origins if there's an error
 
+# The app's settings: defaults, FLASK_<KEY> environment variables, then
+# test_config. Tasks (tasks.py) load them too, so they run with the API's
+# settings.
+def load_config(app, test_config=None):
+    app.config.from_mapping(
+        DATABASE='words.db',
+        DB_READ_POOL_SIZE=8,
+        DB_WRITE_POOL_SIZE=1,
+        # Write-behind review logging (opt-in): reviews are acknowledged before
+        # they are committed and written by a background thread in group commits
+        REVIEW_WRITE_BEHIND=False,
+        REVIEW_QUEUE_SIZE=10000,
+        REVIEW_BATCH_SIZE=500,
+        REVIEW_FLUSH_INTERVAL_MS=50,
+        REVIEW_SYNCHRONOUS='NORMAL',
+        # Timezone (IANA name) used to bucket study activity into days
+        ACTIVITY_TIMEZONE='UTC',
+        # Archive database of old review items, see `invoke archive-reviews`
+        REVIEW_ARCHIVE_DATABASE='words-archive.db',
+        # Byte budget of the in-process cache of read responses, 0 disables it
+        RESPONSE_CACHE_BYTES=32 * 1024 * 1024,
+        # Fraction of requests whose headers are logged at DEBUG level, 0 disables it
+        LOG_REQUEST_HEADERS_SAMPLE_RATE=0.0,
+        # Development query profiler: X-Query-Count/X-Query-Time headers, a slow
+        # query log with query plans and /api/query-profile
+        QUERY_PROFILE=False,
+        QUERY_SLOW_MS=100,
+        # aiosqlite connections of the ASGI app (asgi.py)
+        ASYNC_DB_POOL_SIZE=16,
+        # Read-only snapshot for stale-ok routes (opt-in), refreshed every
+        # SNAPSHOT_INTERVAL_SECONDS or after SNAPSHOT_EVERY_WRITES write requests
+        SNAPSHOT_READS=False,
+        SNAPSHOT_DATABASE='words-snapshot.db',
+        SNAPSHOT_INTERVAL_SECONDS=30,
+        SNAPSHOT_EVERY_WRITES=1000,
+        SNAPSHOT_POOL_SIZE=8,
+        # Directory of per learner databases, requests with an X-Learner-Id
+        # header use their learner's shard when set (see lib/shards.py)
+        SHARD_DIRECTORY=None
+    )
+    # FLASK_<KEY> environment variables override the defaults, e.g. FLASK_DATABASE
+    app.config.from_prefixed_env()
+    if test_config is not None:
+        app.config.update(test_config)
+
 def create_app(test_config=None):
     app = Flask(__name__)
-    
-    if test_config is None:
-        app.config.from_mapping(
-            DATABASE='words.db'
-        )
-    else:
-        app.config.update(test_config)
+    app.json = FastJSONProvider(app)
+    load_config(app, test_config)
     
     # Initialize database first since we need it for CORS configuration
-    app.db = Db(database=app.config['DATABASE'])
+    app.db = Db(
+        database=app.config['DATABASE'],
+        read_pool_size=app.config['DB_READ_POOL_SIZE'],
+        write_pool_size=app.config['DB_WRITE_POOL_SIZE'],
+        profiler=QueryProfiler(slow_ms=app.config['QUERY_SLOW_MS']) if app.config['QUERY_PROFILE'] else None,
+        shard_directory=app.config['SHARD_DIRECTORY']
+    )
+    
+    lib.activity.configure(app.config['ACTIVITY_TIMEZONE'])
+
+    app.response_cache = None
+    if app.config['RESPONSE_CACHE_BYTES']:
+        app.response_cache = ResponseCache(max_bytes=app.config['RESPONSE_CACHE_BYTES'])
+
+    if app.config['SNAPSHOT_READS']:
+        app.db.snapshot = Snapshot(
+            app.db,
+            app.config['SNAPSHOT_DATABASE'],
+            interval=app.config['SNAPSHOT_INTERVAL_SECONDS'],
+            every_writes=app.config['SNAPSHOT_EVERY_WRITES'],
+            pool_size=app.config['SNAPSHOT_POOL_SIZE']
+        ).start()
+
+    app.review_queue = None
+    if app.config['REVIEW_WRITE_BEHIND']:
+        app.review_queue = ReviewQueue(
+            app.db,
+            max_size=app.config['REVIEW_QUEUE_SIZE'],
+            batch_size=app.config['REVIEW_BATCH_SIZE'],
+            flush_interval=app.config['REVIEW_FLUSH_INTERVAL_MS'] / 1000,
+            synchronous=app.config['REVIEW_SYNCHRONOUS']
+        ).start()
     
     # Get allowed origins from study_activities table
     allowed_origins = get_allowed_origins(app)
@@ -63,17 +148,64 @@ def create_app(test_config=None):
         r"/*": {
             "origins": allowed_origins,
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization", "Accept", "Origin", "Referer"],
+            "allow_headers": ["Content-Type", "Authorization", "Accept", "Origin", "Referer", "X-Learner-Id"],
             "supports_credentials": True
         }
     })
 
+    # Per endpoint request metrics, served at /metrics
+    app.metrics = Metrics()
+    header_sample_rate = app.config['LOG_REQUEST_HEADERS_SAMPLE_RATE']
+
     @app.before_request
-    def log_request_info():
-        logger.debug('Headers: %s', dict(request.headers))
-        logger.debug('Origin: %s', request.headers.get('Origin'))
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        app.metrics.request_started()
+        if header_sample_rate and random.random() < header_sample_rate:
+            logger.debug('Headers: %s', dict(request.headers))
+            logger.debug('Origin: %s', request.headers.get('Origin'))
+        if app.db.shard_directory:
+            learner_id = request.headers.get('X-Learner-Id')
+            if learner_id is not None:
+                if not LEARNER_ID.match(learner_id):
+                    return jsonify({"error": "X-Learner-Id must be 1-64 letters, digits, '-' or '_'"}), 400
+                g.learner_id = learner_id
+
+    @app.after_request
+    def record_response(response):
+        g.response_status = response.status_code
+        g.response_size = response.calculate_content_length()
+        if app.db.profiler is not None:
+            count, seconds = app.db.profiler.request_totals()
+            response.headers['X-Query-Count'] = str(count)
+            response.headers['X-Query-Time'] = f'{seconds * 1000:.2f}ms'
+        if app.db.snapshot is not None:
+            if g.get('db_pool') == 'snapshot':
+                # How old the data may be, in seconds
+                response.headers['X-Snapshot-Age'] = f'{app.db.snapshot.age():.1f}'
+            elif request.method not in READ_METHODS and response.status_code < 400 and request.endpoint != 'batch':
+                # POST /batch only runs reads
+                app.db.snapshot.note_write()
+        return response
 
-    # Close database connection
+    # Runs for failed requests too, after_request is skipped on unhandled errors
+    @app.teardown_request
+    def record_request_metrics(exception):
+        # Sub-requests of POST /batch share its g, the batch is measured as a whole
+        if request.environ.get(BATCH_ENVIRON_KEY):
+            return
+        started = g.pop('request_started', None)
+        if started is None:
+            return
+        app.metrics.request_finished(
+            request.url_rule.endpoint if request.url_rule else 'unmatched',
+            request.method,
+            g.get('response_status', 500),
+            time.perf_counter() - started,
+            g.get('response_size')
+        )
+
+    # Return the request's connection to the pool
     @app.teardown_appcontext
     def close_db(exception):
         app.db.close()
@@ -84,10 +216,14 @@ def create_app(test_config=None):
     routes.study_sessions.load(app)
     routes.dashboard.load(app)
     routes.study_activities.load(app)
+    routes.system.load(app)
+    routes.export.load(app)
+    routes.batch.load(app)
     
     return app
 
-app = create_app()
-
+# Built on demand only, importing this module (asgi.py, benchmarks, tests)
+# must not start a second app with its own background threads
 if __name__ == '__main__':
+    app = create_app()
     app.run(debug=True, port=5001)
\ No newline at end of file
@@ -0,0 +1,12 @@
+# ASGI serving mode: uvicorn asgi:app --port 5001
+#
+# Only the two hottest read routes run on the event loop, natively from an
+# aiosqlite connection pool. Every other route (including all writes) is the
+# regular Flask app from app.py on sqlite3, run on the loop's thread pool
+# through asgiref's WSGI adapter, so the full route set from routes/*.py is
+# available. See lib/asgi.py.
+from app import create_app
+from lib.asgi import AsgiApp
+
+flask_app = create_app()
+app = AsgiApp(flask_app)
@@ -0,0 +1,78 @@
+# Compare the sync Flask app (threaded server) with the ASGI app (asgi.py under
+# uvicorn) at several concurrency levels, on the routes the ASGI app serves
+# natively, on routes it hands to Flask, and on a mix of both.
+#
+#   python bench/asgi_vs_wsgi.py --database words.db --group 1 --session 1
+#
+# Needs requirements-asgi.txt installed and a study session in the database.
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from http_client import request, summarize, start_server, flask_server
+
+async def load(port, paths, clients, duration):
+  samples = []
+  deadline = time.monotonic() + duration
+
+  async def client(index):
+    position = index
+    while time.monotonic() < deadline:
+      path = paths[position % len(paths)]
+      position += 1
+      started = time.perf_counter()
+      try:
+        status, _ = await request('127.0.0.1', port, 'GET', path)
+        ok = status < 400
+      except (OSError, asyncio.TimeoutError):
+        ok = False
+      samples.append((time.perf_counter() - started, ok))
+
+  started = time.perf_counter()
+  await asyncio.gather(*(client(index) for index in range(clients)))
+  return summarize(samples, time.perf_counter() - started)
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--database', default='words.db')
+  parser.add_argument('--group', type=int, default=1)
+  parser.add_argument('--session', type=int, default=1)
+  parser.add_argument('--clients', default='10,100,500')
+  parser.add_argument('--duration', type=float, default=10)
+  parser.add_argument('--port', type=int, default=5055)
+  parser.add_argument('--output', help='write the results as JSON to this file')
+  args = parser.parse_args()
+
+  native = [f'/api/groups/{args.group}/words/raw', f'/study_sessions/{args.session}/next-words?n=20']
+  fallback = ['/groups', f'/groups/{args.group}/words?page=1', '/dashboard/stats', '/words?page=1']
+  mixes = {'native': native, 'fallback': fallback, 'mixed': native + fallback}
+  env = {'FLASK_DATABASE': json.dumps(os.path.abspath(args.database)), 'FLASK_RESPONSE_CACHE_BYTES': '0'}
+  servers = {
+    'sync': flask_server(args.port),
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(args.port), '--log-level', 'warning']
+  }
+
+  results = {}
+  for name, command in servers.items():
+    process = start_server(command, args.port, env)
+    try:
+      for mix, paths in mixes.items():
+        for clients in (int(value) for value in args.clients.split(',')):
+          result = asyncio.run(load(args.port, paths, clients, args.duration))
+          results.setdefault(name, {}).setdefault(mix, {})[clients] = result
+          print(f'{name:<5} {mix:<8} {clients:>4} clients  {result["rps"]:>8.1f} req/s  p99 {result["p99_ms"]:>8.1f} ms  errors {result["errors"]}')
+    finally:
+      process.terminate()
+      process.wait()
+
+  if args.output:
+    with open(args.output, 'w') as file:
+      json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+  main()
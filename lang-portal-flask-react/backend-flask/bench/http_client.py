@@ -0,0 +1,93 @@
+# Minimal asyncio HTTP/1.1 client and latency statistics for the benchmarks,
+# so they need nothing beyond the standard library.
+import asyncio
+import json
+import math
+import subprocess
+import sys
+import time
+import os
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One request on a fresh connection, returns (status, body)
+async def request(host, port, method, path, payload=None, timeout=30):
+  body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+  head = [
+    f'{method} {path} HTTP/1.1',
+    f'Host: {host}:{port}',
+    'Connection: close',
+    'Accept: application/json',
+    f'Content-Length: {len(body)}'
+  ]
+  if payload is not None:
+    head.append('Content-Type: application/json')
+
+  async def exchange():
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+      writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+      await writer.drain()
+      response = await reader.read()
+    finally:
+      writer.close()
+    header, _, content = response.partition(b'\r\n\r\n')
+    status = int(header.split(b' ', 2)[1])
+    if b'transfer-encoding: chunked' in header.lower():
+      content = dechunk(content)
+    return status, content
+
+  return await asyncio.wait_for(exchange(), timeout)
+
+def dechunk(data):
+  body = b''
+  while data:
+    size_line, _, data = data.partition(b'\r\n')
+    size = int(size_line.split(b';')[0], 16)
+    if size == 0:
+      break
+    body += data[:size]
+    data = data[size + 2:]
+  return body
+
+def percentile(values, fraction):
+  if not values:
+    return None
+  values = sorted(values)
+  return values[min(len(values) - 1, math.ceil(fraction * len(values)) - 1)]
+
+# {requests, errors, error_rate, rps, p50_ms, p95_ms, p99_ms} of a list of
+# (seconds, ok) samples collected over `elapsed` seconds
+def summarize(samples, elapsed):
+  latencies = [seconds for seconds, _ in samples]
+  errors = sum(1 for _, ok in samples if not ok)
+  return {
+    "requests": len(samples),
+    "errors": errors,
+    "error_rate": errors / len(samples) if samples else 0,
+    "rps": len(samples) / elapsed if elapsed else 0,
+    "p50_ms": round(percentile(latencies, 0.50) * 1000, 3) if samples else None,
+    "p95_ms": round(percentile(latencies, 0.95) * 1000, 3) if samples else None,
+    "p99_ms": round(percentile(latencies, 0.99) * 1000, 3) if samples else None
+  }
+
+# Start a server process from the backend directory and wait for its port
+def start_server(command, port, env=None, timeout=30):
+  process = subprocess.Popen(
+    command, cwd=BACKEND_DIR, env={**os.environ, **(env or {})},
+    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+  )
+  deadline = time.monotonic() + timeout
+  while time.monotonic() < deadline:
+    if process.poll() is not None:
+      raise RuntimeError(f'{" ".join(command)} exited with {process.returncode}')
+    try:
+      asyncio.run(request('127.0.0.1', port, 'GET', '/metrics', timeout=1))
+      return process
+    except (OSError, asyncio.TimeoutError):
+      time.sleep(0.2)
+  process.terminate()
+  raise RuntimeError(f'{" ".join(command)} did not start listening on port {port}')
+
+def flask_server(port):
+  return [sys.executable, '-c', f'from app import create_app; create_app().run(port={port}, threaded=True)']
@@ -0,0 +1,82 @@
+# Compare bytes/sec of /api/groups/<id>/words/raw with pre-encoded word
+# payloads against the previous parse + jsonify path, with Flask's default
+# JSON provider and with the app's one. Every variant is a route requested
+# through the same test client, so they pay the same request overhead.
+#
+#   python bench/json_encoding.py --database words.db --group 1 --rounds 50
+#
+# Import a large deck first (invoke import-words) for meaningful numbers.
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import jsonify
+from flask.json.provider import DefaultJSONProvider
+from app import create_app
+from lib.conditional import conditional
+from lib.json_provider import orjson
+
+def measure(label, rounds, render):
+  size = len(render())  # warm up
+  started = time.perf_counter()
+  for _ in range(rounds):
+    render()
+  seconds = time.perf_counter() - started
+  print(f'{label:<40} {size:>10} bytes  {rounds / seconds:>8.1f} req/s  {size * rounds / seconds / 1e6:>8.1f} MB/s')
+  return size * rounds / seconds
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--database', default='words.db')
+  parser.add_argument('--group', type=int, default=1)
+  parser.add_argument('--rounds', type=int, default=50)
+  args = parser.parse_args()
+
+  app = create_app({'DATABASE': args.database, 'RESPONSE_CACHE_BYTES': 0})
+  fast_provider = app.json
+  default_provider = DefaultJSONProvider(app)
+
+  # The previous implementation: parse every row's parts and jsonify the result
+  @app.route('/bench/groups/<int:id>/words/legacy', methods=['GET'])
+  @conditional('groups', 'word_groups', 'words')
+  def legacy(id):
+    cursor = app.db.cursor()
+    cursor.execute('SELECT name FROM groups WHERE id = ?', (id,))
+    group = cursor.fetchone()
+    cursor.execute('''
+      SELECT w.* FROM word_groups wg JOIN words w ON w.id = wg.word_id WHERE wg.group_id = ?
+    ''', (id,))
+    return jsonify({"group_id": id, "group_name": group["name"], "words": [
+      {
+        "id": row["id"],
+        "kanji": row["kanji"],
+        "romaji": row["romaji"],
+        "english": row["english"],
+        "parts": json.loads(row["parts"])
+      }
+      for row in cursor.fetchall()
+    ]})
+
+  client = app.test_client()
+
+  def get(path, provider=fast_provider):
+    def render():
+      app.json = provider
+      response = client.get(path)
+      assert response.status_code == 200, response.get_data(as_text=True)
+      return response.get_data()
+    return render
+
+  print(f'orjson {"available" if orjson is not None else "not installed, stdlib fallback"}')
+  legacy_path = f'/bench/groups/{args.group}/words/legacy'
+  before = measure('parse + default jsonify', args.rounds, get(legacy_path, default_provider))
+  measure('parse + FastJSONProvider', args.rounds, get(legacy_path))
+  after = measure('pre-encoded splice (route)', args.rounds, get(f'/api/groups/{args.group}/words/raw'))
+  print(f'speedup {after / before:.1f}x')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,174 @@
+# Reproducible load test of the portal API. Boots the Flask app on a freshly
+# seeded database, runs `--users` concurrent virtual learners through a fixed
+# number of iterations of a typical visit and reports requests/sec, error
+# rate and p50/p95/p99 latency per route.
+#
+#   python bench/loadtest.py --users 20 --iterations 10 --output results.json
+#   python bench/loadtest.py --compare results.json   # against an earlier run
+#
+# One visit: list words, open a group and its words, start a study session,
+# log a burst of reviews, then load the dashboard.
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from http_client import BACKEND_DIR, request, summarize, start_server, flask_server
+
+class VirtualUser:
+  def __init__(self, port, rng, samples, burst):
+    self.port = port
+    self.rng = rng
+    self.samples = samples
+    self.burst = burst
+
+  # Time one request under `route` (the route template), returns the parsed body or None
+  async def call(self, route, method, path, payload=None):
+    started = time.perf_counter()
+    try:
+      status, body = await request('127.0.0.1', self.port, method, path, payload)
+      ok = status < 400
+    except (OSError, asyncio.TimeoutError, ValueError):
+      status, body, ok = None, b'', False
+    self.samples.setdefault(route, []).append((time.perf_counter() - started, ok))
+    if not ok:
+      return None
+    try:
+      return json.loads(body)
+    except ValueError:
+      return None
+
+  async def visit(self, groups):
+    await self.call('GET /words', 'GET', f'/words?page={self.rng.randint(1, 3)}')
+
+    group_id = self.rng.choice(groups)
+    await self.call('GET /groups/<id>', 'GET', f'/groups/{group_id}')
+    words = await self.call('GET /groups/<id>/words', 'GET', f'/groups/{group_id}/words')
+
+    session = await self.call('POST /study_sessions', 'POST', '/study_sessions', {
+      "group_id": group_id,
+      "study_activity_id": 1
+    })
+    if session and words and words.get('words'):
+      word_ids = [word['id'] for word in words['words']]
+      for _ in range(self.burst):
+        await self.call('POST /study_sessions/<id>/review', 'POST', f'/study_sessions/{session["session_id"]}/review', {
+          "word_id": self.rng.choice(word_ids),
+          "correct": self.rng.random() < 0.7
+        })
+
+    await self.call('GET /dashboard/stats', 'GET', '/dashboard/stats')
+    await self.call('GET /dashboard/recent-session', 'GET', '/dashboard/recent-session')
+
+async def run(port, users, iterations, burst, seed):
+  samples = {}
+  status, body = await request('127.0.0.1', port, 'GET', '/groups')
+  groups = [group['id'] for group in json.loads(body)['groups']]
+
+  async def user(index):
+    virtual_user = VirtualUser(port, random.Random(seed + index), samples, burst)
+    for _ in range(iterations):
+      await virtual_user.visit(groups)
+
+  started = time.perf_counter()
+  await asyncio.gather(*(user(index) for index in range(users)))
+  elapsed = time.perf_counter() - started
+
+  every = [sample for route_samples in samples.values() for sample in route_samples]
+  return {
+    "seconds": elapsed,
+    "total": summarize(every, elapsed),
+    "routes": {route: summarize(route_samples, elapsed) for route, route_samples in sorted(samples.items())}
+  }
+
+# Seeded database in `directory`, or a copy of `source` so it is never modified
+def prepare_database(directory, source=None):
+  path = os.path.join(directory, 'words.db')
+  if source:
+    shutil.copyfile(source, path)
+    return path
+  sys.path.insert(0, BACKEND_DIR)
+  os.chdir(BACKEND_DIR)  # Db.init reads sql/ and seed/ relative to the backend
+  from flask import Flask
+  from lib.db import Db
+  db = Db(database=path)
+  db.init(Flask(__name__))
+  db.dispose()
+  return path
+
+def git_commit():
+  try:
+    return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=BACKEND_DIR, text=True).strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+def print_results(results, baseline=None):
+  baseline_routes = (baseline or {}).get('routes', {})
+  print(f'{"route":<36} {"requests":>8} {"err%":>6} {"rps":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+  for route, stats in [*results['routes'].items(), ('total', results['total'])]:
+    line = (
+      f'{route:<36} {stats["requests"]:>8} {stats["error_rate"] * 100:>6.1f} {stats["rps"]:>8.1f} '
+      f'{stats["p50_ms"]:>8.2f} {stats["p95_ms"]:>8.2f} {stats["p99_ms"]:>8.2f}'
+    )
+    before = baseline['total'] if route == 'total' and baseline else baseline_routes.get(route)
+    if before and before.get('p99_ms'):
+      line += f'  p99 {(stats["p99_ms"] / before["p99_ms"] - 1) * 100:+.0f}%  rps {(stats["rps"] / before["rps"] - 1) * 100:+.0f}%'
+    print(line)
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--users', type=int, default=20)
+  parser.add_argument('--iterations', type=int, default=10, help='visits per user')
+  parser.add_argument('--burst', type=int, default=10, help='reviews logged per session')
+  parser.add_argument('--seed', type=int, default=1)
+  parser.add_argument('--port', type=int, default=5056)
+  parser.add_argument('--database', help='copy this database instead of seeding a fresh one')
+  parser.add_argument('--write-behind', action='store_true', help='run with REVIEW_WRITE_BEHIND')
+  parser.add_argument('--output', help='write the results as JSON to this file')
+  parser.add_argument('--compare', help='results JSON of an earlier run to compare against')
+  args = parser.parse_args()
+
+  directory = tempfile.mkdtemp(prefix='loadtest-')
+  try:
+    database = prepare_database(directory, args.database)
+    env = {
+      'FLASK_DATABASE': json.dumps(database),
+      'FLASK_REVIEW_WRITE_BEHIND': json.dumps(args.write_behind)
+    }
+    process = start_server(flask_server(args.port), args.port, env)
+    try:
+      results = asyncio.run(run(args.port, args.users, args.iterations, args.burst, args.seed))
+    finally:
+      process.terminate()
+      process.wait()
+  finally:
+    shutil.rmtree(directory, ignore_errors=True)
+
+  results = {
+    "commit": git_commit(),
+    "created_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    "config": {key: getattr(args, key) for key in ('users', 'iterations', 'burst', 'seed', 'write_behind')},
+    **results
+  }
+
+  baseline = None
+  if args.compare:
+    with open(args.compare) as file:
+      baseline = json.load(file)
+  print_results(results, baseline)
+
+  if args.output:
+    with open(args.output, 'w') as file:
+      json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,137 @@
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+# Timezone used to bucket activity into days, set from ACTIVITY_TIMEZONE by configure()
+activity_timezone = timezone.utc
+
+# Longest range /dashboard/calendar will return
+MAX_CALENDAR_DAYS = 1000
+
+def configure(timezone_name):
+  global activity_timezone
+  activity_timezone = ZoneInfo(timezone_name)
+
+def today():
+  return datetime.now(activity_timezone).date()
+
+# Day bucket of a stored timestamp. Review items are stored in UTC
+# (CURRENT_TIMESTAMP), study sessions in server local time (datetime.now()).
+def day_of(timestamp, utc=True):
+  if timestamp is None:
+    return today().isoformat()
+  if isinstance(timestamp, str):
+    timestamp = datetime.fromisoformat(timestamp)
+  if timestamp.tzinfo is None:
+    timestamp = timestamp.replace(tzinfo=timezone.utc) if utc else timestamp.astimezone()
+  return timestamp.astimezone(activity_timezone).date().isoformat()
+
+UPSERT_DAILY_ACTIVITY = '''
+  INSERT INTO daily_activity (day, sessions, reviews, correct) VALUES (?, ?, ?, ?)
+  ON CONFLICT(day) DO UPDATE SET
+    sessions = sessions + excluded.sessions,
+    reviews = reviews + excluded.reviews,
+    correct = correct + excluded.correct
+'''
+
+def record_session(cursor, created_at=None):
+  cursor.execute(UPSERT_DAILY_ACTIVITY, (day_of(created_at, utc=False), 1, 0, 0))
+
+# Fold (word_id, correct, created_at) reviews into their days
+def record_review_activity(cursor, reviews):
+  days = {}
+  for _, correct, created_at in reviews:
+    day = day_of(created_at)
+    count, correct_count = days.get(day, (0, 0))
+    days[day] = (count + 1, correct_count + (1 if correct else 0))
+  cursor.executemany(UPSERT_DAILY_ACTIVITY, [
+    (day, 0, count, correct_count) for day, (count, correct_count) in days.items()
+  ])
+
+def reset_activity(cursor):
+  cursor.execute('DELETE FROM daily_activity')
+
+# Consecutive days with at least one study session, ending today, or
+# yesterday when nothing has been studied yet today. Walks the primary key
+# backwards and stops at the first gap, so it reads streak + 1 rows.
+def current_streak(cursor):
+  expected = today()
+  cursor.execute('''
+    SELECT day FROM daily_activity
+    WHERE day <= ? AND sessions > 0
+    ORDER BY day DESC
+  ''', (expected.isoformat(),))
+  streak = 0
+  for row in cursor:
+    day = datetime.strptime(row[0], '%Y-%m-%d').date()
+    if streak == 0 and day == expected - timedelta(days=1):
+      expected = day
+    if day != expected:
+      break
+    streak += 1
+    expected -= timedelta(days=1)
+  return streak
+
+# One entry per day for the last `days` days (oldest first), zero filled
+def calendar(cursor, days):
+  end = today()
+  start = end - timedelta(days=days - 1)
+  cursor.execute('''
+    SELECT day, sessions, reviews, correct FROM daily_activity
+    WHERE day BETWEEN ? AND ?
+  ''', (start.isoformat(), end.isoformat()))
+  rows = {row['day']: row for row in cursor.fetchall()}
+
+  entries = []
+  for offset in range(days):
+    day = (start + timedelta(days=offset)).isoformat()
+    row = rows.get(day)
+    entries.append({
+      "date": day,
+      "sessions": row["sessions"] if row else 0,
+      "reviews": row["reviews"] if row else 0,
+      "correct": row["correct"] if row else 0
+    })
+  return {
+    "start": start.isoformat(),
+    "end": end.isoformat(),
+    "timezone": str(activity_timezone),
+    "days": entries
+  }
+
+# Recompute daily_activity from raw history in the configured timezone.
+# Returns the differences from what was stored, replaces it unless `check`.
+def rebuild_daily_activity(cursor, check=False):
+  expected = {}
+  def add(day, sessions, reviews, correct):
+    current = expected.get(day, (0, 0, 0))
+    expected[day] = (current[0] + sessions, current[1] + reviews, current[2] + correct)
+
+  cursor.execute('SELECT created_at FROM study_sessions')
+  for row in cursor.fetchall():
+    add(day_of(row[0], utc=False), 1, 0, 0)
+  cursor.execute('''
+    SELECT wri.created_at, wri.correct
+    FROM word_review_items wri
+    JOIN study_sessions ss ON wri.study_session_id = ss.id
+  ''')
+  for row in cursor.fetchall():
+    add(day_of(row[0]), 0, 1, 1 if row[1] else 0)
+  # Archived reviews keep the day they were bucketed into when archived
+  cursor.execute('SELECT day, SUM(attempts), SUM(correct) FROM word_review_daily GROUP BY day')
+  for row in cursor.fetchall():
+    add(row[0], 0, row[1], row[2])
+
+  cursor.execute('SELECT day, sessions, reviews, correct FROM daily_activity')
+  stored = {row[0]: (row[1], row[2], row[3]) for row in cursor.fetchall()}
+
+  drift = []
+  for day in sorted(set(expected) | set(stored)):
+    if stored.get(day) != expected.get(day):
+      drift.append(f'daily_activity[{day}]: stored {stored.get(day)}, expected {expected.get(day)}')
+
+  if not check:
+    reset_activity(cursor)
+    cursor.executemany('INSERT INTO daily_activity (day, sessions, reviews, correct) VALUES (?, ?, ?, ?)', [
+      (day, *counts) for day, counts in expected.items()
+    ])
+  return drift
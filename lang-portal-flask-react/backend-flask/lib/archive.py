@@ -0,0 +1,131 @@
+import os
+import time
+
+from lib.activity import day_of
+
+# Retention for word_review_items. Review items of sessions idle for longer
+# than the horizon move to an ATTACHed archive database. They leave per
+# (word, day) aggregates behind in word_review_daily, so word_stats,
+# learning_stats and daily_activity still rebuild from the hot database
+# alone, which stays small enough for the page cache. Raw history is only
+# read from the archive when a query asks for it, see review_items_source().
+
+ARCHIVE_SCHEMA = 'archive'
+
+# Sessions moved per transaction, keeps each hold on the write lock short
+ARCHIVE_BATCH_SESSIONS = 500
+
+REVIEW_ITEM_COLUMNS = 'id, word_id, study_session_id, correct, created_at'
+
+def is_attached(connection):
+  return any(row[1] == ARCHIVE_SCHEMA for row in connection.execute('PRAGMA database_list'))
+
+# Attach the archive database at `path` to `connection` unless it already is.
+# Read-only connections only attach an existing archive; write connections
+# create it. ATTACH is not allowed inside a transaction, so call this before
+# the first write. Returns whether the archive is attached.
+def attach(connection, path):
+  if is_attached(connection):
+    return True
+  if not path:
+    return False
+  readonly = connection.execute('PRAGMA query_only').fetchone()[0]
+  if readonly and not os.path.exists(path):
+    return False
+  connection.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (path,))
+  if not readonly:
+    connection.execute(f'''
+      CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.word_review_items (
+        id INTEGER PRIMARY KEY,
+        word_id INTEGER NOT NULL,
+        study_session_id INTEGER NOT NULL,
+        correct BOOLEAN NOT NULL,
+        created_at DATETIME
+      )
+    ''')
+    connection.execute(f'''
+      CREATE INDEX IF NOT EXISTS {ARCHIVE_SCHEMA}.idx_word_review_items_study_session_id
+      ON word_review_items(study_session_id)
+    ''')
+  return True
+
+# Table expression to select review items from: the hot table, or with
+# `include_archive` its UNION with the archive when one is attached. Ids
+# never overlap, so UNION ALL is enough; filters on the outer query are
+# pushed down into both sides.
+def review_items_source(connection, path, include_archive=False):
+  if not include_archive or not attach(connection, path):
+    return 'word_review_items'
+  return f'''(
+    SELECT {REVIEW_ITEM_COLUMNS} FROM main.word_review_items
+    UNION ALL
+    SELECT {REVIEW_ITEM_COLUMNS} FROM {ARCHIVE_SCHEMA}.word_review_items
+  )'''
+
+# Move the review items of sessions whose last review is before `before`
+# (naive UTC datetime) to the archive at `path`, a batch of sessions per
+# transaction. Items are copied with INSERT OR IGNORE, so a batch that was
+# copied but not deleted (the two databases do not commit atomically in WAL
+# mode) is simply moved again by the next run.
+def archive_reviews(connection, path, before, batch_size=ARCHIVE_BATCH_SESSIONS):
+  started = time.perf_counter()
+  attach(connection, path)
+  # Bucket days like lib.activity does for daily_activity
+  connection.create_function('activity_day', 1, day_of, deterministic=True)
+  cutoff = before.strftime('%Y-%m-%d %H:%M:%S')
+
+  sessions = reviews = 0
+  after = ('', 0)
+  cursor = connection.cursor()
+  while True:
+    cursor.execute('''
+      SELECT id, last_activity_at FROM study_sessions
+      WHERE last_activity_at < ? AND (last_activity_at, id) > (?, ?) AND archived_at IS NULL
+      ORDER BY last_activity_at, id
+      LIMIT ?
+    ''', (cutoff, *after, batch_size))
+    rows = cursor.fetchall()
+    if not rows:
+      break
+    after = (rows[-1][1], rows[-1][0])
+    ids = tuple(row[0] for row in rows)
+    placeholders = ','.join('?' * len(ids))
+
+    try:
+      cursor.execute('BEGIN')
+      cursor.execute(f'''
+        INSERT OR IGNORE INTO {ARCHIVE_SCHEMA}.word_review_items ({REVIEW_ITEM_COLUMNS})
+        SELECT {REVIEW_ITEM_COLUMNS} FROM main.word_review_items WHERE study_session_id IN ({placeholders})
+      ''', ids)
+      cursor.execute(f'''
+        INSERT INTO word_review_daily (word_id, day, attempts, correct, last_reviewed)
+        SELECT word_id, activity_day(created_at), COUNT(*), COUNT(CASE WHEN correct = 1 THEN 1 END), MAX(created_at)
+        FROM main.word_review_items
+        WHERE study_session_id IN ({placeholders})
+        GROUP BY 1, 2
+        ON CONFLICT(word_id, day) DO UPDATE SET
+          attempts = attempts + excluded.attempts,
+          correct = correct + excluded.correct,
+          last_reviewed = MAX(last_reviewed, excluded.last_reviewed)
+      ''', ids)
+      cursor.execute(f'DELETE FROM main.word_review_items WHERE study_session_id IN ({placeholders})', ids)
+      reviews += cursor.rowcount
+      cursor.execute(f'UPDATE study_sessions SET archived_at = CURRENT_TIMESTAMP WHERE id IN ({placeholders})', ids)
+      connection.commit()
+    except Exception:
+      connection.rollback()
+      raise
+    sessions += len(ids)
+
+  return {
+    "sessions": sessions,
+    "reviews": reviews,
+    "seconds": time.perf_counter() - started
+  }
+
+# Clear the aggregates and, when attached, the archived items together with
+# the rest of the review history
+def reset_archive(cursor):
+  cursor.execute('DELETE FROM word_review_daily')
+  if is_attached(cursor.connection):
+    cursor.execute(f'DELETE FROM {ARCHIVE_SCHEMA}.word_review_items')
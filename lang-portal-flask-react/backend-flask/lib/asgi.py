@@ -0,0 +1,161 @@
+import re
+import sqlite3
+import time
+from io import BytesIO
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from flask_cors.core import get_cors_options, get_cors_headers
+
+from lib.async_db import AsyncDb
+from lib.conditional import ConditionalRead, table_versions_query
+from lib.groups import GROUP_WORDS_PAYLOAD_SQL, group_words_body
+from lib.scheduler import NEXT_WORDS_STEPS, MAX_NEXT_WORDS, next_words_query, next_word_json, utc_now
+
+# asgiref's adapter runs every WSGI call on one shared thread (sync_to_async
+# is thread sensitive by default), so Flask requests would run one at a time.
+# Run them on the event loop's executor instead, concurrently like under the
+# threaded WSGI server; the app's connection pools are thread-safe.
+class ThreadedWsgiToAsgiInstance(WsgiToAsgiInstance):
+  run_wsgi_app = sync_to_async(WsgiToAsgiInstance.run_wsgi_app.__wrapped__, thread_sensitive=False)
+
+class ThreadedWsgiToAsgi(WsgiToAsgi):
+  async def __call__(self, scope, receive, send):
+    await ThreadedWsgiToAsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+# WSGI environ of a request without a body, built the way the adapter builds it
+def environ_of(scope):
+  adapter = WsgiToAsgiInstance(None)
+  adapter.scope = scope
+  return adapter.build_environ(scope, BytesIO())
+
+# ASGI app around the Flask app. The hottest read routes are served natively
+# from an aiosqlite connection pool (lib/async_db.py); every other route
+# (including all writes) goes to the Flask app on executor threads. The
+# routes/*.py handlers are not ported: a write path would need async versions
+# of the review queue, learner shards and snapshot refresh. The native handlers answer
+# like their Flask routes: the same bodies, ETag/304s and response cache as
+# @conditional, @cross_origin() headers and request metrics.
+class AsgiApp:
+  def __init__(self, flask_app):
+    self.flask_app = flask_app
+    self.wsgi_app = ThreadedWsgiToAsgi(flask_app)
+    self.db = AsyncDb(database=flask_app.config['DATABASE'], pool_size=flask_app.config['ASYNC_DB_POOL_SIZE'])
+    # What @cross_origin() without arguments resolves to
+    self.cors_options = get_cors_options(flask_app, {})
+    # (path pattern, endpoint of the Flask route, handler)
+    self.routes = (
+      (re.compile(r'^/api/groups/(\d+)/words/raw$'), 'get_group_words_raw', self.get_group_words_raw),
+      (re.compile(r'^/study_sessions/(\d+)/next-words$'), 'get_next_words', self.get_next_words),
+    )
+
+  def json_response(self, data, status=200):
+    response = self.flask_app.json.response(data)
+    response.status_code = status
+    return response
+
+  # Async counterpart of @conditional(*tables) around render()
+  async def conditional(self, request, tables, render):
+    try:
+      versions = [tuple(row) for row in await self.db.fetchall(*table_versions_query(tables))]
+    except sqlite3.OperationalError:
+      # data_versions does not exist until the migrations have run
+      return await render()
+
+    read = ConditionalRead(self.flask_app.response_cache, request, None, versions)
+    response = read.cached()
+    if response is not None:
+      return response
+    return read.finish(await render())
+
+  # GET /api/groups/<id>/words/raw, same as routes/groups.py
+  async def get_group_words_raw(self, request, group_id):
+    async def render():
+      group = await self.db.fetchone('SELECT name FROM groups WHERE id = ?', (group_id,))
+      if group is None:
+        return self.json_response({"error": "Group not found"}, 404)
+      rows = await self.db.fetchall(GROUP_WORDS_PAYLOAD_SQL, (group_id,))
+      body = group_words_body(group_id, group["name"], [row[0] for row in rows])
+      return self.flask_app.response_class(body, mimetype='application/json')
+    return await self.conditional(request, ('groups', 'word_groups', 'words'), render)
+
+  # GET /study_sessions/<id>/next-words, same as routes/study_sessions.py
+  async def get_next_words(self, request, session_id):
+    n = request.args.get('n', 10, type=int)
+    if n is None or n < 1:
+      return self.json_response({"error": "n must be a positive integer"}, 400)
+    n = min(n, MAX_NEXT_WORDS)
+
+    session = await self.db.fetchone('SELECT group_id FROM study_sessions WHERE id = ?', (session_id,))
+    if session is None:
+      return self.json_response({"error": "Study session not found"}, 404)
+
+    now = utc_now()
+    words = []
+    for step in NEXT_WORDS_STEPS:
+      if len(words) >= n:
+        break
+      rows = await self.db.fetchall(*next_words_query(step, session['group_id'], n - len(words), now))
+      words.extend(next_word_json(step[0], row) for row in rows)
+    return self.json_response({
+      "study_session_id": session_id,
+      "group_id": session['group_id'],
+      "words": words
+    })
+
+  async def serve(self, scope, send, endpoint, handler, id):
+    environ = environ_of(scope)
+    request = self.flask_app.request_class(environ)
+    metrics = self.flask_app.metrics
+    started = time.perf_counter()
+    metrics.request_started()
+    status, size = 500, None
+    try:
+      try:
+        response = await handler(request, id)
+      except Exception as e:
+        response = self.json_response({"error": str(e)}, 500)
+      for name, value in get_cors_headers(self.cors_options, request.headers, request.method).items():
+        response.headers.add(name, value)
+
+      # Headers and body as WSGI would send them (empty for HEAD and 304)
+      app_iter, _, headers = response.get_wsgi_response(environ)
+      body = b''.join(app_iter)
+      status, size = response.status_code, response.calculate_content_length()
+      await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+      })
+      await send({'type': 'http.response.body', 'body': body})
+    finally:
+      metrics.request_finished(endpoint, request.method, status, time.perf_counter() - started, size)
+
+  async def lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message['type'] == 'lifespan.startup':
+        await send({'type': 'lifespan.startup.complete'})
+      elif message['type'] == 'lifespan.shutdown':
+        await self.close()
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+
+  async def close(self):
+    await self.db.close()
+    if self.flask_app.review_queue is not None:
+      self.flask_app.review_queue.close()
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      return await self.lifespan(receive, send)
+
+    # Native handlers read the main database, learner shards go through Flask
+    learner = any(name == b'x-learner-id' for name, _ in scope.get('headers', ()))
+    if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD') and not learner:
+      for pattern, endpoint, handler in self.routes:
+        match = pattern.match(scope['path'])
+        if match:
+          return await self.serve(scope, send, endpoint, handler, int(match.group(1)))
+
+    await self.wsgi_app(scope, receive, send)
@@ -0,0 +1,91 @@
+import asyncio
+import sqlite3
+
+import aiosqlite
+
+from lib.db import CONNECTION_PRAGMAS
+
+# Bounded pool of aiosqlite connections for the ASGI app. Each aiosqlite
+# connection runs its statements on its own thread, so the pool size caps
+# the threads as well as the open connections; callers past the limit wait
+# on the event loop instead of blocking it.
+class AsyncConnectionPool:
+  def __init__(self, connect, size, timeout=30):
+    self.connect = connect
+    self.size = size
+    self.timeout = timeout
+    self.idle = asyncio.LifoQueue(maxsize=size)
+    self.opened = 0
+
+  async def acquire(self):
+    try:
+      return self.idle.get_nowait()
+    except asyncio.QueueEmpty:
+      pass
+
+    # All callers share one event loop, so the counter needs no lock as long
+    # as it is updated before the first await
+    if self.opened < self.size:
+      self.opened += 1
+      try:
+        return await self.connect()
+      except Exception:
+        self.opened -= 1
+        raise
+
+    try:
+      return await asyncio.wait_for(self.idle.get(), self.timeout)
+    except asyncio.TimeoutError:
+      raise sqlite3.OperationalError('timed out waiting for a database connection')
+
+  async def release(self, connection):
+    try:
+      if connection.in_transaction:
+        await connection.rollback()
+      self.idle.put_nowait(connection)
+    except Exception:
+      await connection.close()
+      self.opened -= 1
+
+  async def close(self):
+    while True:
+      try:
+        connection = self.idle.get_nowait()
+      except asyncio.QueueEmpty:
+        break
+      await connection.close()
+      self.opened -= 1
+
+# Read-only async counterpart of lib.db.Db. Writes stay on the sync app so
+# they keep going through its single writer pool and transactions.
+class AsyncDb:
+  def __init__(self, database='words.db', pool_size=16):
+    self.database = database
+    self.pool = AsyncConnectionPool(self.connect, pool_size)
+
+  async def connect(self):
+    connection = await aiosqlite.connect(self.database)
+    connection.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+      await connection.execute(pragma)
+    await connection.execute('PRAGMA query_only = ON')
+    return connection
+
+  async def fetchone(self, sql, parameters=()):
+    connection = await self.pool.acquire()
+    try:
+      async with connection.execute(sql, parameters) as cursor:
+        return await cursor.fetchone()
+    finally:
+      await self.pool.release(connection)
+
+  async def fetchall(self, sql, parameters=()):
+    connection = await self.pool.acquire()
+    try:
+      async with connection.execute(sql, parameters) as cursor:
+        return await cursor.fetchall()
+    finally:
+      await self.pool.release(connection)
+
+  async def close(self):
+    await self.pool.close()
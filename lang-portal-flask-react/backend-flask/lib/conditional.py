@@ -0,0 +1,113 @@
+import hashlib
+import json
+import sqlite3
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, request, make_response, Response, g
+
+# Query of the current (table_name, version, updated_at) rows for the given
+# tables plus the database epoch, as (sql, params)
+def table_versions_query(tables):
+  names = ('database', *tables)
+  placeholders = ','.join('?' * len(names))
+  return f'''
+    SELECT table_name, version, updated_at FROM data_versions
+    WHERE table_name IN ({placeholders})
+    ORDER BY table_name
+  ''', names
+
+def table_versions(cursor, tables):
+  cursor.execute(*table_versions_query(tables))
+  return [tuple(row) for row in cursor.fetchall()]
+
+# Strong ETag for req from the table versions, path, query args and learner
+# (versions of different learner shards are unrelated)
+def compute_etag(req, learner_id, versions):
+  key = json.dumps([
+    learner_id,
+    req.path,
+    sorted(req.args.items(multi=True)),
+    [(table_name, version) for table_name, version, _ in versions]
+  ])
+  return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+
+def last_modified_of(versions):
+  timestamps = [updated_at for table_name, _, updated_at in versions if table_name != 'database' and updated_at]
+  if not timestamps:
+    return None
+  return datetime.fromisoformat(max(timestamps)).replace(tzinfo=timezone.utc)
+
+def not_modified(etag, last_modified):
+  return set_validators(Response(status=304), etag, last_modified)
+
+def set_validators(response, etag, last_modified):
+  response.set_etag(etag)
+  if last_modified is not None:
+    response.last_modified = last_modified
+  # Let clients keep the body but revalidate on every use
+  response.headers['Cache-Control'] = 'no-cache'
+  return response
+
+# One conditional read of `req` at `versions`, for the @conditional routes and
+# the native handlers of the ASGI app (lib/asgi.py). cached() answers without
+# the view when it can, finish() adds the validators to the view's response
+# and caches it.
+class ConditionalRead:
+  def __init__(self, cache, req, learner_id, versions):
+    self.cache = cache
+    self.req = req
+    self.learner_id = learner_id
+    self.versions = {table_name: version for table_name, version, _ in versions}
+    self.etag = compute_etag(req, learner_id, versions)
+    self.last_modified = last_modified_of(versions)
+    self.key = (req.path, tuple(sorted(req.args.items(multi=True))), learner_id)
+
+  # A 304 or a cached 200, None when the view has to run
+  def cached(self):
+    if self.req.if_none_match:
+      if self.req.if_none_match.contains(self.etag):
+        return not_modified(self.etag, self.last_modified)
+    elif self.req.if_modified_since and self.last_modified and self.last_modified <= self.req.if_modified_since:
+      return not_modified(self.etag, self.last_modified)
+
+    if self.cache is None:
+      return None
+    self.cache.observe(self.versions, scope=self.learner_id)
+    cached = self.cache.get(self.key, self.etag)
+    if cached is None:
+      return None
+    body, mimetype = cached
+    response = Response(body, status=200, mimetype=mimetype)
+    response.headers['X-Cache'] = 'HIT'
+    return set_validators(response, self.etag, self.last_modified)
+
+  def finish(self, response):
+    if response.status_code == 200:
+      set_validators(response, self.etag, self.last_modified)
+      if self.cache is not None:
+        self.cache.put(self.key, self.etag, response.get_data(), response.mimetype, self.versions, scope=self.learner_id)
+        response.headers['X-Cache'] = 'MISS'
+    return response
+
+# Conditional GET for a read route that only depends on `tables`. Emits ETag
+# and Last-Modified, and answers 304 without calling the view when the
+# client's If-None-Match (or If-Modified-Since) is still current. When the app
+# has a response cache, rendered bodies are served from it until one of
+# `tables` is written.
+def conditional(*tables):
+  def decorator(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+      try:
+        versions = table_versions(current_app.db.cursor(), tables)
+      except sqlite3.OperationalError:
+        # data_versions does not exist until the migrations have run
+        return view(*args, **kwargs)
+
+      read = ConditionalRead(getattr(current_app, 'response_cache', None), request, g.get('learner_id'), versions)
+      response = read.cached()
+      if response is not None:
+        return response
+      return read.finish(make_response(view(*args, **kwargs)))
+    return wrapper
+  return decorator
@@ -1,30 +1,224 @@
+import os
+import queue
 import sqlite3
+import threading
 import json
-from flask import g
+from collections import OrderedDict
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+
+from lib.migrations import apply_migrations, create_tables
+from lib.importer import import_words
+from lib.shards import shard_path, create_shard, attach_common
+
+# Pragmas applied once to every connection when it is opened. WAL is set
+# separately on write connections since it is persisted in the database file.
+CONNECTION_PRAGMAS = (
+  'PRAGMA busy_timeout = 5000',     # wait up to 5s on a locked database instead of failing
+  'PRAGMA synchronous = NORMAL',    # safe with WAL, avoids an fsync per commit
+  'PRAGMA mmap_size = 268435456',   # 256 MiB memory-mapped reads
+  'PRAGMA cache_size = -16000',     # ~16 MiB page cache per connection
+  'PRAGMA temp_store = MEMORY',
+)
+
+# Requests with these methods are served from the read pool
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Learner shards whose pools are kept open, least recently used are closed first
+MAX_OPEN_SHARDS = 256
+
+class ConnectionPool:
+  def __init__(self, connect, size, timeout=30):
+    self.connect = connect
+    self.size = size
+    self.timeout = timeout
+    self.idle = queue.LifoQueue(maxsize=size)
+    self.opened = 0
+    self.lock = threading.Lock()
+
+  def acquire(self):
+    try:
+      return self.idle.get_nowait()
+    except queue.Empty:
+      pass
+
+    # Open a new connection while we are under the pool size
+    with self.lock:
+      if self.opened < self.size:
+        self.opened += 1
+        try:
+          return self.connect()
+        except Exception:
+          self.opened -= 1
+          raise
+
+    # Otherwise wait for another request to hand one back
+    try:
+      return self.idle.get(timeout=self.timeout)
+    except queue.Empty:
+      raise sqlite3.OperationalError('timed out waiting for a database connection')
+
+  def release(self, connection):
+    try:
+      # Never hand out a connection with a half finished transaction
+      if connection.in_transaction:
+        connection.rollback()
+      self.idle.put_nowait(connection)
+    except Exception:
+      connection.close()
+      with self.lock:
+        self.opened -= 1
+
+  def close(self):
+    while True:
+      try:
+        connection = self.idle.get_nowait()
+      except queue.Empty:
+        break
+      connection.close()
+      with self.lock:
+        self.opened -= 1
 
 class Db:
-  def __init__(self, database='words.db'):
+  def __init__(self, database='words.db', read_pool_size=8, write_pool_size=1, profiler=None, shard_directory=None, common=None):
     self.database = database
-    self.connection = None
+    self.read_pool_size = read_pool_size
+    # SQLite only allows one writer at a time, so writers queue here
+    # rather than spinning on busy_timeout
+    self.write_pool_size = write_pool_size
+    self._pools = None
+    self._pid = None
+    self._pools_lock = threading.Lock()
+    # lib.profiler.QueryProfiler, when set cursors record every statement
+    self.profiler = profiler
+    # lib.snapshot.Snapshot, when set stale-ok reads are served from it
+    self.snapshot = None
+    # Per learner shards (lib/shards.py) under shard_directory. On a shard's
+    # own Db, `common` is the database with the shared vocabulary.
+    self.shard_directory = shard_directory
+    self.common = common
+    self._shards = OrderedDict()
+    self._shards_lock = threading.Lock()
+
+  def connect(self, readonly=False):
+    connection = sqlite3.connect(self.database, check_same_thread=False)
+    connection.row_factory = sqlite3.Row  # Return rows as dictionaries
+    if not readonly:
+      connection.execute('PRAGMA journal_mode = WAL')
+    for pragma in CONNECTION_PRAGMAS:
+      connection.execute(pragma)
+    if self.common:
+      attach_common(connection, self.common)
+    if readonly:
+      connection.execute('PRAGMA query_only = ON')
+    return connection
 
-  def get(self):
+  def pools(self):
+    # Pools are per process, a forked worker must not share its parent's connections
+    pid = os.getpid()
+    if self._pid != pid:
+      with self._pools_lock:
+        if self._pid != pid:
+          self._pools = {
+            'read': ConnectionPool(lambda: self.connect(readonly=True), self.read_pool_size),
+            'write': ConnectionPool(self.connect, self.write_pool_size)
+          }
+          self._pid = pid
+    return self._pools
+
+  # Db of a learner's shard, the shard file is created on first use
+  def shard(self, learner_id):
+    with self._shards_lock:
+      shard = self._shards.get(learner_id)
+      if shard is None:
+        path = shard_path(self.shard_directory, learner_id)
+        create_shard(path)
+        shard = Db(
+          database=path,
+          read_pool_size=self.read_pool_size,
+          write_pool_size=self.write_pool_size,
+          profiler=self.profiler,
+          common=self.database
+        )
+        self._shards[learner_id] = shard
+        if len(self._shards) > MAX_OPEN_SHARDS:
+          # Connections still lent out are closed when they are garbage collected
+          self._shards.popitem(last=False)[1].dispose()
+      else:
+        self._shards.move_to_end(learner_id)
+      return shard
+
+  # Db the current request works on: its learner's shard when sharding is on
+  # and the request names a learner (X-Learner-Id), this one otherwise
+  def routed(self):
+    if self.shard_directory and has_request_context():
+      learner_id = g.get('learner_id')
+      if learner_id is not None:
+        return self.shard(learner_id)
+    return self
+
+  # Borrow a pooled connection outside of a request (background jobs, tasks)
+  @contextmanager
+  def connection(self, readonly=False):
+    pool = self.pools()['read' if readonly else 'write']
+    connection = pool.acquire()
+    try:
+      yield connection
+    finally:
+      pool.release(connection)
+
+  # The request's connection. `readonly` overrides the choice made from the
+  # request method, e.g. for POST /batch which only runs reads.
+  def get(self, readonly=None):
     if 'db' not in g:
-      g.db = sqlite3.connect(self.database)
-      g.db.row_factory = sqlite3.Row  # Return rows as dictionaries
+      # Reads get their own connections so they never wait behind a writer
+      if readonly is None:
+        readonly = has_request_context() and request.method in READ_METHODS
+      db = self.routed()
+      pool = None
+      if readonly and db.snapshot is not None and g.get('stale_ok'):
+        pool = db.snapshot.current_pool()
+      if pool is not None:
+        g.db_pool = 'snapshot'
+      else:
+        g.db_pool = 'read' if readonly else 'write'
+        pool = db.pools()[g.db_pool]
+      g.db_release = pool.release
+      g.db = pool.acquire()
     return g.db
 
   def commit(self):
     self.get().commit()
 
+  def rollback(self):
+    self.get().rollback()
+
   def cursor(self):
     # Ensure the connection is valid before getting a cursor
-    connection = self.get()
+    return self.cursor_for(self.get())
+
+  # Cursor on a connection, recorded by the profiler like the request's own
+  def cursor_for(self, connection):
+    if self.profiler is not None:
+      return self.profiler.cursor(connection)
     return connection.cursor()
 
   def close(self):
     db = g.pop('db', None)
+    g.pop('db_pool', None)
+    release = g.pop('db_release', None)
     if db is not None:
-      db.close()
+      release(db)
+
+  # Close every idle pooled connection, e.g. on shutdown
+  def dispose(self):
+    if self._pools is not None:
+      for pool in self._pools.values():
+        pool.close()
+    with self._shards_lock:
+      for shard in self._shards.values():
+        shard.dispose()
+      self._shards.clear()
 
   # Function to load SQL from a file
   def sql(self, filepath):
@@ -37,27 +231,11 @@ class Db:
       return json.load(file)
 
   def setup_tables(self,cursor):
-    # Create the necessary tables
-    cursor.execute(self.sql('setup/create_table_words.sql'))
-    self.get().commit()
-
-    cursor.execute(self.sql('setup/create_table_word_reviews.sql'))
-    self.get().commit()
-
-    cursor.execute(self.sql('setup/create_table_word_review_items.sql'))
-    self.get().commit()
-
-    cursor.execute(self.sql('setup/create_table_groups.sql'))
-    self.get().commit()
+    # Create the necessary tables, see lib/migrations.py
+    create_tables(self.get())
 
-    cursor.execute(self.sql('setup/create_table_word_groups.sql'))
-    self.get().commit()
-
-    cursor.execute(self.sql('setup/create_table_study_activities.sql'))
-    self.get().commit()
-
-    cursor.execute(self.sql('setup/create_table_study_sessions.sql'))
-    self.get().commit()
+    # Bring the fresh schema up to date with sql/migrations
+    apply_migrations(self.get())
 
   def import_study_activities_json(self,cursor,data_json_path):
     study_actvities = self.load_json(data_json_path)
@@ -68,46 +246,11 @@ class Db:
     self.get().commit()
 
   def import_word_json(self,cursor,group_name,data_json_path):
-      # Insert a new group
-      cursor.execute('''
-        INSERT INTO groups (name) VALUES (?)
-      ''', (group_name,))
-      self.get().commit()
-
-      # Get the ID of the group
-      cursor.execute('SELECT id FROM groups WHERE name = ?', (group_name,))
-      core_verbs_group_id = cursor.fetchone()[0]
-
-      # Insert some sample words (verbs) from JSON file and associate with the group
-      words = self.load_json(data_json_path)
-
-      for word in words:
-        # Insert the word into the words table
-        cursor.execute('''
-          INSERT INTO words (kanji, romaji, english, parts) VALUES (?, ?, ?, ?)
-        ''', (word['kanji'], word['romaji'], word['english'], json.dumps(word['parts'])))
-        
-        # Get the last inserted word's ID
-        word_id = cursor.lastrowid
-
-        # Insert the word-group relationship into word_groups table
-        cursor.execute('''
-          INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)
-        ''', (word_id, core_verbs_group_id))
-      self.get().commit()
-
-      # Update the words_count in the groups table by counting all words in the group
-      cursor.execute('''
-        UPDATE groups
-        SET words_count = (
-          SELECT COUNT(*) FROM word_groups WHERE group_id = ?
-        )
-        WHERE id = ?
-      ''', (core_verbs_group_id, core_verbs_group_id))
-
-      self.get().commit()
+      # Stream the words into the group in a single transaction, see lib/importer.py
+      stats = import_words(self.get(), group_name, data_json_path)
 
-      print(f"Successfully added {len(words)} verbs to the '{group_name}' group.")
+      print(f"Imported {stats['inserted']} new words ({stats['skipped']} already present), "
+            f"added {stats['added_to_group']} to the '{group_name}' group.")
 
   # Initialize the database with sample data
   def init(self, app):
@@ -0,0 +1,65 @@
+import json
+
+# Group membership changes and the group words payload, used by
+# routes/groups.py and the ASGI app (lib/asgi.py).
+#
+# Membership: each batch is a single statement over json_each,
+# the unique (word_id, group_id) index skips words already in the group, and
+# the word_groups triggers keep groups.words_count exact.
+
+# Upper bound on word ids accepted in one request
+MAX_MEMBERSHIP_BATCH = 10000
+
+# Validate {"word_ids": [...]} (or a bare list) into a list of distinct ids. Raises ValueError.
+def parse_word_ids(payload):
+  if isinstance(payload, dict):
+    payload = payload.get('word_ids')
+  if not isinstance(payload, list) or not payload:
+    raise ValueError('a non-empty array of word_ids is required')
+  if len(payload) > MAX_MEMBERSHIP_BATCH:
+    raise ValueError(f'at most {MAX_MEMBERSHIP_BATCH} word_ids can be changed per request')
+  for index, word_id in enumerate(payload):
+    if not isinstance(word_id, int) or isinstance(word_id, bool):
+      raise ValueError(f'word_ids[{index}] must be an integer')
+  return list(dict.fromkeys(payload))
+
+# Add words to a group, returns how many were not in it yet. New rows take
+# the word's due_at from word_schedule, like the rest of its word_groups rows.
+def add_words(cursor, group_id, word_ids):
+  cursor.execute('''
+    INSERT OR IGNORE INTO word_groups (word_id, group_id, due_at)
+    SELECT ids.value, ?, s.due_at
+    FROM json_each(?) ids
+    LEFT JOIN word_schedule s ON s.word_id = ids.value
+  ''', (group_id, json.dumps(word_ids)))
+  return cursor.rowcount
+
+# Remove words from a group, returns how many were in it
+def remove_words(cursor, group_id, word_ids):
+  cursor.execute('''
+    DELETE FROM word_groups
+    WHERE group_id = ? AND word_id IN (SELECT value FROM json_each(?))
+  ''', (group_id, json.dumps(word_ids)))
+  return cursor.rowcount
+
+# Pre-encoded word objects (words.payload_json) of a group, see /api/groups/<id>/words/raw.
+# Rows written while the payload triggers were off have no payload yet, they
+# are encoded inline the same way.
+GROUP_WORDS_PAYLOAD_SQL = '''
+  SELECT COALESCE(w.payload_json, json_object(
+    'english', w.english, 'id', w.id, 'kanji', w.kanji, 'parts', json(w.parts), 'romaji', w.romaji
+  ))
+  FROM word_groups wg
+  JOIN words w ON w.id = wg.word_id
+  WHERE wg.group_id = ?
+'''
+
+# Body of /api/groups/<id>/words/raw, splicing the word fragments as they are stored
+def group_words_body(group_id, group_name, fragments):
+  return b''.join([
+    b'{"group_id":', str(group_id).encode(),
+    b',"group_name":', json.dumps(group_name).encode(),
+    b',"words":[',
+    ','.join(fragments).encode('utf-8'),
+    b']}'
+  ])
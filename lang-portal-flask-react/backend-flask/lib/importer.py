@@ -0,0 +1,154 @@
+import json
+import time
+
+# Bytes read from the input file at a time
+CHUNK_SIZE = 1 << 16
+
+# Rows staged per executemany call
+BATCH_SIZE = 5000
+
+SEPARATORS = ' \t\r\n,'
+
+# Yield the objects of a top level JSON array without loading the whole file
+def iter_json_array(file):
+  decoder = json.JSONDecoder()
+  buffer = file.read(CHUNK_SIZE).lstrip()
+  if not buffer.startswith('['):
+    raise ValueError('expected a JSON array')
+  position = 1
+  while True:
+    # Skip whitespace and the comma between elements
+    while True:
+      while position < len(buffer) and buffer[position] in SEPARATORS:
+        position += 1
+      if position < len(buffer):
+        break
+      buffer = file.read(CHUNK_SIZE)
+      position = 0
+      if not buffer:
+        raise ValueError('unterminated JSON array')
+
+    if buffer[position] == ']':
+      return
+
+    # Decode the next element, reading more input until it is complete
+    while True:
+      try:
+        item, end = decoder.raw_decode(buffer, position)
+        break
+      except json.JSONDecodeError:
+        chunk = file.read(CHUNK_SIZE)
+        if not chunk:
+          raise
+        buffer = buffer[position:] + chunk
+        position = 0
+    yield item
+    position = end
+
+# Yield one object per non-empty line
+def iter_ndjson(file):
+  for line_number, line in enumerate(file, 1):
+    line = line.strip()
+    if not line:
+      continue
+    try:
+      yield json.loads(line)
+    except json.JSONDecodeError as e:
+      raise ValueError(f'line {line_number}: {e}')
+
+# Stream words from a JSON array or NDJSON file, detected from the first character
+def iter_words(path):
+  with open(path, 'r', encoding='utf-8') as file:
+    first = ''
+    while True:
+      first = file.read(1)
+      if not first or not first.isspace():
+        break
+    file.seek(0)
+    if first == '[':
+      yield from iter_json_array(file)
+    else:
+      yield from iter_ndjson(file)
+
+# Import a word file into the group `group_name` (created if missing) in a single
+# transaction. Words are staged in a temp table with executemany and then
+# inserted set-based, skipping words already present by (kanji, romaji).
+def import_words(connection, group_name, path, batch_size=BATCH_SIZE):
+  started = time.perf_counter()
+  cursor = connection.cursor()
+  cursor.execute('''
+    CREATE TEMP TABLE IF NOT EXISTS import_words (
+      kanji TEXT NOT NULL,
+      romaji TEXT NOT NULL,
+      english TEXT NOT NULL,
+      parts TEXT NOT NULL
+    )
+  ''')
+  cursor.execute('DELETE FROM temp.import_words')
+
+  try:
+    parsed = 0
+    batch = []
+    for word in iter_words(path):
+      batch.append((word['kanji'], word['romaji'], word['english'], json.dumps(word['parts'])))
+      parsed += 1
+      if len(batch) >= batch_size:
+        cursor.executemany('INSERT INTO temp.import_words VALUES (?, ?, ?, ?)', batch)
+        batch = []
+    if batch:
+      cursor.executemany('INSERT INTO temp.import_words VALUES (?, ?, ?, ?)', batch)
+
+    # Find or create the group
+    cursor.execute('SELECT id FROM groups WHERE name = ?', (group_name,))
+    group = cursor.fetchone()
+    if group:
+      group_id = group[0]
+    else:
+      cursor.execute('INSERT INTO groups (name) VALUES (?)', (group_name,))
+      group_id = cursor.lastrowid
+
+    # Insert new words in file order, keeping the first of any repeats in the file
+    cursor.execute('''
+      INSERT INTO words (kanji, romaji, english, parts)
+      SELECT i.kanji, i.romaji, i.english, i.parts
+      FROM temp.import_words i
+      WHERE i.rowid IN (SELECT MIN(rowid) FROM temp.import_words GROUP BY kanji, romaji)
+        AND NOT EXISTS (SELECT 1 FROM words w WHERE w.kanji = i.kanji AND w.romaji = i.romaji)
+      ORDER BY i.rowid
+    ''')
+    inserted = cursor.rowcount
+
+    # Add every imported word, new or existing, to the group once. The
+    # unique (word_id, group_id) index skips words already in the group and
+    # the word_groups triggers keep groups.words_count in step.
+    cursor.execute('''
+      INSERT OR IGNORE INTO word_groups (word_id, group_id, due_at)
+      SELECT m.word_id, ?, s.due_at
+      FROM (
+        SELECT MIN(w.id) as word_id
+        FROM temp.import_words i
+        JOIN words w ON w.kanji = i.kanji AND w.romaji = i.romaji
+        GROUP BY i.kanji, i.romaji
+      ) m
+      LEFT JOIN word_schedule s ON s.word_id = m.word_id
+      ORDER BY m.word_id
+    ''', (group_id,))
+    added = cursor.rowcount
+
+    connection.commit()
+  except Exception:
+    connection.rollback()
+    raise
+  finally:
+    cursor.execute('DROP TABLE IF EXISTS temp.import_words')
+
+  seconds = time.perf_counter() - started
+  return {
+    "group_id": group_id,
+    "parsed": parsed,
+    "inserted": inserted,
+    "skipped": parsed - inserted,
+    "added_to_group": added,
+    "seconds": seconds,
+    "rows_per_sec": parsed / seconds if seconds else 0
+  }
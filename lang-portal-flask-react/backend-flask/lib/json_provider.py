@@ -0,0 +1,33 @@
+import json
+from flask.json.provider import DefaultJSONProvider
+
+try:
+  import orjson
+  ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS
+except ImportError:
+  orjson = None
+
+# App-wide JSON provider for jsonify and request bodies. Uses orjson when it
+# is installed and otherwise the stdlib encoder without ASCII escaping. Keys
+# stay sorted like with the default provider. Types neither encoder knows
+# (dates, decimals, ...) go through Flask's default hook.
+class FastJSONProvider(DefaultJSONProvider):
+  ensure_ascii = False
+
+  # Compact UTF-8 bytes of obj
+  def encode(self, obj):
+    if orjson is not None:
+      return orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS)
+    return json.dumps(obj, default=self.default, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+  # Compact output (what response() asks for outside debug mode) is encoded
+  # here, anything else like indented debug output by the default provider
+  def dumps(self, obj, **kwargs):
+    if kwargs in ({}, {'separators': (',', ':')}):
+      return self.encode(obj).decode('utf-8')
+    return super().dumps(obj, **kwargs)
+
+  def loads(self, s, **kwargs):
+    if orjson is not None and not kwargs:
+      return orjson.loads(s)
+    return super().loads(s, **kwargs)
@@ -0,0 +1,141 @@
+import threading
+import weakref
+
+# Upper bounds (seconds) of the request latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Counters of one thread. Only the owning thread writes to it, so recording
+# a request takes no lock; the scraper sums copies of every buffer.
+class ThreadBuffer:
+  def __init__(self):
+    self.requests = {}   # (endpoint, method, status) -> count
+    self.latency = {}    # (endpoint, method) -> [bucket counts..., +Inf count, sum]
+    self.sizes = {}      # (endpoint, method) -> [count, sum of bytes]
+    self.in_flight = 0
+
+  # Add a copy of other's counters to this buffer
+  def add(self, other):
+    self.in_flight += other.in_flight
+    for key, count in other.requests.copy().items():
+      self.requests[key] = self.requests.get(key, 0) + count
+    for key, values in other.latency.copy().items():
+      total = self.latency.setdefault(key, [0] * len(values))
+      for index, value in enumerate(list(values)):
+        total[index] += value
+    for key, values in other.sizes.copy().items():
+      total = self.sizes.setdefault(key, [0, 0])
+      total[0] += values[0]
+      total[1] += values[1]
+
+# Kept only in the thread-local next to a buffer. It is released when its
+# thread exits, which retires the buffer.
+class BufferOwner:
+  pass
+
+class Metrics:
+  def __init__(self, buckets=LATENCY_BUCKETS):
+    self.buckets = buckets
+    self.local = threading.local()
+    self.buffers = set()  # buffers of live threads
+    self.retired = ThreadBuffer()  # counters of threads that have exited
+    # Taken when a thread records for the first time, when it exits and while
+    # scraping. Reentrant, since a retirement can be run by the garbage
+    # collector on a thread that already holds it.
+    self.buffers_lock = threading.RLock()
+
+  def buffer(self):
+    buffer = getattr(self.local, 'buffer', None)
+    if buffer is None:
+      buffer = ThreadBuffer()
+      owner = BufferOwner()
+      weakref.finalize(owner, self.retire, buffer)
+      with self.buffers_lock:
+        self.buffers.add(buffer)
+      self.local.buffer, self.local.owner = buffer, owner
+    return buffer
+
+  # Fold the buffer of an exited thread into the retired totals, so the
+  # number of buffers follows the live threads rather than every thread seen
+  def retire(self, buffer):
+    with self.buffers_lock:
+      if buffer in self.buffers:
+        self.buffers.discard(buffer)
+        self.retired.add(buffer)
+
+  def request_started(self):
+    self.buffer().in_flight += 1
+
+  def request_finished(self, endpoint, method, status, seconds, size):
+    buffer = self.buffer()
+    buffer.in_flight -= 1
+
+    key = (endpoint, method, status)
+    buffer.requests[key] = buffer.requests.get(key, 0) + 1
+
+    key = (endpoint, method)
+    latency = buffer.latency.get(key)
+    if latency is None:
+      latency = buffer.latency[key] = [0] * (len(self.buckets) + 2)
+    for index, bound in enumerate(self.buckets):
+      if seconds <= bound:
+        latency[index] += 1
+        break
+    else:
+      latency[len(self.buckets)] += 1
+    latency[-1] += seconds
+
+    if size is not None:
+      sizes = buffer.sizes.get(key)
+      if sizes is None:
+        sizes = buffer.sizes[key] = [0, 0]
+      sizes[0] += 1
+      sizes[1] += size
+
+  # Sum every thread's buffer into (requests, latency, sizes, in_flight). The
+  # lock keeps a thread from being counted twice when it exits mid-scrape.
+  def collect(self):
+    total = ThreadBuffer()
+    with self.buffers_lock:
+      total.add(self.retired)
+      for buffer in self.buffers:
+        total.add(buffer)
+    return total.requests, total.latency, total.sizes, total.in_flight
+
+  # Prometheus text exposition format
+  def render(self):
+    requests, latency, sizes, in_flight = self.collect()
+    lines = []
+
+    lines.append('# HELP http_requests_total Requests handled, by endpoint, method and status.')
+    lines.append('# TYPE http_requests_total counter')
+    for (endpoint, method, status), count in sorted(requests.items()):
+      lines.append(f'http_requests_total{{{labels(endpoint, method)},status="{status}"}} {count}')
+
+    lines.append('# HELP http_request_duration_seconds Request latency, by endpoint and method.')
+    lines.append('# TYPE http_request_duration_seconds histogram')
+    for (endpoint, method), values in sorted(latency.items()):
+      cumulative = 0
+      for bound, count in zip(self.buckets, values):
+        cumulative += count
+        lines.append(f'http_request_duration_seconds_bucket{{{labels(endpoint, method)},le="{bound}"}} {cumulative}')
+      cumulative += values[len(self.buckets)]
+      lines.append(f'http_request_duration_seconds_bucket{{{labels(endpoint, method)},le="+Inf"}} {cumulative}')
+      lines.append(f'http_request_duration_seconds_sum{{{labels(endpoint, method)}}} {values[-1]:.6f}')
+      lines.append(f'http_request_duration_seconds_count{{{labels(endpoint, method)}}} {cumulative}')
+
+    lines.append('# HELP http_response_size_bytes Response body sizes, by endpoint and method.')
+    lines.append('# TYPE http_response_size_bytes summary')
+    for (endpoint, method), (count, total) in sorted(sizes.items()):
+      lines.append(f'http_response_size_bytes_sum{{{labels(endpoint, method)}}} {total}')
+      lines.append(f'http_response_size_bytes_count{{{labels(endpoint, method)}}} {count}')
+
+    lines.append('# HELP http_requests_in_flight Requests currently being handled.')
+    lines.append('# TYPE http_requests_in_flight gauge')
+    lines.append(f'http_requests_in_flight {in_flight}')
+    return '\n'.join(lines) + '\n'
+
+def escape(value):
+  return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def labels(endpoint, method):
+  return f'endpoint="{escape(endpoint)}",method="{escape(method)}"'
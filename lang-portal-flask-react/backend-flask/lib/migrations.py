@@ -0,0 +1,71 @@
+import os
+import re
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'sql', 'migrations')
+
+SETUP_DIR = os.path.join(os.path.dirname(MIGRATIONS_DIR), 'setup')
+
+# Base tables from sql/setup in dependency order, sql/migrations builds on them
+SETUP_TABLES = ('words', 'word_reviews', 'word_review_items', 'groups', 'word_groups', 'study_activities', 'study_sessions')
+
+def create_tables(connection):
+  for table in SETUP_TABLES:
+    with open(os.path.join(SETUP_DIR, f'create_table_{table}.sql'), 'r') as file:
+      connection.execute(file.read())
+  connection.commit()
+
+# Migration files are named <version>_<name>.sql, e.g. 0001_performance_indexes.sql
+MIGRATION_FILE = re.compile(r'^(\d+)_([\w-]+)\.sql$')
+
+def ensure_schema_migrations(connection):
+  connection.execute('''
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+      version INTEGER PRIMARY KEY,
+      name TEXT NOT NULL,
+      applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+  ''')
+  connection.commit()
+
+def applied_versions(connection):
+  ensure_schema_migrations(connection)
+  return {row[0] for row in connection.execute('SELECT version FROM schema_migrations')}
+
+# List (version, name, path) for every migration file, oldest first
+def migration_files(migrations_dir=MIGRATIONS_DIR):
+  migrations = []
+  for filename in os.listdir(migrations_dir):
+    match = MIGRATION_FILE.match(filename)
+    if match:
+      migrations.append((int(match.group(1)), match.group(2), os.path.join(migrations_dir, filename)))
+  return sorted(migrations)
+
+def pending_migrations(connection, migrations_dir=MIGRATIONS_DIR):
+  applied = applied_versions(connection)
+  return [migration for migration in migration_files(migrations_dir) if migration[0] not in applied]
+
+# Apply every pending migration, each in its own transaction together with
+# its schema_migrations row, so a failing file leaves no partial changes behind.
+# Returns the list of (version, name) that were applied.
+def apply_migrations(connection, migrations_dir=MIGRATIONS_DIR):
+  applied = []
+  isolation_level = connection.isolation_level
+  connection.isolation_level = None  # we manage BEGIN/COMMIT ourselves
+  try:
+    for version, name, path in pending_migrations(connection, migrations_dir):
+      with open(path, 'r') as file:
+        migration_sql = file.read()
+      try:
+        connection.executescript(
+          'BEGIN;\n' + migration_sql + ';\n'
+          f"INSERT INTO schema_migrations (version, name) VALUES ({version}, '{name}');\n"
+          'COMMIT;'
+        )
+      except Exception:
+        if connection.in_transaction:
+          connection.execute('ROLLBACK')
+        raise
+      applied.append((version, name))
+  finally:
+    connection.isolation_level = isolation_level
+  return applied
@@ -0,0 +1,137 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from flask import g, has_request_context
+
+logger = logging.getLogger(__name__)
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+# Collapse a statement to its shape so calls that only differ by literals,
+# placeholder count or formatting are aggregated together
+def normalize(sql):
+  sql = STRING_LITERAL.sub('?', sql)
+  sql = NUMBER_LITERAL.sub('?', sql)
+  sql = PLACEHOLDER_LIST.sub('(?, ...)', sql)
+  return WHITESPACE.sub(' ', sql).strip()
+
+# Aggregates statement timings across requests and keeps the statements of
+# the current request in g.queries. Statements slower than `slow_ms` are
+# logged with their EXPLAIN QUERY PLAN.
+class QueryProfiler:
+  def __init__(self, slow_ms=100):
+    self.slow_seconds = slow_ms / 1000
+    self.lock = threading.Lock()
+    self.statements = {}  # normalized sql -> [calls, seconds, max seconds, rows]
+
+  def cursor(self, connection):
+    cursor = connection.cursor(ProfiledCursor)
+    cursor.profiler = self
+    return cursor
+
+  # Start a statement, returns the entry later updated by record()
+  def begin(self, sql, parameters):
+    entry = {"sql": normalize(sql), "raw": sql, "parameters": parameters, "seconds": 0.0, "rows": 0, "slow": False}
+    if has_request_context():
+      g.setdefault('queries', []).append(entry)
+    with self.lock:
+      stats = self.statements.get(entry['sql'])
+      if stats is None:
+        stats = self.statements[entry['sql']] = [0, 0.0, 0.0, 0]
+      stats[0] += 1
+    return entry
+
+  def record(self, connection, entry, seconds, rows):
+    entry['seconds'] += seconds
+    entry['rows'] += rows
+    with self.lock:
+      stats = self.statements[entry['sql']]
+      stats[1] += seconds
+      stats[2] = max(stats[2], entry['seconds'])
+      stats[3] += rows
+    if not entry['slow'] and entry['seconds'] >= self.slow_seconds:
+      entry['slow'] = True
+      self.log_slow(connection, entry)
+
+  def log_slow(self, connection, entry):
+    try:
+      plan = connection.execute('EXPLAIN QUERY PLAN ' + entry['raw'], entry['parameters']).fetchall()
+      plan = '\n'.join(f'  {row[3]}' for row in plan)
+    except sqlite3.Error as e:
+      plan = f'  (no plan: {e})'
+    logger.warning('Slow query (%.1f ms, %d rows): %s\n%s', entry['seconds'] * 1000, entry['rows'], entry['sql'], plan)
+
+  # Statement count and total seconds of the current request
+  def request_totals(self):
+    queries = g.get('queries', ())
+    return len(queries), sum(entry['seconds'] for entry in queries)
+
+  # Top statements by total time
+  def report(self, limit=20):
+    with self.lock:
+      statements = [(sql, *stats) for sql, stats in self.statements.items()]
+    statements.sort(key=lambda statement: statement[2], reverse=True)
+    return [
+      {
+        "sql": sql,
+        "calls": calls,
+        "total_ms": seconds * 1000,
+        "avg_ms": seconds * 1000 / calls if calls else 0,
+        "max_ms": max_seconds * 1000,
+        "rows": rows
+      }
+      for sql, calls, seconds, max_seconds, rows in statements[:limit]
+    ]
+
+  def reset(self):
+    with self.lock:
+      self.statements.clear()
+
+# Cursor returned by Db.cursor() while profiling. Times execute plus the
+# fetches that step the statement, and counts rows fetched or changed.
+class ProfiledCursor(sqlite3.Cursor):
+  entry = None
+
+  def execute(self, sql, parameters=()):
+    self.entry = self.profiler.begin(sql, parameters)
+    started = time.perf_counter()
+    try:
+      return super().execute(sql, parameters)
+    finally:
+      self.record(time.perf_counter() - started, max(self.rowcount, 0))
+
+  def executemany(self, sql, seq_of_parameters):
+    seq_of_parameters = list(seq_of_parameters)
+    self.entry = self.profiler.begin(sql, seq_of_parameters[0] if seq_of_parameters else ())
+    started = time.perf_counter()
+    try:
+      return super().executemany(sql, seq_of_parameters)
+    finally:
+      self.record(time.perf_counter() - started, max(self.rowcount, 0))
+
+  def fetchone(self):
+    started = time.perf_counter()
+    row = super().fetchone()
+    self.record(time.perf_counter() - started, 0 if row is None else 1)
+    return row
+
+  def fetchmany(self, size=None):
+    started = time.perf_counter()
+    rows = super().fetchmany(self.arraysize if size is None else size)
+    self.record(time.perf_counter() - started, len(rows))
+    return rows
+
+  def fetchall(self):
+    started = time.perf_counter()
+    rows = super().fetchall()
+    self.record(time.perf_counter() - started, len(rows))
+    return rows
+
+  def record(self, seconds, rows):
+    if self.entry is not None:
+      self.profiler.record(self.connection, self.entry, seconds, rows)
@@ -0,0 +1,116 @@
+import threading
+from collections import OrderedDict
+
+# Rough per entry overhead (key, tuple, dict slots) counted against the byte budget
+ENTRY_OVERHEAD = 256
+
+# In-process LRU of rendered read responses, bounded by bytes. Entries are keyed
+# by route path plus normalized query args and tagged with the tables the route
+# reads. When a table's data version moves past the one the cache has seen,
+# every entry tagged with that table is dropped.
+#
+# Versions are tracked per scope: each learner shard has its own data_versions,
+# so a learner's versions only invalidate that learner's entries (scope None
+# is the main database). A scope's versions are forgotten together with its
+# last entry, so the bookkeeping stays bounded by the cached entries.
+class ResponseCache:
+  def __init__(self, max_bytes=32 * 1024 * 1024, max_entry_bytes=None):
+    self.max_bytes = max_bytes
+    self.max_entry_bytes = max_entry_bytes or max_bytes // 4
+    self.entries = OrderedDict()  # key -> (etag, body, mimetype, tags, size)
+    self.tagged = {}  # (scope, table) -> set of keys
+    self.known_versions = {}  # (scope, table) -> latest version seen, while tagged
+    self.size = 0
+    self.lock = threading.Lock()
+
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.invalidations = 0
+
+  # Drop entries of `scope` for tables that were written since we last looked.
+  # A request that read older versions than another one already reported
+  # changes nothing, its entries are caught by the etag check in get().
+  def observe(self, versions, scope=None):
+    with self.lock:
+      for table_name, version in versions.items():
+        tag = (scope, table_name)
+        known = self.known_versions.get(tag)
+        if known is None or version <= known:
+          continue
+        for key in list(self.tagged.get(tag, ())):
+          self.remove(key)
+          self.invalidations += 1
+        if tag in self.tagged:
+          self.known_versions[tag] = version
+
+  # Cached (body, mimetype) for key if it was rendered for this etag
+  def get(self, key, etag):
+    with self.lock:
+      entry = self.entries.get(key)
+      if entry is None:
+        self.misses += 1
+        return None
+      if entry[0] != etag:
+        self.remove(key)
+        self.invalidations += 1
+        self.misses += 1
+        return None
+      self.entries.move_to_end(key)
+      self.hits += 1
+      return entry[1], entry[2]
+
+  # Cache body for key, rendered from `versions` (table -> version) of `scope`
+  def put(self, key, etag, body, mimetype, versions, scope=None):
+    size = len(body) + len(key[0]) + ENTRY_OVERHEAD
+    if size > self.max_entry_bytes:
+      return
+    with self.lock:
+      if key in self.entries:
+        self.remove(key)
+      tags = [(scope, table_name) for table_name in versions]
+      self.entries[key] = (etag, body, mimetype, tags, size)
+      self.size += size
+      for tag in tags:
+        self.tagged.setdefault(tag, set()).add(key)
+        known = self.known_versions.get(tag)
+        if known is None or versions[tag[1]] > known:
+          self.known_versions[tag] = versions[tag[1]]
+      while self.size > self.max_bytes and self.entries:
+        self.remove(next(iter(self.entries)))
+        self.evictions += 1
+
+  # Caller holds the lock
+  def remove(self, key):
+    entry = self.entries.pop(key, None)
+    if entry is None:
+      return
+    self.size -= entry[4]
+    for tag in entry[3]:
+      keys = self.tagged.get(tag)
+      if keys is not None:
+        keys.discard(key)
+        if not keys:
+          del self.tagged[tag]
+          self.known_versions.pop(tag, None)
+
+  def clear(self):
+    with self.lock:
+      self.entries.clear()
+      self.tagged.clear()
+      self.known_versions.clear()
+      self.size = 0
+
+  def stats(self):
+    with self.lock:
+      lookups = self.hits + self.misses
+      return {
+        "entries": len(self.entries),
+        "bytes": self.size,
+        "max_bytes": self.max_bytes,
+        "hits": self.hits,
+        "misses": self.misses,
+        "hit_rate": self.hits / lookups if lookups else 0,
+        "evictions": self.evictions,
+        "invalidations": self.invalidations
+      }
@@ -0,0 +1,173 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from lib.reviews import record_reviews
+
+logger = logging.getLogger(__name__)
+
+# Durability of each group commit, applied as PRAGMA synchronous on the writer connection.
+# OFF never fsyncs, NORMAL fsyncs on WAL checkpoints, FULL fsyncs every commit.
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL')
+
+# Sentinel telling the writer thread to drain and exit
+STOP = object()
+
+class QueueFull(Exception):
+  pass
+
+# Raised by flush() when queued reviews are not written in time
+class FlushTimeout(Exception):
+  pass
+
+# Write-behind queue for review items. Requests enqueue validated reviews and
+# return immediately; a single writer thread drains the queue and group commits
+# every `flush_interval` seconds or `batch_size` reviews, whichever comes first.
+class ReviewQueue:
+  def __init__(self, db, max_size=10000, batch_size=500, flush_interval=0.05, synchronous='NORMAL'):
+    synchronous = synchronous.upper()
+    if synchronous not in SYNCHRONOUS_MODES:
+      raise ValueError(f'synchronous must be one of {", ".join(SYNCHRONOUS_MODES)}')
+    self.db = db
+    self.max_size = max_size
+    self.batch_size = batch_size
+    self.flush_interval = flush_interval
+    self.synchronous = synchronous
+    self.queue = queue.Queue(maxsize=max_size)
+    self.thread = None
+    self.closed = False
+
+    # Counters, guarded by stats_lock
+    self.stats_lock = threading.Lock()
+    self.enqueued = 0
+    self.committed = 0
+    self.failed = 0
+    self.rejected = 0
+    self.batches = 0
+    self.last_batch_size = 0
+    self.max_batch_size = 0
+
+  def start(self):
+    self.thread = threading.Thread(target=self.run, name='review-writer', daemon=True)
+    self.thread.start()
+    # Flush whatever is still queued when the process exits
+    atexit.register(self.close)
+    return self
+
+  # Enqueue reviews for a session, raises QueueFull when the writer is behind
+  def put(self, session_id, reviews):
+    if self.closed:
+      raise QueueFull('review queue is closed')
+    try:
+      self.queue.put_nowait((session_id, reviews))
+    except queue.Full:
+      with self.stats_lock:
+        self.rejected += len(reviews)
+      raise QueueFull('review queue is full')
+    with self.stats_lock:
+      self.enqueued += len(reviews)
+
+  # Block until everything enqueued so far has been committed. Raises
+  # FlushTimeout when the writer thread is not running or has not caught up
+  # within `timeout` seconds, rather than waiting forever.
+  def flush(self, timeout=30):
+    deadline = time.monotonic() + timeout
+    with self.queue.all_tasks_done:
+      while self.queue.unfinished_tasks:
+        if self.thread is None or not self.thread.is_alive():
+          raise FlushTimeout('review writer is not running')
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+          raise FlushTimeout(f'queued reviews were not written within {timeout}s')
+        # Wake up every second to notice a writer that died
+        self.queue.all_tasks_done.wait(min(remaining, 1))
+
+  def close(self, timeout=30):
+    if self.closed or self.thread is None:
+      return
+    self.closed = True
+    self.queue.put(STOP)
+    self.thread.join(timeout)
+
+  def run(self):
+    # The writer has its own connection, outside the request pool
+    connection = self.db.connect()
+    connection.execute(f'PRAGMA synchronous = {self.synchronous}')
+    try:
+      stopping = False
+      while not stopping:
+        item = self.queue.get()
+        batch = []
+        size = 0
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+          if item is STOP:
+            self.queue.task_done()
+            stopping = True
+            break
+          batch.append(item)
+          size += len(item[1])
+          if size >= self.batch_size:
+            break
+          timeout = deadline - time.monotonic()
+          if timeout <= 0:
+            break
+          try:
+            item = self.queue.get(timeout=timeout)
+          except queue.Empty:
+            break
+        if batch:
+          self.commit(connection, batch)
+    finally:
+      connection.close()
+
+  def commit(self, connection, batch):
+    cursor = connection.cursor()
+    committed = 0
+    failed = 0
+    try:
+      for session_id, reviews in batch:
+        record_reviews(cursor, session_id, reviews)
+      connection.commit()
+      committed = sum(len(reviews) for _, reviews in batch)
+    except Exception:
+      connection.rollback()
+      logger.exception('Group commit of %d queued review batches failed, retrying individually', len(batch))
+      # Retry one entry at a time so a single bad entry does not lose the rest
+      for session_id, reviews in batch:
+        try:
+          record_reviews(cursor, session_id, reviews)
+          connection.commit()
+          committed += len(reviews)
+        except Exception:
+          connection.rollback()
+          logger.exception('Dropping %d queued reviews for study session %s', len(reviews), session_id)
+          failed += len(reviews)
+    finally:
+      for _ in batch:
+        self.queue.task_done()
+
+    with self.stats_lock:
+      self.committed += committed
+      self.failed += failed
+      self.batches += 1
+      self.last_batch_size = committed + failed
+      self.max_batch_size = max(self.max_batch_size, self.last_batch_size)
+
+  def stats(self):
+    with self.stats_lock:
+      return {
+        "depth": self.queue.qsize(),
+        "capacity": self.max_size,
+        "enqueued": self.enqueued,
+        "committed": self.committed,
+        "failed": self.failed,
+        "rejected": self.rejected,
+        "batches": self.batches,
+        "last_batch_size": self.last_batch_size,
+        "max_batch_size": self.max_batch_size,
+        "avg_batch_size": (self.committed + self.failed) / self.batches if self.batches else 0,
+        "synchronous": self.synchronous
+      }
@@ -0,0 +1,128 @@
+from datetime import datetime, timezone
+
+from lib.stats import update_word_stats
+from lib.activity import record_review_activity
+from lib.scheduler import update_schedule
+
+# Upper bound on reviews accepted in one batch request
+MAX_BATCH_SIZE = 1000
+
+# Fold per word counts into the aggregate row, relies on the unique index on
+# word_reviews.word_id. last_reviewed is in UTC like the review items, NULL
+# stands for CURRENT_TIMESTAMP.
+UPSERT_WORD_REVIEW = '''
+  INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+  VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+  ON CONFLICT(word_id) DO UPDATE SET
+    correct_count = correct_count + excluded.correct_count,
+    wrong_count = wrong_count + excluded.wrong_count,
+    last_reviewed = MAX(last_reviewed, excluded.last_reviewed)
+'''
+
+# Normalize a client supplied timestamp to the UTC format used by CURRENT_TIMESTAMP
+def parse_created_at(value):
+  if value is None:
+    return None
+  if not isinstance(value, str):
+    raise ValueError('created_at must be an ISO 8601 string')
+  created_at = datetime.fromisoformat(value)
+  if created_at.tzinfo is not None:
+    created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+  return created_at.strftime('%Y-%m-%d %H:%M:%S')
+
+# `correct` is true/false, or 1/0 for older clients. Strings such as "false"
+# are rejected rather than counted by their truthiness.
+def is_correct_flag(value):
+  return isinstance(value, bool) or (isinstance(value, int) and value in (0, 1))
+
+# Validate a batch payload, either a list of reviews or {"reviews": [...]},
+# into a list of (word_id, correct, created_at). Raises ValueError.
+def parse_reviews(payload):
+  if isinstance(payload, dict):
+    payload = payload.get('reviews')
+  if not isinstance(payload, list) or not payload:
+    raise ValueError('a non-empty array of reviews is required')
+  if len(payload) > MAX_BATCH_SIZE:
+    raise ValueError(f'at most {MAX_BATCH_SIZE} reviews can be logged per request')
+
+  reviews = []
+  for index, item in enumerate(payload):
+    if not isinstance(item, dict):
+      raise ValueError(f'review {index} must be an object')
+    word_id = item.get('word_id')
+    correct = item.get('correct')
+    if word_id is None or correct is None:
+      raise ValueError(f'review {index}: word_id and correct fields are required')
+    if not isinstance(word_id, int) or isinstance(word_id, bool):
+      raise ValueError(f'review {index}: word_id must be an integer')
+    if not is_correct_flag(correct):
+      raise ValueError(f'review {index}: correct must be a boolean')
+    try:
+      created_at = parse_created_at(item.get('created_at'))
+    except ValueError as e:
+      raise ValueError(f'review {index}: {e}')
+    reviews.append((word_id, 1 if correct else 0, created_at))
+  return reviews
+
+# Return the subset of word_ids that do not exist, using a single IN query
+def missing_word_ids(cursor, word_ids):
+  word_ids = set(word_ids)
+  placeholders = ','.join('?' * len(word_ids))
+  cursor.execute(f'SELECT id FROM words WHERE id IN ({placeholders})', tuple(word_ids))
+  return sorted(word_ids - {row[0] for row in cursor.fetchall()})
+
+# Insert review items for a session and fold them into the per word aggregates.
+# `reviews` is a list of (word_id, correct, created_at), created_at may be None.
+# Runs inside the caller's transaction, the caller commits.
+def record_reviews(cursor, session_id, reviews):
+  cursor.executemany('''
+    INSERT INTO word_review_items (word_id, correct, study_session_id, created_at)
+    VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+  ''', [(word_id, correct, session_id, created_at) for word_id, correct, created_at in reviews])
+
+  # One upsert per distinct word rather than per review. A word's last
+  # review is the latest created_at of its reviews, or now (None) when any
+  # of them is stamped with CURRENT_TIMESTAMP.
+  counts = {}
+  last_reviewed = {}
+  for word_id, correct, created_at in reviews:
+    correct_count, wrong_count = counts.get(word_id, (0, 0))
+    if correct:
+      counts[word_id] = (correct_count + 1, wrong_count)
+    else:
+      counts[word_id] = (correct_count, wrong_count + 1)
+    if created_at is None or last_reviewed.get(word_id, '') is None:
+      last_reviewed[word_id] = None
+    else:
+      last_reviewed[word_id] = max(created_at, last_reviewed.get(word_id) or created_at)
+
+  cursor.executemany(UPSERT_WORD_REVIEW, [
+    (word_id, correct_count, wrong_count, last_reviewed[word_id])
+    for word_id, (correct_count, wrong_count) in counts.items()
+  ])
+
+  # Roll the reviews up into the session row
+  explicit = [created_at for _, _, created_at in reviews if created_at is not None]
+  cursor.execute('''
+    UPDATE study_sessions SET
+      review_count = review_count + ?,
+      correct_count = correct_count + ?,
+      last_activity_at = MAX(
+        COALESCE(last_activity_at, ''),
+        COALESCE(?, ''),
+        CASE WHEN ? THEN CURRENT_TIMESTAMP ELSE '' END
+      )
+    WHERE id = ?
+  ''', (
+    len(reviews),
+    sum(correct for _, correct, _ in reviews),
+    max(explicit) if explicit else None,
+    len(explicit) < len(reviews),  # some reviews are stamped with CURRENT_TIMESTAMP
+    session_id
+  ))
+
+  # Keep the materialized dashboard statistics, daily rollup and review
+  # schedule in the same transaction
+  update_word_stats(cursor, counts)
+  record_review_activity(cursor, reviews)
+  update_schedule(cursor, reviews)
@@ -0,0 +1,212 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+from lib.shards import is_shard
+
+# SM-2 spaced repetition over the binary correct/wrong reviews the activities
+# log. Each word's state lives in word_schedule and its due_at is copied onto
+# its word_groups rows, where idx_word_groups_group_id_due_at turns picking a
+# group's next words into a few index range scans. On a learner shard
+# word_groups is shared (lib/shards.py), so due_at is read from
+# word_schedule instead.
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+# SM-2 answer quality (0-5) assumed for a correct and a wrong review
+CORRECT_QUALITY = 4
+WRONG_QUALITY = 2
+
+# A missed word comes back within the same sitting
+RELEARN_DELAY = timedelta(minutes=10)
+
+# Intervals stop growing after ten years, long runs of correct answers
+# would otherwise overflow datetime
+MAX_INTERVAL_DAYS = 3650.0
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# (ease, interval_days, repetitions, lapses) of a word never reviewed
+NEW_STATE = (DEFAULT_EASE, 0.0, 0, 0)
+
+MAX_NEXT_WORDS = 100
+
+def utc_now():
+  return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# State and due time after one review at `reviewed_at` (naive UTC datetime)
+def next_state(state, correct, reviewed_at):
+  ease, interval_days, repetitions, lapses = state
+  quality = CORRECT_QUALITY if correct else WRONG_QUALITY
+  ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+  if correct:
+    repetitions += 1
+    if repetitions == 1:
+      interval_days = 1.0
+    elif repetitions == 2:
+      interval_days = 6.0
+    else:
+      interval_days = min(MAX_INTERVAL_DAYS, round(interval_days * ease, 2))
+    due_at = reviewed_at + timedelta(days=interval_days)
+  else:
+    repetitions = 0
+    lapses += 1
+    interval_days = 0.0
+    due_at = reviewed_at + RELEARN_DELAY
+  return (round(ease, 4), interval_days, repetitions, lapses), due_at.strftime(TIMESTAMP_FORMAT)
+
+# Replay (word_id, correct, created_at) reviews in order over `states`, a dict
+# of word_id -> (state, due_at) that is updated in place
+def replay(states, reviews, now):
+  for word_id, correct, created_at in reviews:
+    # fromisoformat parses TIMESTAMP_FORMAT, several times faster than strptime
+    reviewed_at = datetime.fromisoformat(created_at) if created_at else now
+    state = states[word_id][0] if word_id in states else NEW_STATE
+    states[word_id] = next_state(state, correct, reviewed_at)
+  return states
+
+def save_states(cursor, states):
+  cursor.executemany('''
+    INSERT INTO word_schedule (word_id, ease, interval_days, repetitions, lapses, due_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(word_id) DO UPDATE SET
+      ease = excluded.ease,
+      interval_days = excluded.interval_days,
+      repetitions = excluded.repetitions,
+      lapses = excluded.lapses,
+      due_at = excluded.due_at
+  ''', [(word_id, *state, due_at) for word_id, (state, due_at) in states.items()])
+  if is_shard(cursor.connection):
+    return
+  cursor.executemany('UPDATE word_groups SET due_at = ? WHERE word_id = ?', [
+    (due_at, word_id) for word_id, (_, due_at) in states.items()
+  ])
+
+# Reschedule the words of a review batch, called from record_reviews inside
+# the caller's transaction
+def update_schedule(cursor, reviews):
+  word_ids = {review[0] for review in reviews}
+  placeholders = ','.join('?' * len(word_ids))
+  cursor.execute(f'''
+    SELECT word_id, ease, interval_days, repetitions, lapses, due_at
+    FROM word_schedule WHERE word_id IN ({placeholders})
+  ''', tuple(word_ids))
+  states = {row[0]: ((row[1], row[2], row[3], row[4]), row[5]) for row in cursor.fetchall()}
+  save_states(cursor, replay(states, reviews, utc_now()))
+
+def reset_schedule(cursor):
+  cursor.execute('DELETE FROM word_schedule')
+  if not is_shard(cursor.connection):
+    cursor.execute('UPDATE word_groups SET due_at = NULL WHERE due_at IS NOT NULL')
+
+# Steps of next_words in priority order: overdue words, most overdue first,
+# then words never reviewed, then the words coming due soonest
+NEXT_WORDS_STEPS = (
+  ('due', '{due_at} <= :now', '{due_at}'),
+  ('new', '{due_at} IS NULL', 'wg.word_id'),
+  ('ahead', '{due_at} > :now', '{due_at}')
+)
+
+NEXT_WORDS_SQL = '''
+  SELECT w.id, w.kanji, w.romaji, w.english, w.parts, {due_at} as due_at
+  FROM word_groups wg
+  JOIN words w ON w.id = wg.word_id
+  {join}
+  WHERE wg.group_id = :group_id AND {condition}
+  ORDER BY {order}
+  LIMIT :limit
+'''
+
+# (sql, parameters) of each step, `limit` is what is still missing
+def next_words_query(step, group_id, limit, now, shard=False):
+  _, condition, order = step
+  if shard:
+    due_at, join = 's.due_at', 'LEFT JOIN word_schedule s ON s.word_id = wg.word_id'
+  else:
+    due_at, join = 'wg.due_at', ''
+  return NEXT_WORDS_SQL.format(
+    condition=condition.format(due_at=due_at),
+    order=order.format(due_at=due_at),
+    join=join,
+    due_at=due_at
+  ), {
+    "group_id": group_id,
+    "now": now.strftime(TIMESTAMP_FORMAT),
+    "limit": limit
+  }
+
+# Up to `n` (state, row) of a group to study next
+def next_words(cursor, group_id, n, now=None):
+  now = now or utc_now()
+  shard = is_shard(cursor.connection)
+  picked = []
+  for step in NEXT_WORDS_STEPS:
+    if len(picked) >= n:
+      break
+    cursor.execute(*next_words_query(step, group_id, n - len(picked), now, shard))
+    picked.extend((step[0], row) for row in cursor.fetchall())
+  return picked
+
+def next_word_json(state, row):
+  return {
+    "id": row["id"],
+    "kanji": row["kanji"],
+    "romaji": row["romaji"],
+    "english": row["english"],
+    "parts": json.loads(row["parts"]),
+    "due_at": row["due_at"],
+    "state": state
+  }
+
+# State and due time after `wrong` wrong reviews (interleaved with any number
+# of correct ones) followed by a run of `run` correct reviews, the last one
+# at `reviewed_at`: the same as replaying them one by one. A wrong review
+# resets everything but the ease and the lapses, and a correct one leaves the
+# ease as it is, so only the number of wrong reviews and the final run
+# matter. For bulk loads that write review items without going through
+# update_schedule (lib/synthetic.py).
+def skip_ahead(state, wrong, run, reviewed_at):
+  due_at = None
+  if wrong:
+    ease, _, _, lapses = state
+    # Every wrong review lowers the ease until it bottoms out at MIN_EASE
+    for _ in range(wrong - 1):
+      lowered = next_state((ease, 0.0, 0, 0), False, reviewed_at)[0][0]
+      if lowered == ease:
+        break
+      ease = lowered
+    state, due_at = next_state((ease, 0.0, 0, lapses + wrong - 1), False, reviewed_at)
+  for _ in range(run):
+    state, due_at = next_state(state, True, reviewed_at)
+  return state, due_at
+
+# Recompute word_schedule and word_groups.due_at by replaying the review
+# history. Returns the differences found, see lib.stats.rebuild_learning_stats.
+# The replay needs every review in order, `source` is the table expression
+# to read them from (see lib.archive.review_items_source).
+def rebuild_schedule(cursor, check=False, source='word_review_items'):
+  cursor.execute(f'SELECT word_id, correct, created_at FROM {source} ORDER BY id')
+  expected = replay({}, ((row[0], row[1], row[2]) for row in cursor.fetchall()), utc_now())
+
+  cursor.execute('SELECT word_id, ease, interval_days, repetitions, lapses, due_at FROM word_schedule')
+  stored = {row[0]: ((row[1], row[2], row[3], row[4]), row[5]) for row in cursor.fetchall()}
+
+  drift = []
+  for word_id in sorted(set(expected) | set(stored)):
+    if stored.get(word_id) != expected.get(word_id):
+      drift.append(f'word_schedule[{word_id}]: stored {stored.get(word_id)}, expected {expected.get(word_id)}')
+  stale = 0
+  if not is_shard(cursor.connection):
+    cursor.execute('''
+      SELECT COUNT(*) FROM word_groups wg
+      LEFT JOIN word_schedule s ON s.word_id = wg.word_id
+      WHERE wg.due_at IS NOT s.due_at
+    ''')
+    stale = cursor.fetchone()[0]
+  if stale:
+    drift.append(f'word_groups.due_at: {stale} rows differ from word_schedule')
+
+  if not check and drift:
+    reset_schedule(cursor)
+    save_states(cursor, expected)
+  return drift
@@ -0,0 +1,64 @@
+import os
+import re
+import sqlite3
+
+from lib.migrations import create_tables, apply_migrations
+
+# Per learner sharding. Each learner's sessions, reviews, statistics and
+# schedule live in their own SQLite file, so writes of different learners
+# never wait on the same lock. The shared vocabulary stays in the main
+# database, which every shard connection ATTACHes as `common`; TEMP views
+# shadow the shard's own (empty) copies of the shared tables, so the routes'
+# unqualified queries read the shared rows, and writes to them through a
+# shard fail instead of silently forking the vocabulary.
+
+COMMON_SCHEMA = 'common'
+
+# Tables read from the common database
+SHARED_TABLES = ('words', 'groups', 'word_groups', 'study_activities')
+
+# Learner ids are used in file names
+LEARNER_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def shard_path(directory, learner_id):
+  return os.path.join(directory, f'learner-{learner_id}.db')
+
+# Create the schema of a new shard at `path` unless it exists. The shard gets
+# the full schema, so migrations apply to it like to the main database, minus
+# words_fts: without a local one, MATCH queries resolve to common.words_fts.
+def create_shard(path):
+  if os.path.exists(path):
+    return False
+  os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+  partial = path + '.partial'
+  if os.path.exists(partial):
+    os.remove(partial)
+  connection = sqlite3.connect(partial)
+  try:
+    create_tables(connection)
+    apply_migrations(connection)
+    connection.execute('DROP TABLE words_fts')
+    connection.commit()
+  finally:
+    connection.close()
+  os.replace(partial, path)
+  return True
+
+def is_shard(connection):
+  return any(row[1] == COMMON_SCHEMA for row in connection.execute('PRAGMA database_list'))
+
+# Attach the common database at `path` to a shard connection and shadow the
+# shared tables with it. Runs before the connection is made query_only.
+def attach_common(connection, path):
+  connection.execute(f'ATTACH DATABASE ? AS {COMMON_SCHEMA}', (path,))
+  for table in SHARED_TABLES:
+    connection.execute(f'CREATE TEMP VIEW {table} AS SELECT * FROM {COMMON_SCHEMA}.{table}')
+  # Data versions of the shared tables come from the common database, the
+  # shard's triggers keep writing main.data_versions
+  placeholders = ','.join(f"'{table}'" for table in SHARED_TABLES)
+  connection.execute(f'''
+    CREATE TEMP VIEW data_versions AS
+    SELECT * FROM main.data_versions WHERE table_name NOT IN ({placeholders})
+    UNION ALL
+    SELECT * FROM {COMMON_SCHEMA}.data_versions WHERE table_name IN ({placeholders})
+  ''')
@@ -0,0 +1,142 @@
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import g
+
+from lib.db import ConnectionPool, CONNECTION_PRAGMAS
+
+logger = logging.getLogger(__name__)
+
+# Periodic read-only copy of the database for analytic reads that can be a
+# little stale. A background thread copies the live database with the online
+# backup API, from one read transaction so the copy is consistent, every
+# `interval` seconds or after `every_writes` write requests, whichever comes
+# first. The copy is written next to the snapshot and renamed over it, so
+# readers never see a partial file; connections to the previous copy are
+# retired with its pool.
+class Snapshot:
+  def __init__(self, db, path, interval=30, every_writes=1000, pool_size=8):
+    self.db = db
+    self.path = path
+    self.interval = interval
+    self.every_writes = every_writes
+    self.pool_size = pool_size
+    self.pool = None
+    self.taken_at = None
+    self.lock = threading.Lock()
+    self.wake = threading.Event()
+    self.thread = None
+    self.closed = False
+
+    # Counters, guarded by lock
+    self.writes = 0
+    self.refreshes = 0
+    self.failures = 0
+    self.last_refresh_seconds = 0.0
+
+  def start(self):
+    self.thread = threading.Thread(target=self.run, name='snapshot', daemon=True)
+    self.thread.start()
+    atexit.register(self.close)
+    return self
+
+  def run(self):
+    while not self.closed:
+      try:
+        self.refresh()
+      except Exception:
+        with self.lock:
+          self.failures += 1
+        logger.exception('Snapshot refresh failed')
+      self.wake.wait(self.interval)
+      self.wake.clear()
+
+  # Count a committed write, wakes the refresher every `every_writes`
+  def note_write(self):
+    with self.lock:
+      self.writes += 1
+      due = self.every_writes and self.writes >= self.every_writes
+    if due:
+      self.wake.set()
+
+  def connect(self):
+    # immutable: the file is never changed in place, so skip locking entirely
+    connection = sqlite3.connect(f'file:{self.path}?mode=ro&immutable=1', uri=True, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    for pragma in CONNECTION_PRAGMAS:
+      connection.execute(pragma)
+    return connection
+
+  def refresh(self):
+    started = time.perf_counter()
+    taken_at = time.time()
+    with self.lock:
+      self.writes = 0
+    partial = self.path + '.partial'
+    if os.path.exists(partial):
+      os.remove(partial)
+    target = sqlite3.connect(partial)
+    try:
+      with self.db.connection(readonly=True) as source:
+        source.backup(target)
+      target.execute('PRAGMA journal_mode = DELETE')
+    finally:
+      target.close()
+    os.replace(partial, self.path)
+
+    pool = ConnectionPool(self.connect, self.pool_size)
+    with self.lock:
+      previous, self.pool = self.pool, pool
+      self.taken_at = taken_at
+      self.refreshes += 1
+      self.last_refresh_seconds = time.perf_counter() - started
+    # Connections still lent out are closed when they are garbage collected
+    if previous is not None:
+      previous.close()
+
+  # Pool of the current copy, None until the first one is taken
+  def current_pool(self):
+    with self.lock:
+      return self.pool
+
+  # Seconds since the current copy was taken, an upper bound on how stale it is
+  def age(self):
+    with self.lock:
+      taken_at = self.taken_at
+    return None if taken_at is None else max(0.0, time.time() - taken_at)
+
+  def stats(self):
+    age = self.age()
+    with self.lock:
+      return {
+        "age_seconds": age,
+        "refreshes": self.refreshes,
+        "failures": self.failures,
+        "writes_since_refresh": self.writes,
+        "last_refresh_seconds": self.last_refresh_seconds
+      }
+
+  def close(self):
+    if self.closed:
+      return
+    self.closed = True
+    self.wake.set()
+    if self.thread is not None:
+      self.thread.join()
+    pool = self.current_pool()
+    if pool is not None:
+      pool.close()
+
+# Mark a read route as fine with data up to one snapshot interval old. Put
+# it above @conditional so the validators come from the same snapshot. The
+# app answers with an X-Snapshot-Age header when the snapshot was used.
+def stale_ok(view):
+  @wraps(view)
+  def wrapper(*args, **kwargs):
+    g.stale_ok = True
+    return view(*args, **kwargs)
+  return wrapper
@@ -0,0 +1,151 @@
+# Materialized learning statistics (word_stats and the single learning_stats
+# row). Every writer of review history goes through these helpers inside its
+# own transaction, so the dashboard can read the summary with one lookup.
+
+# A word is mastered after at least 5 attempts with an 80% success rate
+MASTERY_MIN_ATTEMPTS = 5
+MASTERY_SUCCESS_RATE = 0.8
+
+SUMMARY_COLUMNS = ('total_reviews', 'correct_reviews', 'words_studied', 'mastered_words', 'total_sessions')
+
+def is_mastered(attempts, correct):
+  return attempts >= MASTERY_MIN_ATTEMPTS and correct * 1.0 / attempts >= MASTERY_SUCCESS_RATE
+
+# Fold new review counts, {word_id: (correct_count, wrong_count)}, into word_stats
+# and adjust the summary row by the resulting change in studied/mastered words
+def update_word_stats(cursor, counts):
+  if not counts:
+    return
+  placeholders = ','.join('?' * len(counts))
+  cursor.execute(f'''
+    SELECT word_id, attempts, correct FROM word_stats WHERE word_id IN ({placeholders})
+  ''', tuple(counts))
+  existing = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+  total_reviews = correct_reviews = words_studied = mastered_words = 0
+  rows = []
+  for word_id, (correct_count, wrong_count) in counts.items():
+    attempts, correct = existing.get(word_id, (0, 0))
+    new_attempts = attempts + correct_count + wrong_count
+    new_correct = correct + correct_count
+
+    total_reviews += correct_count + wrong_count
+    correct_reviews += correct_count
+    if word_id not in existing:
+      words_studied += 1
+    mastered_words += int(is_mastered(new_attempts, new_correct)) - int(attempts > 0 and is_mastered(attempts, correct))
+    rows.append((word_id, new_attempts, new_correct))
+
+  cursor.executemany('''
+    INSERT INTO word_stats (word_id, attempts, correct) VALUES (?, ?, ?)
+    ON CONFLICT(word_id) DO UPDATE SET attempts = excluded.attempts, correct = excluded.correct
+  ''', rows)
+  cursor.execute('''
+    UPDATE learning_stats SET
+      total_reviews = total_reviews + ?,
+      correct_reviews = correct_reviews + ?,
+      words_studied = words_studied + ?,
+      mastered_words = mastered_words + ?
+    WHERE id = 1
+  ''', (total_reviews, correct_reviews, words_studied, mastered_words))
+
+def increment_sessions(cursor, count=1):
+  cursor.execute('UPDATE learning_stats SET total_sessions = total_sessions + ? WHERE id = 1', (count,))
+
+# Clear the materialized state together with the review history
+def reset_learning_stats(cursor):
+  cursor.execute('DELETE FROM word_stats')
+  cursor.execute(f'''
+    UPDATE learning_stats SET {', '.join(column + ' = 0' for column in SUMMARY_COLUMNS)} WHERE id = 1
+  ''')
+
+def read_learning_stats(cursor):
+  cursor.execute(f'SELECT {", ".join(SUMMARY_COLUMNS)} FROM learning_stats WHERE id = 1')
+  row = cursor.fetchone()
+  if row is None:
+    return dict.fromkeys(SUMMARY_COLUMNS, 0)
+  return {column: row[column] for column in SUMMARY_COLUMNS}
+
+# Recompute the materialized state from raw history. Returns a list of
+# human readable differences from what was stored; unless `check` is set
+# the stored state is replaced with the recomputed one.
+def rebuild_learning_stats(cursor, check=False):
+  cursor.execute('''
+    SELECT wri.word_id, COUNT(*) as attempts, SUM(CASE WHEN wri.correct = 1 THEN 1 ELSE 0 END) as correct
+    FROM word_review_items wri
+    JOIN study_sessions ss ON wri.study_session_id = ss.id
+    GROUP BY wri.word_id
+  ''')
+  expected_words = {row['word_id']: (row['attempts'], row['correct']) for row in cursor.fetchall()}
+  # Plus the aggregates left behind by archived review items, see lib/archive.py
+  cursor.execute('SELECT word_id, SUM(attempts), SUM(correct) FROM word_review_daily GROUP BY word_id')
+  for word_id, attempts, correct in cursor.fetchall():
+    hot_attempts, hot_correct = expected_words.get(word_id, (0, 0))
+    expected_words[word_id] = (hot_attempts + attempts, hot_correct + correct)
+  cursor.execute('SELECT COUNT(*) FROM study_sessions')
+  total_sessions = cursor.fetchone()[0]
+
+  expected = {
+    'total_reviews': sum(attempts for attempts, _ in expected_words.values()),
+    'correct_reviews': sum(correct for _, correct in expected_words.values()),
+    'words_studied': len(expected_words),
+    'mastered_words': sum(1 for attempts, correct in expected_words.values() if is_mastered(attempts, correct)),
+    'total_sessions': total_sessions
+  }
+
+  cursor.execute('SELECT word_id, attempts, correct FROM word_stats')
+  stored_words = {row['word_id']: (row['attempts'], row['correct']) for row in cursor.fetchall()}
+  stored = read_learning_stats(cursor)
+
+  drift = []
+  for column in SUMMARY_COLUMNS:
+    if stored[column] != expected[column]:
+      drift.append(f'learning_stats.{column}: stored {stored[column]}, expected {expected[column]}')
+  for word_id in sorted(set(expected_words) | set(stored_words)):
+    if stored_words.get(word_id) != expected_words.get(word_id):
+      drift.append(f'word_stats[{word_id}]: stored {stored_words.get(word_id)}, expected {expected_words.get(word_id)}')
+
+  if not check:
+    cursor.execute('DELETE FROM word_stats')
+    cursor.executemany('INSERT INTO word_stats (word_id, attempts, correct) VALUES (?, ?, ?)', [
+      (word_id, attempts, correct) for word_id, (attempts, correct) in expected_words.items()
+    ])
+    cursor.execute('INSERT OR IGNORE INTO learning_stats (id) VALUES (1)')
+    cursor.execute(f'''
+      UPDATE learning_stats SET {', '.join(column + ' = ?' for column in SUMMARY_COLUMNS)} WHERE id = 1
+    ''', tuple(expected[column] for column in SUMMARY_COLUMNS))
+  return drift
+
+# Recompute the study_sessions rollup columns from their review items.
+# Archived sessions keep their rollups, their items are no longer here.
+def rebuild_session_rollups(cursor, check=False):
+  cursor.execute('''
+    SELECT
+      ss.id,
+      ss.review_count,
+      ss.correct_count,
+      ss.last_activity_at,
+      COUNT(wri.id) as expected_review_count,
+      COUNT(CASE WHEN wri.correct = 1 THEN 1 END) as expected_correct_count,
+      MAX(wri.created_at) as expected_last_activity_at
+    FROM study_sessions ss
+    LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
+    WHERE ss.archived_at IS NULL
+    GROUP BY ss.id
+  ''')
+  drift = []
+  for row in cursor.fetchall():
+    stored = (row['review_count'], row['correct_count'], row['last_activity_at'])
+    expected = (row['expected_review_count'], row['expected_correct_count'], row['expected_last_activity_at'])
+    if stored != expected:
+      drift.append(f'study_sessions[{row["id"]}]: stored {stored}, expected {expected}')
+
+  if not check and drift:
+    cursor.execute('''
+      UPDATE study_sessions SET
+        last_activity_at = (SELECT MAX(created_at) FROM word_review_items WHERE study_session_id = study_sessions.id),
+        review_count = (SELECT COUNT(*) FROM word_review_items WHERE study_session_id = study_sessions.id),
+        correct_count = (SELECT COUNT(*) FROM word_review_items WHERE study_session_id = study_sessions.id AND correct = 1)
+      WHERE archived_at IS NULL
+    ''')
+  return drift
@@ -0,0 +1,376 @@
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from lib.stats import MASTERY_MIN_ATTEMPTS, MASTERY_SUCCESS_RATE
+from lib.scheduler import NEW_STATE, skip_ahead, save_states
+
+# Synthetic data for scaling tests: words with plausible kanji/romaji parts,
+# overlapping groups, and study sessions whose review counts follow a power
+# law. Review items are expanded inside SQLite from a per-session plan, so a
+# 10M review database takes under a minute rather than Python row building.
+
+SYLLABLES = (
+  'a', 'i', 'u', 'e', 'o', 'ka', 'ki', 'ku', 'ke', 'ko', 'sa', 'shi', 'su', 'se', 'so',
+  'ta', 'chi', 'tsu', 'te', 'to', 'na', 'ni', 'nu', 'ne', 'no', 'ha', 'hi', 'fu', 'he', 'ho',
+  'ma', 'mi', 'mu', 'me', 'mo', 'ya', 'yu', 'yo', 'ra', 'ri', 'ru', 're', 'ro', 'wa', 'n',
+  'ga', 'gi', 'gu', 'ge', 'go', 'za', 'ji', 'zu', 'ze', 'zo', 'da', 'de', 'do', 'ba', 'bi',
+  'bu', 'be', 'bo', 'pa', 'pi', 'pu', 'pe', 'po', 'kyo', 'sho', 'ryu', 'cha', 'jo'
+)
+OKURIGANA = (('う', 'u'), ('く', 'ku'), ('る', 'ru'), ('い', 'i'), ('む', 'mu'), ('す', 'su'), ('つ', 'tsu'))
+GLOSSES = (
+  'to go', 'to eat', 'to see', 'to write', 'to carry', 'to wait', 'to pay', 'to learn',
+  'high', 'cold', 'quiet', 'busy', 'river', 'mountain', 'book', 'station', 'letter', 'season'
+)
+
+# CJK unified ideographs block
+KANJI_FIRST = 0x4E00
+KANJI_COUNT = 20902
+
+# Shape of review items: seconds between two reviews of a session and the
+# share answered correctly
+REVIEW_SPACING_SECONDS = 15
+CORRECT_RATE = 0.7
+
+# Whether review item `id` was answered correctly: a multiplicative hash of the
+# id against CORRECT_RATE (as :correct_rate per mille)
+CORRECT_SQL = '(({id}) * 2654435761 >> 16) % 1000 < :correct_rate'
+
+# UTC julian day number of the `i`th review of plan row `p`, rounded to the
+# millisecond like datetime() formats its created_at
+DAY_NUMBER_SQL = '(CAST((p.started + {i} * :spacing) * 86400000 + 0.5 AS INTEGER) + 43200000) / 86400000'
+
+# Indexes on word_review_items from sql/migrations/0001_performance_indexes.sql
+SESSION_INDEX = 'idx_word_review_items_study_session_id'
+WORD_INDEX = 'idx_word_review_items_word_id'
+
+# Rows per executemany call
+BATCH_SIZE = 10000
+
+# Tables whose triggers are suspended during generation, see generate()
+BULK_TABLES = ('words', 'groups', 'word_groups', 'word_review_items', 'study_sessions', 'word_reviews')
+
+def make_word(rng, index):
+  parts = []
+  for _ in range(rng.randint(1, 3)):
+    parts.append({
+      "kanji": chr(KANJI_FIRST + rng.randrange(KANJI_COUNT)),
+      "romaji": [rng.choice(SYLLABLES) for _ in range(rng.randint(1, 2))]
+    })
+  if rng.random() < 0.5:
+    kana, romaji = rng.choice(OKURIGANA)
+    parts.append({"kanji": kana, "romaji": [romaji]})
+  return (
+    ''.join(part['kanji'] for part in parts),
+    ''.join(''.join(part['romaji']) for part in parts),
+    f'{rng.choice(GLOSSES)} ({index})',
+    json.dumps(parts)
+  )
+
+# Review counts of `sessions` sessions adding up to `reviews`, Pareto
+# distributed with shape `alpha` so a few sessions hold most of the reviews
+def power_law_counts(rng, sessions, reviews, alpha):
+  weights = [rng.paretovariate(alpha) for _ in range(sessions)]
+  scale = reviews / sum(weights)
+  counts = [max(1, int(weight * scale)) for weight in weights]
+  # Hand the rounding difference to the largest sessions
+  difference = reviews - sum(counts)
+  order = sorted(range(sessions), key=counts.__getitem__, reverse=True)
+  index = 0
+  while difference != 0 and index < 10 * sessions:
+    position = order[index % sessions]
+    step = 1 if difference > 0 else -1
+    if counts[position] + step >= 1:
+      counts[position] += step
+      difference -= step
+    index += 1
+  return counts
+
+def log(message, started):
+  print(f'[{time.perf_counter() - started:6.1f}s] {message}')
+
+# Generate the dataset through `connection` in a single transaction. Per row
+# triggers (data versions, FTS, payload_json) would double the write volume,
+# so they are dropped for the duration and their effects applied set-based
+# before they are recreated; nothing else can observe the gap.
+def generate(connection, words=10000, groups=50, sessions=100000, reviews=10000000, days=365, alpha=1.5, seed=0, verbose=True):
+  rng = random.Random(seed)
+  started = time.perf_counter()
+  report = (lambda message: log(message, started)) if verbose else (lambda message: None)
+  cursor = connection.cursor()
+  cursor.execute('PRAGMA cache_size = -262144')  # 256 MiB for the index builds
+  cursor.execute('PRAGMA threads = 4')  # parallel sorts for GROUP BY and CREATE INDEX
+
+  placeholders = ','.join('?' * len(BULK_TABLES))
+  cursor.execute(f'''
+    SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name IN ({placeholders})
+  ''', BULK_TABLES)
+  triggers = cursor.fetchall()
+
+  try:
+    cursor.execute('BEGIN')
+    for name, _ in triggers:
+      cursor.execute(f'DROP TRIGGER {name}')
+
+    # Words
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM words')
+    first_word = cursor.fetchone()[0] + 1
+    for offset in range(0, words, BATCH_SIZE):
+      cursor.executemany('INSERT INTO words (kanji, romaji, english, parts) VALUES (?, ?, ?, ?)', [
+        make_word(rng, index) for index in range(offset, min(words, offset + BATCH_SIZE))
+      ])
+    cursor.execute('''
+      UPDATE words SET payload_json = json_object(
+        'english', english, 'id', id, 'kanji', kanji, 'parts', json(parts), 'romaji', romaji
+      ) WHERE id >= ?
+    ''', (first_word,))
+    cursor.execute("INSERT INTO words_fts (words_fts) VALUES ('rebuild')")
+    report(f'{words} words')
+
+    # Groups over overlapping windows of the new words, each word is in about
+    # two groups. words_count is set up front since the counter triggers on
+    # word_groups are suspended with the others.
+    window = max(1, min(words, 2 * words // max(groups, 1)))
+    stride = max(1, (words - window) // max(groups - 1, 1)) if groups > 1 else 0
+    group_ranges = []
+    for index in range(groups):
+      cursor.execute('INSERT INTO groups (name, words_count) VALUES (?, ?)', (f'Synthetic group {index + 1}', window))
+      start = first_word + min(index * stride, words - window)
+      group_ranges.append((cursor.lastrowid, start, window))
+    cursor.executemany('INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)', [
+      (word_id, group_id)
+      for group_id, start, size in group_ranges
+      for word_id in range(start, start + size)
+    ])
+    report(f'{groups} groups of {window} words')
+
+    # Sessions, spread over the last `days` days in chronological id order.
+    # Each session's review items get consecutive ids starting at first_id.
+    cursor.execute('SELECT id FROM study_activities')
+    activities = [row[0] for row in cursor.fetchall()]
+    if not activities:
+      cursor.execute("INSERT INTO study_activities (name, url, preview_url) VALUES ('Synthetic activity', '', '')")
+      activities = [cursor.lastrowid]
+    end = datetime.now().replace(microsecond=0)
+    span = int(timedelta(days=days).total_seconds())
+    starts = sorted(end - timedelta(seconds=rng.randrange(span)) for _ in range(sessions))
+    counts = power_law_counts(rng, sessions, reviews, alpha)
+
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM study_sessions')
+    first_session = cursor.fetchone()[0] + 1
+    cursor.execute("""
+      SELECT MAX(COALESCE((SELECT MAX(id) FROM word_review_items), 0),
+                 COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'word_review_items'), 0))
+    """)
+    first_item = cursor.fetchone()[0] + 1
+
+    cursor.execute("""
+      CREATE TEMP TABLE synthetic_plan (
+        session_id INTEGER PRIMARY KEY, group_id INTEGER, study_activity_id INTEGER, created_at TEXT,
+        started REAL, review_count INTEGER, first_id INTEGER, word_start INTEGER, word_count INTEGER
+      )
+    """)
+    # Sessions are stamped in local time like POST /study_sessions, review
+    # items in UTC like CURRENT_TIMESTAMP; `started` is the UTC julian day
+    to_utc = local_to_utc_modifier()
+    plan = []
+    next_id = first_item
+    for index, (created_at, count) in enumerate(zip(starts, counts)):
+      group_id, word_start, word_count = rng.choice(group_ranges)
+      created_at = created_at.strftime('%Y-%m-%d %H:%M:%S')
+      plan.append((first_session + index, group_id, rng.choice(activities), created_at, created_at, to_utc, count, next_id, word_start, word_count))
+      next_id += count
+    cursor.executemany('INSERT INTO temp.synthetic_plan VALUES (?, ?, ?, ?, julianday(?, ?), ?, ?, ?, ?)', plan)
+
+    # The rollup columns follow from the plan, except correct_count (below)
+    cursor.execute("""
+      INSERT INTO study_sessions (id, group_id, study_activity_id, created_at, review_count, correct_count, last_activity_at, ended_at)
+      SELECT session_id, group_id, study_activity_id, created_at, review_count, 0,
+        datetime(started + review_count * :spacing), datetime(started + review_count * :spacing)
+      FROM temp.synthetic_plan
+    """, {"spacing": REVIEW_SPACING_SECONDS / 86400})
+    report(f'{sessions} sessions')
+
+    # Review items arrive in session order, so the session index is cheap to
+    # maintain as they go; the other indexes are rebuilt once at the end
+    cursor.execute("""
+      SELECT name, sql FROM sqlite_master
+      WHERE type = 'index' AND tbl_name = 'word_review_items' AND sql IS NOT NULL AND name != ?
+    """, (SESSION_INDEX,))
+    indexes = cursor.fetchall()
+    for name, _ in indexes:
+      cursor.execute(f'DROP INDEX {name}')
+
+    params = {"spacing": REVIEW_SPACING_SECONDS / 86400, "correct_rate": int(CORRECT_RATE * 1000)}
+
+    # Every session is expanded against a numbers table. Words are skewed
+    # towards the start of the group (product of two uniforms); correctness
+    # is a hash of the id so the rollups can be computed from the indexes.
+    cursor.execute('CREATE TEMP TABLE synthetic_numbers (i INTEGER PRIMARY KEY)')
+    cursor.execute("""
+      WITH RECURSIVE numbers(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM numbers WHERE i < ?)
+      INSERT INTO temp.synthetic_numbers SELECT i FROM numbers
+    """, (max(counts),))
+    cursor.execute(f"""
+      INSERT INTO word_review_items (id, word_id, study_session_id, correct, created_at)
+      SELECT
+        p.first_id + n.i - 1,
+        p.word_start + ((abs(random()) % p.word_count) * (abs(random()) % p.word_count)) / p.word_count,
+        p.session_id,
+        {CORRECT_SQL.format(id='p.first_id + n.i - 1')},
+        datetime(p.started + n.i * :spacing)
+      FROM temp.synthetic_plan p CROSS JOIN temp.synthetic_numbers n
+      WHERE n.i <= p.review_count
+      ORDER BY p.session_id, n.i
+    """, params)
+    report(f'{reviews} review items')
+
+    # Review and correct counts per session, in plan order so without a sort,
+    # and the UTC day numbers of the session's first and last review: julian
+    # day numbers are computed from the same millisecond timestamps
+    # datetime() formatted above
+    cursor.execute(f"""
+      CREATE TEMP TABLE synthetic_session_days AS
+      SELECT
+        p.session_id,
+        {DAY_NUMBER_SQL.format(i='1')} as first_day,
+        {DAY_NUMBER_SQL.format(i='p.review_count')} as last_day,
+        COUNT(*) as reviews,
+        SUM({CORRECT_SQL.format(id='p.first_id + n.i - 1')}) as correct
+      FROM temp.synthetic_plan p CROSS JOIN temp.synthetic_numbers n
+      WHERE n.i <= p.review_count
+      GROUP BY p.session_id
+    """, params)
+    cursor.execute("""
+      UPDATE study_sessions SET correct_count = s.correct
+      FROM temp.synthetic_session_days s
+      WHERE study_sessions.id = s.session_id
+    """)
+
+    # Days are UTC dates (ACTIVITY_TIMEZONE=UTC, other zones need invoke
+    # rebuild-stats). Only the few sessions running past midnight are split
+    # into days review by review.
+    cursor.execute(f"""
+      INSERT INTO daily_activity (day, sessions, reviews, correct)
+      SELECT day, SUM(sessions), SUM(reviews), SUM(correct) FROM (
+        SELECT date(created_at) as day, COUNT(*) as sessions, 0 as reviews, 0 as correct
+        FROM temp.synthetic_plan GROUP BY 1
+        UNION ALL
+        SELECT date(first_day), 0, SUM(reviews), SUM(correct)
+        FROM temp.synthetic_session_days WHERE first_day = last_day
+        GROUP BY first_day
+        UNION ALL
+        SELECT date(day_number), 0, COUNT(*), SUM(correct) FROM (
+          SELECT
+            {DAY_NUMBER_SQL.format(i='n.i')} as day_number,
+            {CORRECT_SQL.format(id='p.first_id + n.i - 1')} as correct
+          FROM temp.synthetic_session_days s
+          JOIN temp.synthetic_plan p ON p.session_id = s.session_id
+          CROSS JOIN temp.synthetic_numbers n
+          WHERE s.first_day != s.last_day AND n.i <= p.review_count
+        )
+        GROUP BY day_number
+      )
+      GROUP BY day
+      ON CONFLICT(day) DO UPDATE SET
+        sessions = sessions + excluded.sessions,
+        reviews = reviews + excluded.reviews,
+        correct = correct + excluded.correct
+    """, params)
+    cursor.execute('DROP TABLE temp.synthetic_session_days')
+    cursor.execute('DROP TABLE temp.synthetic_plan')
+    cursor.execute('DROP TABLE temp.synthetic_numbers')
+    report('daily activity and session rollups')
+
+    for _, sql in indexes:
+      cursor.execute(sql)
+    report('indexes')
+
+    # Word rollups from a scan of the word index: it holds the rowid, which
+    # is all CORRECT_SQL needs
+    cursor.execute(f"""
+      CREATE TEMP TABLE synthetic_words AS
+      SELECT
+        word_id, COUNT(*) as attempts, SUM({CORRECT_SQL.format(id='id')}) as correct, MAX(id) as last_id,
+        MAX(CASE WHEN NOT {CORRECT_SQL.format(id='id')} THEN id END) as last_wrong_id
+      FROM word_review_items INDEXED BY {WORD_INDEX}
+      WHERE id >= :first_item
+      GROUP BY word_id
+    """, {"first_item": first_item, "correct_rate": int(CORRECT_RATE * 1000)})
+    cursor.execute("""
+      INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+      SELECT s.word_id, s.correct, s.attempts - s.correct, wri.created_at
+      FROM temp.synthetic_words s JOIN word_review_items wri ON wri.id = s.last_id
+      WHERE true
+      ON CONFLICT(word_id) DO UPDATE SET
+        correct_count = correct_count + excluded.correct_count,
+        wrong_count = wrong_count + excluded.wrong_count,
+        last_reviewed = MAX(last_reviewed, excluded.last_reviewed)
+    """)
+    cursor.execute("""
+      INSERT INTO word_stats (word_id, attempts, correct)
+      SELECT word_id, attempts, correct FROM temp.synthetic_words WHERE true
+      ON CONFLICT(word_id) DO UPDATE SET
+        attempts = attempts + excluded.attempts,
+        correct = correct + excluded.correct
+    """)
+
+    # SM-2 state of every reviewed word, and word_groups.due_at, as if the
+    # reviews had been recorded one by one: skip_ahead() only needs the
+    # number of wrong reviews, the run of correct ones after the last wrong
+    # one (a range of the word index) and the time of the last review
+    cursor.execute(f"""
+      SELECT
+        s.word_id,
+        s.attempts - s.correct,
+        CASE WHEN s.last_wrong_id IS NULL THEN s.attempts ELSE (
+          SELECT COUNT(*) FROM word_review_items INDEXED BY {WORD_INDEX}
+          WHERE word_id = s.word_id AND id > s.last_wrong_id
+        ) END,
+        wri.created_at,
+        ws.ease, ws.interval_days, ws.repetitions, ws.lapses
+      FROM temp.synthetic_words s
+      JOIN word_review_items wri ON wri.id = s.last_id
+      LEFT JOIN word_schedule ws ON ws.word_id = s.word_id
+    """)
+    states = {}
+    for word_id, wrong, run, created_at, *state in cursor.fetchall():
+      state = NEW_STATE if state[0] is None else tuple(state)
+      states[word_id] = skip_ahead(state, wrong, run, datetime.fromisoformat(created_at))
+    save_states(cursor, states)
+    cursor.execute('DROP TABLE temp.synthetic_words')
+    cursor.execute("""
+      UPDATE learning_stats SET
+        total_reviews = (SELECT COALESCE(SUM(attempts), 0) FROM word_stats),
+        correct_reviews = (SELECT COALESCE(SUM(correct), 0) FROM word_stats),
+        words_studied = (SELECT COUNT(*) FROM word_stats),
+        mastered_words = (SELECT COUNT(*) FROM word_stats WHERE attempts >= ? AND correct * 1.0 / attempts >= ?),
+        total_sessions = (SELECT COUNT(*) FROM study_sessions)
+      WHERE id = 1
+    """, (MASTERY_MIN_ATTEMPTS, MASTERY_SUCCESS_RATE))
+
+    report('word rollups and schedule')
+
+    for _, sql in triggers:
+      cursor.execute(sql)
+    cursor.execute('UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP')
+    connection.commit()
+  except Exception:
+    connection.rollback()
+    raise
+
+  report('committed')
+  return {
+    "words": words,
+    "groups": groups,
+    "sessions": sessions,
+    "reviews": reviews,
+    "seconds": time.perf_counter() - started
+  }
+
+# SQLite datetime modifier turning local time (session timestamps) into UTC
+# (review timestamps)
+def local_to_utc_modifier():
+  offset = datetime.now().astimezone().utcoffset()
+  return f'{-offset.total_seconds() / 3600:+.2f} hours'
@@ -1,31 +1,114 @@
+import argparse
 import sqlite3
 import os
+import sys
 
-def run_migrations():
+from lib.migrations import apply_migrations, pending_migrations
+
+# The queries behind the busiest routes, used to compare query plans
+# before and after a migration is applied
+HOT_QUERIES = {
+    'GET /groups/<id>/words': ('''
+        SELECT w.*, COALESCE(wr.correct_count, 0) as correct_count, COALESCE(wr.wrong_count, 0) as wrong_count
+        FROM words w
+        JOIN word_groups wg ON w.id = wg.word_id
+        LEFT JOIN word_reviews wr ON w.id = wr.word_id
+        WHERE wg.group_id = ?
+        ORDER BY kanji asc
+        LIMIT 10 OFFSET 0
+    ''', (1,)),
+    'GET /api/groups/<id>/words/raw': ('''
+        SELECT g.id as group_id, g.name as group_name, w.*
+        FROM groups g
+        JOIN word_groups wg ON g.id = wg.group_id
+        JOIN words w ON w.id = wg.word_id
+        WHERE g.id = ?
+    ''', (1,)),
+    'GET /words/<id>': ('''
+        SELECT w.id, GROUP_CONCAT(DISTINCT g.id || '::' || g.name) as groups
+        FROM words w
+        LEFT JOIN word_reviews r ON w.id = r.word_id
+        LEFT JOIN word_groups wg ON w.id = wg.word_id
+        LEFT JOIN groups g ON wg.group_id = g.id
+        WHERE w.id = ?
+        GROUP BY w.id
+    ''', (1,)),
+    'GET /groups/<id>/study_sessions': ('''
+        SELECT s.id, s.created_at,
+          (SELECT MAX(created_at) FROM word_review_items WHERE study_session_id = s.id) as last_activity_time,
+          (SELECT COUNT(*) FROM word_review_items WHERE study_session_id = s.id) as review_count
+        FROM study_sessions s
+        WHERE s.group_id = ?
+        ORDER BY created_at desc
+        LIMIT 10 OFFSET 0
+    ''', (1,)),
+    'GET /api/study-sessions/<id>': ('''
+        SELECT w.*, SUM(CASE WHEN wri.correct = 1 THEN 1 ELSE 0 END) as session_correct_count
+        FROM words w
+        JOIN word_review_items wri ON wri.word_id = w.id
+        WHERE wri.study_session_id = ?
+        GROUP BY w.id
+    ''', (1,)),
+    'POST /study_sessions/<id>/review': ('SELECT * FROM word_reviews WHERE word_id = ?', (1,)),
+}
+
+def query_plans(conn):
+    plans = {}
+    for route, (query, params) in HOT_QUERIES.items():
+        try:
+            rows = conn.execute('EXPLAIN QUERY PLAN ' + query, params).fetchall()
+            plans[route] = [row['detail'] for row in rows]
+        except sqlite3.OperationalError as e:
+            # Tables missing on a brand new database
+            plans[route] = [f'unavailable: {e}']
+    return plans
+
+def print_query_plans(before, after):
+    for route in HOT_QUERIES:
+        print(f"\n{route}")
+        if before is not None:
+            print("  before:")
+            for detail in before[route]:
+                print(f"    {detail}")
+            print("  after:")
+        for detail in after[route]:
+            print(f"    {detail}")
+
+def run_migrations(db_path=None, explain=False):
     # Connect to the database
-    db_path = os.path.join(os.path.dirname(__file__), 'word_bank.db')
+    if db_path is None:
+        db_path = os.path.join(os.path.dirname(__file__), 'words.db')
     conn = sqlite3.connect(db_path)
     conn.row_factory = sqlite3.Row
-    
+
     try:
-        # Get list of migration files
-        migrations_dir = os.path.join(os.path.dirname(__file__), 'sql', 'migrations')
-        migration_files = sorted([f for f in os.listdir(migrations_dir) if f.endswith('.sql')])
-        
-        # Run each migration
-        for migration_file in migration_files:
-            print(f"Running migration: {migration_file}")
-            with open(os.path.join(migrations_dir, migration_file)) as f:
-                migration_sql = f.read()
-                conn.executescript(migration_sql)
-                conn.commit()
-        
+        pending = pending_migrations(conn)
+        if not pending:
+            print("No pending migrations")
+            if explain:
+                print_query_plans(None, query_plans(conn))
+            return
+
+        before = query_plans(conn)
+        for version, name, _ in pending:
+            print(f"Pending migration: {version:04d}_{name}")
+
+        for version, name in apply_migrations(conn):
+            print(f"Applied migration: {version:04d}_{name}")
+
         print("Migrations completed successfully")
+        print_query_plans(before, query_plans(conn))
     except Exception as e:
         print(f"Error running migrations: {str(e)}")
-        conn.rollback()
+        # Fail the command (invoke migrate, deploy scripts), the failed
+        # migration was rolled back
+        sys.exit(1)
     finally:
         conn.close()
 
 if __name__ == '__main__':
-    run_migrations()
+    parser = argparse.ArgumentParser(description='Apply pending migrations from sql/migrations')
+    parser.add_argument('--database', help='path to the sqlite database (default: words.db)')
+    parser.add_argument('--explain', action='store_true', help='print query plans even when nothing is pending')
+    args = parser.parse_args()
+    run_migrations(args.database, args.explain)
@@ -0,0 +1,91 @@
+from flask import request, jsonify, Response
+from flask_cors import cross_origin
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+
+# Upper bound on sub-requests in one batch
+MAX_BATCH_REQUESTS = 20
+
+# Set in the WSGI environ of a batch sub-request
+BATCH_ENVIRON_KEY = 'portal.batch'
+
+# Validate {"requests": [...]} (or a bare list), each a path or {"path": ...},
+# into a list of paths. Raises ValueError.
+def parse_batch(payload):
+  if isinstance(payload, dict):
+    payload = payload.get('requests')
+  if not isinstance(payload, list) or not payload:
+    raise ValueError('a non-empty array of requests is required')
+  if len(payload) > MAX_BATCH_REQUESTS:
+    raise ValueError(f'at most {MAX_BATCH_REQUESTS} requests can be batched')
+
+  paths = []
+  for index, item in enumerate(payload):
+    path = item.get('path') if isinstance(item, dict) else item
+    if not isinstance(path, str) or not path.startswith('/'):
+      raise ValueError(f'request {index}: path must be a string starting with /')
+    paths.append(path)
+  return paths
+
+def load(app):
+  # Run a GET sub-request inside the current app context. It shares the
+  # batch's g, and with it the batch's database connection and learner.
+  def dispatch(path):
+    environ = EnvironBuilder(
+      path=path,
+      method='GET',
+      base_url=request.host_url,
+      environ_overrides={BATCH_ENVIRON_KEY: True}
+    ).get_environ()
+    with app.request_context(environ):
+      try:
+        response = app.make_response(app.dispatch_request())
+      except HTTPException as e:
+        # 404/405 and friends as JSON like the routes' own errors
+        response = jsonify({"error": e.description})
+        response.status_code = e.code
+      except Exception as e:
+        response = jsonify({"error": str(e)})
+        response.status_code = 500
+      if response.is_streamed:
+        response.close()
+        response = jsonify({"error": "streaming routes cannot be batched"})
+        response.status_code = 400
+      return response
+
+  # One entry of the combined body. JSON bodies are spliced in as they are
+  # instead of being decoded and encoded again.
+  def entry(path, response):
+    if response.is_json:
+      body = response.get_data().strip() or b'null'
+    else:
+      body = app.json.dumps(response.get_data(as_text=True)).encode('utf-8')
+    return b''.join([
+      b'{"path":', app.json.dumps(path).encode('utf-8'),
+      b',"status":', str(response.status_code).encode('ascii'),
+      b',"body":', body, b'}'
+    ])
+
+  # Endpoint: POST /batch with {"requests": ["/dashboard/stats", "/groups", ...]}
+  # runs several read routes in one round trip
+  @app.route('/batch', methods=['POST'])
+  @cross_origin()
+  def batch():
+    try:
+      try:
+        paths = parse_batch(request.get_json(silent=True))
+      except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+      # Every sub-request reads through one connection inside one read
+      # transaction, so they all see the same state of the database
+      connection = app.db.get(readonly=True)
+      connection.execute('BEGIN')
+      try:
+        entries = [entry(path, dispatch(path)) for path in paths]
+      finally:
+        connection.rollback()
+
+      return Response(b'{"responses":[' + b','.join(entries) + b']}', mimetype='application/json')
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
@@ -1,7 +1,11 @@
-from flask import jsonify
+from flask import jsonify, request
 from flask_cors import cross_origin
 from datetime import datetime, timedelta
 
+from lib.stats import read_learning_stats
+import lib.activity as activity
+from lib.snapshot import stale_ok
+
 def load(app):
     @app.route('/dashboard/recent-session', methods=['GET'])
     @cross_origin()
@@ -16,12 +20,10 @@ def load(app):
                     ss.group_id,
                     sa.name as activity_name,
                     ss.created_at,
-                    COUNT(CASE WHEN wri.correct = 1 THEN 1 END) as correct_count,
-                    COUNT(CASE WHEN wri.correct = 0 THEN 1 END) as wrong_count
+                    ss.correct_count,
+                    ss.review_count - ss.correct_count as wrong_count
                 FROM study_sessions ss
                 JOIN study_activities sa ON ss.study_activity_id = sa.id
-                LEFT JOIN word_review_items wri ON ss.id = wri.study_session_id
-                GROUP BY ss.id
                 ORDER BY ss.created_at DESC
                 LIMIT 1
             ''')
@@ -45,6 +47,7 @@ def load(app):
 
     @app.route('/dashboard/stats', methods=['GET'])
     @cross_origin()
+    @stale_ok
     def get_study_stats():
         try:
             cursor = app.db.cursor()
@@ -53,44 +56,13 @@ def load(app):
             cursor.execute('SELECT COUNT(*) as total_vocabulary FROM words')
             total_vocabulary = cursor.fetchone()["total_vocabulary"]
 
-            # Get total unique words studied
-            cursor.execute('''
-                SELECT COUNT(DISTINCT word_id) as total_words
-                FROM word_review_items wri
-                JOIN study_sessions ss ON wri.study_session_id = ss.id
-            ''')
-            total_words = cursor.fetchone()["total_words"]
-            
-            # Get mastered words (words with >80% success rate and at least 5 attempts)
-            cursor.execute('''
-                WITH word_stats AS (
-                    SELECT 
-                        word_id,
-                        COUNT(*) as total_attempts,
-                        SUM(CASE WHEN correct = 1 THEN 1 ELSE 0 END) * 1.0 / COUNT(*) as success_rate
-                    FROM word_review_items wri
-                    JOIN study_sessions ss ON wri.study_session_id = ss.id
-                    GROUP BY word_id
-                    HAVING total_attempts >= 5
-                )
-                SELECT COUNT(*) as mastered_words
-                FROM word_stats
-                WHERE success_rate >= 0.8
-            ''')
-            mastered_words = cursor.fetchone()["mastered_words"]
-            
-            # Get overall success rate
-            cursor.execute('''
-                SELECT 
-                    SUM(CASE WHEN correct = 1 THEN 1 ELSE 0 END) * 1.0 / COUNT(*) as success_rate
-                FROM word_review_items wri
-                JOIN study_sessions ss ON wri.study_session_id = ss.id
-            ''')
-            success_rate = cursor.fetchone()["success_rate"] or 0
-            
-            # Get total number of study sessions
-            cursor.execute('SELECT COUNT(*) as total_sessions FROM study_sessions')
-            total_sessions = cursor.fetchone()["total_sessions"]
+            # Words studied, mastered words, success rate and session count are
+            # materialized on every review (see lib/stats.py), so this is one lookup
+            stats = read_learning_stats(cursor)
+            total_words = stats["words_studied"]
+            mastered_words = stats["mastered_words"]
+            success_rate = stats["correct_reviews"] * 1.0 / stats["total_reviews"] if stats["total_reviews"] else 0
+            total_sessions = stats["total_sessions"]
             
             # Get number of groups with activity in the last 30 days
             cursor.execute('''
@@ -101,29 +73,8 @@ def load(app):
             active_groups = cursor.fetchone()["active_groups"]
             
             # Calculate current streak (consecutive days with at least one study session)
-            cursor.execute('''
-                WITH daily_sessions AS (
-                    SELECT 
-                        date(created_at) as study_date,
-                        COUNT(*) as session_count
-                    FROM study_sessions
-                    GROUP BY date(created_at)
-                ),
-                streak_calc AS (
-                    SELECT 
-                        study_date,
-                        julianday(study_date) - julianday(lag(study_date, 1) over (order by study_date)) as days_diff
-                    FROM daily_sessions
-                )
-                SELECT COUNT(*) as streak
-                FROM (
-                    SELECT study_date
-                    FROM streak_calc
-                    WHERE days_diff = 1 OR days_diff IS NULL
-                    ORDER BY study_date DESC
-                )
-            ''')
-            current_streak = cursor.fetchone()["streak"]
+            # from the daily_activity rollup
+            current_streak = activity.current_streak(cursor)
             
             return jsonify({
                 "total_vocabulary": total_vocabulary,
@@ -137,3 +88,18 @@ def load(app):
             
         except Exception as e:
             return jsonify({"error": str(e)}), 500
+
+    @app.route('/dashboard/calendar', methods=['GET'])
+    @cross_origin()
+    @stale_ok
+    def get_activity_calendar():
+        try:
+            days = request.args.get('days', 365, type=int)
+            if days < 1 or days > activity.MAX_CALENDAR_DAYS:
+                return jsonify({"error": f"days must be between 1 and {activity.MAX_CALENDAR_DAYS}"}), 400
+
+            cursor = app.db.cursor()
+            return jsonify(activity.calendar(cursor, days))
+            
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
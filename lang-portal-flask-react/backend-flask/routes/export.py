@@ -0,0 +1,86 @@
+from flask import request, jsonify, Response
+from flask_cors import cross_origin
+import logging
+import zlib
+
+from lib.archive import review_items_source
+
+logger = logging.getLogger(__name__)
+
+# Rows read per chunk of output
+EXPORT_CHUNK_ROWS = 1000
+
+EXPORT_COLUMNS = (
+  'id', 'word_id', 'kanji', 'romaji', 'english', 'correct', 'created_at',
+  'study_session_id', 'group_id', 'group_name', 'study_activity_id', 'activity_name'
+)
+
+def load(app):
+  # Stream review items in id order, EXPORT_CHUNK_ROWS at a time. Each chunk
+  # is read by id (after the last one sent) in its own short read
+  # transaction, so a slow client neither keeps a pooled connection nor holds
+  # a WAL snapshot open for the whole transfer, and memory stays at one chunk
+  # whatever the history size.
+  def iter_review_lines(db, since, include_archive):
+    last = since
+    while True:
+      with db.connection(readonly=True) as connection:
+        source = review_items_source(connection, app.config['REVIEW_ARCHIVE_DATABASE'], include_archive)
+        rows = connection.execute(f'''
+          SELECT
+            wri.id, wri.word_id, w.kanji, w.romaji, w.english, wri.correct, wri.created_at,
+            wri.study_session_id, ss.group_id, g.name, ss.study_activity_id, sa.name
+          FROM {source} wri
+          LEFT JOIN words w ON w.id = wri.word_id
+          LEFT JOIN study_sessions ss ON ss.id = wri.study_session_id
+          LEFT JOIN groups g ON g.id = ss.group_id
+          LEFT JOIN study_activities sa ON sa.id = ss.study_activity_id
+          WHERE wri.id > ?
+          ORDER BY wri.id
+          LIMIT ?
+        ''', (last, EXPORT_CHUNK_ROWS)).fetchall()
+      if not rows:
+        break
+      last = rows[-1][0]
+      yield ''.join([
+        app.json.dumps(dict(zip(EXPORT_COLUMNS, tuple(row)))) + '\n'
+        for row in rows
+      ]).encode('utf-8')
+      if len(rows) < EXPORT_CHUNK_ROWS:
+        break
+
+  def gzipped(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 writes a gzip container
+    for chunk in chunks:
+      data = compressor.compress(chunk)
+      if data:
+        yield data
+    yield compressor.flush()
+
+  @app.route('/export/reviews.ndjson', methods=['GET'])
+  @cross_origin()
+  def export_reviews():
+    since = request.args.get('since', 0, type=int)
+    if since < 0:
+      return jsonify({"error": "since must be a non-negative review item id"}), 400
+    # Archived review items are only exported when asked for
+    include_archive = request.args.get('include_archive', 'false').lower() in ('1', 'true')
+
+    def logged(chunks):
+      try:
+        yield from chunks
+      except Exception:
+        # The status line is already sent, the client sees a truncated stream
+        # and can resume with since=<last id received>
+        logger.exception('Review export failed after since=%s', since)
+
+    # The generator runs after the request context is gone, so resolve the
+    # learner's shard now
+    chunks = logged(iter_review_lines(app.db.routed(), since, include_archive))
+    response = Response(mimetype='application/x-ndjson')
+    if request.accept_encodings['gzip']:
+      chunks = gzipped(chunks)
+      response.headers['Content-Encoding'] = 'gzip'
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.response = chunks
+    return response
@@ -1,10 +1,17 @@
-from flask import request, jsonify, g
+from flask import request, jsonify, g, Response
 from flask_cors import cross_origin
 import json
 
+from lib.pagination import Keyset, InvalidCursor
+from lib.conditional import conditional
+from lib.snapshot import stale_ok
+from lib.groups import parse_word_ids, add_words, remove_words, GROUP_WORDS_PAYLOAD_SQL, group_words_body
+from lib.reviews import missing_word_ids
+
 def load(app):
   @app.route('/groups', methods=['GET'])
   @cross_origin()
+  @conditional('groups')
   def get_groups():
     try:
       cursor = app.db.cursor()
@@ -60,6 +67,7 @@ def load(app):
 
   @app.route('/groups/<int:id>', methods=['GET'])
   @cross_origin()
+  @conditional('groups')
   def get_group(id):
     try:
       cursor = app.db.cursor()
@@ -85,26 +93,37 @@ def load(app):
 
   @app.route('/groups/<int:id>/words', methods=['GET'])
   @cross_origin()
+  @conditional('groups', 'word_groups', 'words', 'word_reviews')
   def get_group_words(id):
     try:
       cursor = app.db.cursor()
       
-      # Get pagination parameters
-      page = int(request.args.get('page', 1))
       words_per_page = 10
-      offset = (page - 1) * words_per_page
 
       # Get sorting parameters
       sort_by = request.args.get('sort_by', 'kanji')
       order = request.args.get('order', 'asc')
 
-      # Validate sort parameters
-      valid_columns = ['kanji', 'romaji', 'english', 'correct_count', 'wrong_count']
-      if sort_by not in valid_columns:
+      # Validate sort parameters, mapping each allowed column to its SQL expression
+      sort_columns = {
+        'kanji': 'w.kanji',
+        'romaji': 'w.romaji',
+        'english': 'w.english',
+        'correct_count': 'COALESCE(wr.correct_count, 0)',
+        'wrong_count': 'COALESCE(wr.wrong_count, 0)'
+      }
+      if sort_by not in sort_columns:
         sort_by = 'kanji'
       if order not in ['asc', 'desc']:
         order = 'asc'
 
+      # Page either by `cursor` (keyset) or by the legacy `page` number
+      try:
+        keyset = Keyset(request.args, sort_by, order, sort_columns[sort_by], 'w.id', words_per_page)
+      except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+      where, where_params = keyset.condition()
+
       # First, check if the group exists
       cursor.execute('SELECT name FROM groups WHERE id = ?', (id,))
       group = cursor.fetchone()
@@ -120,20 +139,23 @@ def load(app):
         JOIN word_groups wg ON w.id = wg.word_id
         LEFT JOIN word_reviews wr ON w.id = wr.word_id
         WHERE wg.group_id = ?
-        ORDER BY {sort_by} {order}
+        {'AND ' + where if where else ''}
+        ORDER BY {keyset.order_by}
         LIMIT ? OFFSET ?
-      ''', (id, words_per_page, offset))
+      ''', (id, *where_params, *keyset.limit_params()))
       
-      words = cursor.fetchall()
+      words = keyset.rows(cursor.fetchall(), sort_key=sort_by)
 
-      # Get total words count for pagination
-      cursor.execute('''
-        SELECT COUNT(*) 
-        FROM word_groups 
-        WHERE group_id = ?
-      ''', (id,))
-      total_words = cursor.fetchone()[0]
-      total_pages = (total_words + words_per_page - 1) // words_per_page
+      # Get total words count for pagination, unless the client opted out
+      total_words = None
+      if keyset.include_total:
+        cursor.execute('''
+          SELECT COUNT(*) 
+          FROM word_groups 
+          WHERE group_id = ?
+        ''', (id,))
+        total_words = cursor.fetchone()[0]
+      total_pages = keyset.total_pages(total_words)
 
       # Format the response
       words_data = []
@@ -150,13 +172,58 @@ def load(app):
       return jsonify({
         'words': words_data,
         'total_pages': total_pages,
-        'current_page': page
+        'current_page': keyset.current_page,
+        'next_cursor': keyset.next_cursor
+      })
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoints: POST/DELETE /groups/:id/words with {"word_ids": [...]} to
+  # add words to a group or remove them, in one statement each
+  @app.route('/groups/<int:id>/words', methods=['POST', 'DELETE'])
+  @cross_origin()
+  def change_group_words(id):
+    try:
+      try:
+        word_ids = parse_word_ids(request.get_json(silent=True))
+      except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+      # Membership is shared vocabulary, it is written on the main database
+      # even when the request is routed to a learner's shard (where the
+      # shared tables are read-only views)
+      with app.db.connection() as connection:
+        cursor = app.db.cursor_for(connection)
+        cursor.execute('SELECT id FROM groups WHERE id = ?', (id,))
+        if cursor.fetchone() is None:
+          return jsonify({"error": "Group not found"}), 404
+
+        try:
+          if request.method == 'POST':
+            missing = missing_word_ids(cursor, word_ids)
+            if missing:
+              return jsonify({"error": "Word not found", "word_ids": missing}), 404
+            changed = add_words(cursor, id, word_ids)
+          else:
+            changed = remove_words(cursor, id, word_ids)
+          cursor.execute('SELECT words_count FROM groups WHERE id = ?', (id,))
+          words_count = cursor.fetchone()['words_count']
+          connection.commit()
+        except Exception:
+          connection.rollback()
+          raise
+
+      return jsonify({
+        "group_id": id,
+        "added" if request.method == 'POST' else "removed": changed,
+        "word_count": words_count
       })
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
   @app.route('/api/groups/<int:id>/words/raw', methods=['GET'])
   @cross_origin()
+  @conditional('groups', 'word_groups', 'words')
   def get_group_words_raw(id):
     try:
       cursor = app.db.cursor()
@@ -167,40 +234,18 @@ def load(app):
       if not group:
         return jsonify({"error": "Group not found"}), 404
 
-      # SQL query to fetch words along with group information
-      cursor.execute('''
-        SELECT g.id as group_id, g.name as group_name, w.*
-        FROM groups g
-        JOIN word_groups wg ON g.id = wg.group_id
-        JOIN words w ON w.id = wg.word_id
-        WHERE g.id = ?;
-      ''', (id,))
-      
-      data = cursor.fetchall()
-      
-      # Format the response
-      result = {
-        "group_id": id,
-        "group_name": data[0]["group_name"] if data else group["name"],
-        "words": []
-      }
-      
-      for row in data:
-        word = {
-          "id": row["id"],
-          "kanji": row["kanji"],
-          "romaji": row["romaji"],
-          "english": row["english"],
-          "parts": json.loads(row["parts"])  # Deserialize 'parts' field
-        }
-        result["words"].append(word)
-      
-      return jsonify(result)
+      # Each word's JSON is pre-encoded in words.payload_json (kept current by
+      # triggers), so the rows are spliced into the body without re-parsing
+      cursor.execute(GROUP_WORDS_PAYLOAD_SQL, (id,))
+      body = group_words_body(id, group["name"], [row[0] for row in cursor.fetchall()])
+      return Response(body, mimetype='application/json')
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
   @app.route('/groups/<int:id>/study_sessions', methods=['GET'])
   @cross_origin()
+  @stale_ok
+  @conditional('study_sessions', 'study_activities', 'groups')
   def get_group_study_sessions(id):
     try:
       cursor = app.db.cursor()
@@ -216,15 +261,17 @@ def load(app):
 
       # Map frontend sort keys to database columns
       sort_mapping = {
-        'startTime': 'created_at',
-        'endTime': 'last_activity_time',
+        'startTime': 's.created_at',
+        'endTime': 'end_time',
         'activityName': 'a.name',
         'groupName': 'g.name',
-        'reviewItemsCount': 'review_count'
+        'reviewItemsCount': 's.review_count'
       }
 
       # Use mapped sort column or default to created_at
-      sort_column = sort_mapping.get(sort_by, 'created_at')
+      sort_column = sort_mapping.get(sort_by, 's.created_at')
+      if order not in ['asc', 'desc']:
+        order = 'desc'
 
       # Get total count for pagination
       cursor.execute('''
@@ -235,25 +282,18 @@ def load(app):
       total_sessions = cursor.fetchone()[0]
       total_pages = (total_sessions + sessions_per_page - 1) // sessions_per_page
 
-      # Get study sessions for this group with dynamic calculations
+      # Get study sessions for this group from their rollup columns. Sessions
+      # without any reviews end 30 minutes after they started.
       cursor.execute(f'''
         SELECT 
           s.id,
           s.group_id,
           s.study_activity_id,
           s.created_at as start_time,
-          (
-            SELECT MAX(created_at)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as last_activity_time,
+          COALESCE(s.ended_at, s.last_activity_at, datetime(s.created_at, '+30 minutes')) as end_time,
           a.name as activity_name,
           g.name as group_name,
-          (
-            SELECT COUNT(*)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as review_count
+          s.review_count
         FROM study_sessions s
         JOIN study_activities a ON s.study_activity_id = a.id
         JOIN groups g ON s.group_id = g.id
@@ -266,11 +306,6 @@ def load(app):
       sessions_data = []
       
       for session in sessions:
-        # If there's no last_activity_time, use start_time + 30 minutes
-        end_time = session["last_activity_time"]
-        if not end_time:
-            end_time = cursor.execute('SELECT datetime(?, "+30 minutes")', (session["start_time"],)).fetchone()[0]
-        
         sessions_data.append({
           "id": session["id"],
           "group_id": session["group_id"],
@@ -278,7 +313,7 @@ def load(app):
           "study_activity_id": session["study_activity_id"],
           "activity_name": session["activity_name"],
           "start_time": session["start_time"],
-          "end_time": end_time,
+          "end_time": session["end_time"],
           "review_items_count": session["review_count"]
         })
 
@@ -2,9 +2,14 @@ from flask import jsonify, request
 from flask_cors import cross_origin
 import math
 
+from lib.conditional import conditional
+from lib.pagination import per_page_arg
+from lib.snapshot import stale_ok
+
 def load(app):
     @app.route('/api/study-activities', methods=['GET'])
     @cross_origin()
+    @conditional('study_activities')
     def get_study_activities():
         cursor = app.db.cursor()
         cursor.execute('SELECT id, name, url, preview_url FROM study_activities')
@@ -19,6 +24,7 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>', methods=['GET'])
     @cross_origin()
+    @conditional('study_activities')
     def get_study_activity(id):
         cursor = app.db.cursor()
         cursor.execute('SELECT id, name, url, preview_url FROM study_activities WHERE id = ?', (id,))
@@ -36,6 +42,8 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>/sessions', methods=['GET'])
     @cross_origin()
+    @stale_ok
+    @conditional('study_activities', 'study_sessions', 'groups')
     def get_study_activity_sessions(id):
         cursor = app.db.cursor()
         
@@ -46,7 +54,7 @@ def load(app):
 
         # Get pagination parameters
         page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
+        per_page = per_page_arg(request.args, 10)
         offset = (page - 1) * per_page
 
         # Get total count
@@ -67,13 +75,12 @@ def load(app):
                 sa.name as activity_name,
                 ss.created_at,
                 ss.study_activity_id as activity_id,
-                COUNT(wri.id) as review_items_count
+                COALESCE(ss.ended_at, ss.last_activity_at, ss.created_at) as end_time,
+                ss.review_count as review_items_count
             FROM study_sessions ss
             JOIN groups g ON g.id = ss.group_id
             JOIN study_activities sa ON sa.id = ss.study_activity_id
-            LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
             WHERE ss.study_activity_id = ?
-            GROUP BY ss.id, ss.group_id, g.name, sa.name, ss.created_at, ss.study_activity_id
             ORDER BY ss.created_at DESC
             LIMIT ? OFFSET ?
         ''', (id, per_page, offset))
@@ -87,7 +94,7 @@ def load(app):
                 'activity_id': session['activity_id'],
                 'activity_name': session['activity_name'],
                 'start_time': session['created_at'],
-                'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
+                'end_time': session['end_time'],
                 'review_items_count': session['review_items_count']
             } for session in sessions],
             'total': total_count,
@@ -98,6 +105,7 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>/launch', methods=['GET'])
     @cross_origin()
+    @conditional('study_activities', 'groups')
     def get_study_activity_launch_data(id):
         cursor = app.db.cursor()
         
@@ -3,7 +3,38 @@ from flask_cors import cross_origin
 from datetime import datetime
 import math
 
+from lib.pagination import Keyset, InvalidCursor, per_page_arg
+from lib.reviews import record_reviews, parse_reviews, missing_word_ids, is_correct_flag
+from lib.review_queue import QueueFull, FlushTimeout
+from lib.stats import increment_sessions, reset_learning_stats
+from lib.activity import record_session, reset_activity
+from lib.conditional import conditional
+from lib.scheduler import next_words, next_word_json, reset_schedule, MAX_NEXT_WORDS
+from lib.archive import attach, review_items_source, reset_archive
+from lib.snapshot import stale_ok
+
 def load(app):
+  # The background writer works on the main database, reviews of learner
+  # shards are written synchronously
+  def write_behind():
+    return app.review_queue is not None and app.db.routed() is app.db
+
+  # Queue reviews for the background writer, 503 when it is falling behind
+  def enqueue_reviews(session_id, reviews):
+    try:
+      app.review_queue.put(session_id, reviews)
+    except QueueFull as e:
+      response = jsonify({"error": str(e)})
+      response.headers['Retry-After'] = '1'
+      return response, 503
+    return jsonify({"message": "Review queued", "count": len(reviews)}), 202
+
+  # 503 when queued reviews could not be written first
+  def flush_failed(error):
+    response = jsonify({"error": str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
   @app.route('/study_sessions', methods=['POST'])
   @cross_origin()
   def create_study_session():
@@ -37,42 +68,52 @@ def load(app):
         return jsonify({"error": "Study activity not found"}), 404
 
       # Insert the study session
+      created_at = datetime.now()
       cursor.execute('''
         INSERT INTO study_sessions (group_id, study_activity_id, created_at)
         VALUES (?, ?, ?)
-      ''', (group_id, study_activity_id, datetime.now()))
-      
-      app.db.commit()
-      
+      ''', (group_id, study_activity_id, created_at))
+
       # Get the id of the newly created session
       session_id = cursor.lastrowid
 
+      increment_sessions(cursor)
+      record_session(cursor, created_at)
+      app.db.commit()
+
       return jsonify({"session_id": session_id}), 201
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
   @app.route('/api/study-sessions', methods=['GET'])
   @cross_origin()
+  @stale_ok
+  @conditional('study_sessions', 'groups', 'study_activities')
   def get_study_sessions():
     try:
       cursor = app.db.cursor()
       
-      # Get pagination parameters
-      page = request.args.get('page', 1, type=int)
-      per_page = request.args.get('per_page', 10, type=int)
-      offset = (page - 1) * per_page
+      # Get pagination parameters, either a `cursor` (keyset) or the legacy `page` number
+      per_page = per_page_arg(request.args, 10)
+      try:
+        keyset = Keyset(request.args, 'created_at', 'desc', 'ss.created_at', 'ss.id', per_page)
+      except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+      where, where_params = keyset.condition()
 
-      # Get total count
-      cursor.execute('''
-        SELECT COUNT(*) as count 
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-      ''')
-      total_count = cursor.fetchone()['count']
+      # Get total count, unless the client opted out
+      total_count = None
+      if keyset.include_total:
+        cursor.execute('''
+          SELECT COUNT(*) as count 
+          FROM study_sessions ss
+          JOIN groups g ON g.id = ss.group_id
+          JOIN study_activities sa ON sa.id = ss.study_activity_id
+        ''')
+        total_count = cursor.fetchone()['count']
 
       # Get paginated sessions
-      cursor.execute('''
+      cursor.execute(f'''
         SELECT 
           ss.id,
           ss.group_id,
@@ -80,16 +121,16 @@ def load(app):
           sa.id as activity_id,
           sa.name as activity_name,
           ss.created_at,
-          COUNT(wri.id) as review_items_count
+          COALESCE(ss.ended_at, ss.last_activity_at, ss.created_at) as end_time,
+          ss.review_count as review_items_count
         FROM study_sessions ss
         JOIN groups g ON g.id = ss.group_id
         JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-        GROUP BY ss.id
-        ORDER BY ss.created_at DESC
+        {'WHERE ' + where if where else ''}
+        ORDER BY {keyset.order_by}
         LIMIT ? OFFSET ?
-      ''', (per_page, offset))
-      sessions = cursor.fetchall()
+      ''', (*where_params, *keyset.limit_params()))
+      sessions = keyset.rows(cursor.fetchall(), sort_key='created_at')
 
       return jsonify({
         'items': [{
@@ -99,19 +140,21 @@ def load(app):
           'activity_id': session['activity_id'],
           'activity_name': session['activity_name'],
           'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
+          'end_time': session['end_time'],
           'review_items_count': session['review_items_count']
         } for session in sessions],
         'total': total_count,
-        'page': page,
+        'page': keyset.current_page,
         'per_page': per_page,
-        'total_pages': math.ceil(total_count / per_page)
+        'total_pages': keyset.total_pages(total_count),
+        'next_cursor': keyset.next_cursor
       })
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
   @app.route('/api/study-sessions/<id>', methods=['GET'])
   @cross_origin()
+  @conditional('study_sessions', 'groups', 'study_activities', 'word_review_items', 'words')
   def get_study_session(id):
     try:
       cursor = app.db.cursor()
@@ -125,13 +168,15 @@ def load(app):
           sa.id as activity_id,
           sa.name as activity_name,
           ss.created_at,
-          COUNT(wri.id) as review_items_count
+          COALESCE(ss.ended_at, ss.last_activity_at, ss.created_at) as end_time,
+          ss.ended_at,
+          ss.review_count as review_items_count,
+          ss.correct_count,
+          ss.archived_at
         FROM study_sessions ss
         JOIN groups g ON g.id = ss.group_id
         JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
         WHERE ss.id = ?
-        GROUP BY ss.id
       ''', (id,))
       
       session = cursor.fetchone()
@@ -140,17 +185,20 @@ def load(app):
 
       # Get pagination parameters
       page = request.args.get('page', 1, type=int)
-      per_page = request.args.get('per_page', 10, type=int)
+      per_page = per_page_arg(request.args, 10)
       offset = (page - 1) * per_page
 
+      # Review items of archived sessions are only in the archive database
+      source = review_items_source(app.db.get(), app.config['REVIEW_ARCHIVE_DATABASE'], session['archived_at'] is not None)
+
       # Get the words reviewed in this session with their review status
-      cursor.execute('''
+      cursor.execute(f'''
         SELECT 
           w.*,
           COALESCE(SUM(CASE WHEN wri.correct = 1 THEN 1 ELSE 0 END), 0) as session_correct_count,
           COALESCE(SUM(CASE WHEN wri.correct = 0 THEN 1 ELSE 0 END), 0) as session_wrong_count
         FROM words w
-        JOIN word_review_items wri ON wri.word_id = w.id
+        JOIN {source} wri ON wri.word_id = w.id
         WHERE wri.study_session_id = ?
         GROUP BY w.id
         ORDER BY w.kanji
@@ -160,10 +208,10 @@ def load(app):
       words = cursor.fetchall()
 
       # Get total count of words
-      cursor.execute('''
+      cursor.execute(f'''
         SELECT COUNT(DISTINCT w.id) as count
         FROM words w
-        JOIN word_review_items wri ON wri.word_id = w.id
+        JOIN {source} wri ON wri.word_id = w.id
         WHERE wri.study_session_id = ?
       ''', (id,))
       
@@ -177,8 +225,10 @@ def load(app):
           'activity_id': session['activity_id'],
           'activity_name': session['activity_name'],
           'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time
-          'review_items_count': session['review_items_count']
+          'end_time': session['end_time'],
+          'ended': session['ended_at'] is not None,
+          'review_items_count': session['review_items_count'],
+          'correct_count': session['correct_count']
         },
         'words': [{
           'id': word['id'],
@@ -206,52 +256,162 @@ def load(app):
         
     if word_id is None or correct is None:
         return jsonify({"error": "word_id and correct fields are required"}), 400
+    if not is_correct_flag(correct):
+        return jsonify({"error": "correct must be a boolean"}), 400
 
     # Check if word exists
     cursor.execute('SELECT id FROM words WHERE id = ?', (word_id,))
     if not cursor.fetchone():
         return jsonify({"error": "Word not found"}), 404
 
-    # Check if study session exists
-    cursor.execute('SELECT id FROM study_sessions WHERE id = ?', (id,))
-    if not cursor.fetchone():
+    # Check if study session exists and is still open
+    cursor.execute('SELECT id, ended_at FROM study_sessions WHERE id = ?', (id,))
+    session = cursor.fetchone()
+    if not session:
         return jsonify({"error": "Study session not found"}), 404
+    if session['ended_at'] is not None:
+        return jsonify({"error": "Study session has ended"}), 409
 
-    # Insert the individual review attempt into word_review_items
-    cursor.execute('''
-        INSERT INTO word_review_items (word_id, correct, study_session_id) VALUES (?, ?, ?)
-    ''', (word_id, correct, id))
-    
-    # Update or insert aggregate review record in word_reviews
-    cursor.execute('''
-        SELECT * FROM word_reviews WHERE word_id = ?
-    ''', (word_id,))
-    review = cursor.fetchone()
-
-    if review:
-        # Update existing record
-        if correct:
-            cursor.execute('''
-           UPDATE word_reviews SET correct_count = correct_count + 1, last_reviewed = ? WHERE word_id = ?
-            ''', (datetime.now(), word_id))
-        else:
-            cursor.execute('''
-                UPDATE word_reviews SET wrong_count = wrong_count + 1, last_reviewed = ? WHERE word_id = ?
-            ''', (datetime.now(), word_id))
-    else:
-        # Insert new record
-        cursor.execute('''
-            INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
-            VALUES (?, ?, ?, ?)
-        ''', (word_id, 1 if correct else 0, 0 if correct else 1, datetime.now()))
+    reviews = [(word_id, 1 if correct else 0, None)]
+
+    # In write-behind mode hand the review to the writer thread and return
+    if write_behind():
+      return enqueue_reviews(id, reviews)
+
+    # Insert the individual review attempt and update the aggregate in word_reviews
+    record_reviews(cursor, id, reviews)
 
     app.db.commit()
     return jsonify({"message": "Review logged successfully"})
 
+  @app.route('/study_sessions/<id>/reviews', methods=['POST'])
+  @cross_origin()
+  def log_reviews(id):
+    try:
+      try:
+        reviews = parse_reviews(request.get_json(silent=True))
+      except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+      cursor = app.db.cursor()
+
+      # Check if study session exists and is still open
+      cursor.execute('SELECT id, ended_at FROM study_sessions WHERE id = ?', (id,))
+      session = cursor.fetchone()
+      if not session:
+        return jsonify({"error": "Study session not found"}), 404
+      if session['ended_at'] is not None:
+        return jsonify({"error": "Study session has ended"}), 409
+
+      # Check all words exist with a single IN query
+      missing = missing_word_ids(cursor, [review[0] for review in reviews])
+      if missing:
+        return jsonify({"error": "Word not found", "word_ids": missing}), 404
+
+      # In write-behind mode hand the reviews to the writer thread and return
+      if write_behind():
+        return enqueue_reviews(id, reviews)
+
+      # Insert every review and fold the aggregates in one transaction
+      try:
+        record_reviews(cursor, id, reviews)
+        app.db.commit()
+      except Exception:
+        app.db.rollback()
+        raise
+
+      return jsonify({"message": "Reviews logged successfully", "count": len(reviews)})
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  @app.route('/study_sessions/<id>/next-words', methods=['GET'])
+  @cross_origin()
+  def get_next_words(id):
+    try:
+      n = request.args.get('n', 10, type=int)
+      if n is None or n < 1:
+        return jsonify({"error": "n must be a positive integer"}), 400
+      n = min(n, MAX_NEXT_WORDS)
+
+      cursor = app.db.cursor()
+      cursor.execute('SELECT group_id FROM study_sessions WHERE id = ?', (id,))
+      session = cursor.fetchone()
+      if not session:
+        return jsonify({"error": "Study session not found"}), 404
+
+      # Overdue first, then new words, then the soonest due, see lib/scheduler.py
+      words = next_words(cursor, session['group_id'], n)
+      return jsonify({
+        "study_session_id": int(id),
+        "group_id": session['group_id'],
+        "words": [next_word_json(state, row) for state, row in words]
+      })
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  @app.route('/study_sessions/<id>/end', methods=['POST'])
+  @cross_origin()
+  def end_study_session(id):
+    try:
+      # Make sure queued reviews are part of the final aggregates
+      if app.review_queue is not None:
+        try:
+          app.review_queue.flush()
+        except FlushTimeout as e:
+          return flush_failed(e)
+
+      cursor = app.db.cursor()
+      cursor.execute('SELECT id, ended_at FROM study_sessions WHERE id = ?', (id,))
+      session = cursor.fetchone()
+      if not session:
+        return jsonify({"error": "Study session not found"}), 404
+      if session['ended_at'] is not None:
+        return jsonify({"error": "Study session has already ended"}), 409
+
+      # Seal the final aggregates, recomputed from the session's review items
+      # unless they were archived
+      cursor.execute('''
+        UPDATE study_sessions SET ended_at = CURRENT_TIMESTAMP WHERE id = :id
+      ''', {"id": id})
+      cursor.execute('''
+        UPDATE study_sessions SET
+          review_count = (SELECT COUNT(*) FROM word_review_items WHERE study_session_id = :id),
+          correct_count = (SELECT COUNT(*) FROM word_review_items WHERE study_session_id = :id AND correct = 1),
+          last_activity_at = (SELECT MAX(created_at) FROM word_review_items WHERE study_session_id = :id)
+        WHERE id = :id AND archived_at IS NULL
+      ''', {"id": id})
+      app.db.commit()
+
+      cursor.execute('''
+        SELECT id, created_at, last_activity_at, ended_at, review_count, correct_count
+        FROM study_sessions WHERE id = ?
+      ''', (id,))
+      session = cursor.fetchone()
+      return jsonify({
+        "id": session["id"],
+        "start_time": session["created_at"],
+        "last_activity_time": session["last_activity_at"],
+        "end_time": session["ended_at"],
+        "review_items_count": session["review_count"],
+        "correct_count": session["correct_count"],
+        "wrong_count": session["review_count"] - session["correct_count"]
+      })
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
   @app.route('/api/study-sessions/reset', methods=['POST'])
   @cross_origin()
   def reset_study_sessions():
     try:
+      # Let queued reviews land first so they are cleared too
+      if app.review_queue is not None:
+        try:
+          app.review_queue.flush()
+        except FlushTimeout as e:
+          return flush_failed(e)
+
+      # Attach the archive before the first write, its items go too
+      attach(app.db.get(), app.config['REVIEW_ARCHIVE_DATABASE'])
       cursor = app.db.cursor()
       
       # First delete all word review items since they have foreign key constraints
@@ -259,9 +419,22 @@ def load(app):
       
       # Then delete all study sessions
       cursor.execute('DELETE FROM study_sessions')
+
+      # And the statistics materialized from them
+      reset_learning_stats(cursor)
+      reset_activity(cursor)
+      reset_schedule(cursor)
+      reset_archive(cursor)
       
       app.db.commit()
       
       return jsonify({"message": "Study history cleared successfully"}), 200
     except Exception as e:
-      return jsonify({"error": str(e)}), 500
\ No newline at end of file
+      return jsonify({"error": str(e)}), 500
+
+  @app.route('/api/review-queue', methods=['GET'])
+  @cross_origin()
+  def get_review_queue_stats():
+    if app.review_queue is None:
+      return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **app.review_queue.stats()})
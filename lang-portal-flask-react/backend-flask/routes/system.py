@@ -0,0 +1,58 @@
+from flask import request, jsonify, Response
+from flask_cors import cross_origin
+
+def load(app):
+  @app.route('/api/response-cache', methods=['GET'])
+  @cross_origin()
+  def get_response_cache_stats():
+    if app.response_cache is None:
+      return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **app.response_cache.stats()})
+
+  # Prometheus scrape endpoint
+  @app.route('/metrics', methods=['GET'])
+  def get_metrics():
+    lines = [app.metrics.render()]
+    if app.response_cache is not None:
+      stats = app.response_cache.stats()
+      lines.append('# TYPE response_cache_hits_total counter\n')
+      lines.append(f'response_cache_hits_total {stats["hits"]}\n')
+      lines.append('# TYPE response_cache_misses_total counter\n')
+      lines.append(f'response_cache_misses_total {stats["misses"]}\n')
+      lines.append('# TYPE response_cache_bytes gauge\n')
+      lines.append(f'response_cache_bytes {stats["bytes"]}\n')
+    if app.review_queue is not None:
+      stats = app.review_queue.stats()
+      lines.append('# TYPE review_queue_depth gauge\n')
+      lines.append(f'review_queue_depth {stats["depth"]}\n')
+      lines.append('# TYPE review_queue_committed_total counter\n')
+      lines.append(f'review_queue_committed_total {stats["committed"]}\n')
+      lines.append('# TYPE review_queue_rejected_total counter\n')
+      lines.append(f'review_queue_rejected_total {stats["rejected"]}\n')
+    if app.db.snapshot is not None:
+      stats = app.db.snapshot.stats()
+      if stats["age_seconds"] is not None:
+        lines.append('# TYPE snapshot_age_seconds gauge\n')
+        lines.append(f'snapshot_age_seconds {stats["age_seconds"]:.3f}\n')
+      lines.append('# TYPE snapshot_refreshes_total counter\n')
+      lines.append(f'snapshot_refreshes_total {stats["refreshes"]}\n')
+      lines.append('# TYPE snapshot_failures_total counter\n')
+      lines.append(f'snapshot_failures_total {stats["failures"]}\n')
+    return Response(''.join(lines), mimetype='text/plain; version=0.0.4')
+
+  # Top SQL statements by total time, needs QUERY_PROFILE
+  @app.route('/api/query-profile', methods=['GET'])
+  @cross_origin()
+  def get_query_profile():
+    if app.db.profiler is None:
+      return jsonify({"enabled": False})
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    return jsonify({"enabled": True, "statements": app.db.profiler.report(limit)})
+
+  @app.route('/api/query-profile/reset', methods=['POST'])
+  @cross_origin()
+  def reset_query_profile():
+    if app.db.profiler is None:
+      return jsonify({"enabled": False})
+    app.db.profiler.reset()
+    return jsonify({"enabled": True})
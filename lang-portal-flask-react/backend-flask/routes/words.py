@@ -2,32 +2,97 @@ from flask import request, jsonify, g
 from flask_cors import cross_origin
 import json
 
+from lib.pagination import Keyset, InvalidCursor
+from lib.conditional import conditional
+
+# Upper bound on ids in one GET /words?ids= request
+MAX_WORD_IDS = 100
+
+# A word with its review counts and groups, {ids} is a placeholder list
+WORD_DETAIL_SQL = '''
+  SELECT w.id, w.kanji, w.romaji, w.english,
+         COALESCE(r.correct_count, 0) AS correct_count,
+         COALESCE(r.wrong_count, 0) AS wrong_count,
+         GROUP_CONCAT(DISTINCT g.id || '::' || g.name) as groups
+  FROM words w
+  LEFT JOIN word_reviews r ON w.id = r.word_id
+  LEFT JOIN word_groups wg ON w.id = wg.word_id
+  LEFT JOIN groups g ON wg.group_id = g.id
+  WHERE w.id IN ({ids})
+  GROUP BY w.id
+'''
+
+def word_detail_json(word):
+  # Parse the groups string into a list of group objects
+  groups = []
+  if word["groups"]:
+    for group_str in word["groups"].split(','):
+      group_id, group_name = group_str.split('::')
+      groups.append({
+        "id": int(group_id),
+        "name": group_name
+      })
+  return {
+    "id": word["id"],
+    "kanji": word["kanji"],
+    "romaji": word["romaji"],
+    "english": word["english"],
+    "correct_count": word["correct_count"],
+    "wrong_count": word["wrong_count"],
+    "groups": groups
+  }
+
+# Comma separated ids of GET /words?ids=, distinct in request order. Raises ValueError.
+def parse_ids(value):
+  try:
+    ids = [int(part) for part in value.split(',') if part.strip()]
+  except ValueError:
+    raise ValueError('ids must be a comma separated list of integers')
+  if not ids:
+    raise ValueError('ids must not be empty')
+  ids = list(dict.fromkeys(ids))
+  if len(ids) > MAX_WORD_IDS:
+    raise ValueError(f'at most {MAX_WORD_IDS} ids can be fetched per request')
+  return ids
+
 def load(app):
-  # Endpoint: GET /words with pagination (50 words per page)
+  # Endpoint: GET /words with pagination (50 words per page), or
+  # GET /words?ids=1,2,3 for the details of several words at once
   @app.route('/words', methods=['GET'])
   @cross_origin()
+  @conditional('words', 'word_reviews', 'word_groups', 'groups')
   def get_words():
+    if 'ids' in request.args:
+      return get_words_by_id()
     try:
       cursor = app.db.cursor()
 
-      # Get the current page number from query parameters (default is 1)
-      page = int(request.args.get('page', 1))
-      # Ensure page number is positive
-      page = max(1, page)
       words_per_page = 50
-      offset = (page - 1) * words_per_page
 
       # Get sorting parameters from the query string
       sort_by = request.args.get('sort_by', 'kanji')  # Default to sorting by 'kanji'
       order = request.args.get('order', 'asc')  # Default to ascending order
 
-      # Validate sort_by and order
-      valid_columns = ['kanji', 'romaji', 'english', 'correct_count', 'wrong_count']
-      if sort_by not in valid_columns:
+      # Validate sort_by and order, mapping each allowed column to its SQL expression
+      sort_columns = {
+        'kanji': 'w.kanji',
+        'romaji': 'w.romaji',
+        'english': 'w.english',
+        'correct_count': 'COALESCE(r.correct_count, 0)',
+        'wrong_count': 'COALESCE(r.wrong_count, 0)'
+      }
+      if sort_by not in sort_columns:
         sort_by = 'kanji'
       if order not in ['asc', 'desc']:
         order = 'asc'
 
+      # Page either by `cursor` (keyset) or by the legacy `page` number
+      try:
+        keyset = Keyset(request.args, sort_by, order, sort_columns[sort_by], 'w.id', words_per_page)
+      except InvalidCursor as e:
+        return jsonify({"error": str(e)}), 400
+      where, where_params = keyset.condition()
+
       # Query to fetch words with sorting
       cursor.execute(f'''
         SELECT w.id, w.kanji, w.romaji, w.english, 
@@ -35,16 +100,19 @@ def load(app):
             COALESCE(r.wrong_count, 0) AS wrong_count
         FROM words w
         LEFT JOIN word_reviews r ON w.id = r.word_id
-        ORDER BY {sort_by} {order}
+        {'WHERE ' + where if where else ''}
+        ORDER BY {keyset.order_by}
         LIMIT ? OFFSET ?
-      ''', (words_per_page, offset))
+      ''', (*where_params, *keyset.limit_params()))
 
-      words = cursor.fetchall()
+      words = keyset.rows(cursor.fetchall(), sort_key=sort_by)
 
-      # Query the total number of words
-      cursor.execute('SELECT COUNT(*) FROM words')
-      total_words = cursor.fetchone()[0]
-      total_pages = (total_words + words_per_page - 1) // words_per_page
+      # Query the total number of words, unless the client opted out
+      total_words = None
+      if keyset.include_total:
+        cursor.execute('SELECT COUNT(*) FROM words')
+        total_words = cursor.fetchone()[0]
+      total_pages = keyset.total_pages(total_words)
 
       # Format the response
       words_data = []
@@ -61,62 +129,114 @@ def load(app):
       return jsonify({
         "words": words_data,
         "total_pages": total_pages,
-        "current_page": page,
-        "total_words": total_words
+        "current_page": keyset.current_page,
+        "total_words": total_words,
+        "next_cursor": keyset.next_cursor
       })
 
     except Exception as e:
       return jsonify({"error": str(e)}), 500
-    finally:
-      app.db.close()
+
+  # Same word objects as GET /words/:id, in the order asked for, with one IN query
+  def get_words_by_id():
+    try:
+      try:
+        ids = parse_ids(request.args['ids'])
+      except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+      cursor = app.db.cursor()
+      cursor.execute(WORD_DETAIL_SQL.format(ids=','.join('?' * len(ids))), ids)
+      words = {word["id"]: word for word in cursor.fetchall()}
+
+      return jsonify({
+        "words": [word_detail_json(words[word_id]) for word_id in ids if word_id in words],
+        "missing": [word_id for word_id in ids if word_id not in words]
+      })
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: GET /words/search?q=&limit= ranked vocabulary search
+  @app.route('/words/search', methods=['GET'])
+  @cross_origin()
+  @conditional('words', 'word_reviews')
+  def search_words():
+    try:
+      query = request.args.get('q', '').strip()
+      if not query:
+        return jsonify({"error": "q is required"}), 400
+      limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+
+      cursor = app.db.cursor()
+
+      if len(query) >= 3:
+        # Substring match through the trigram index, ranked by bm25 with exact matches first
+        phrase = '"' + query.replace('"', '""') + '"'
+        cursor.execute('''
+          SELECT w.id, w.kanji, w.romaji, w.english,
+              COALESCE(r.correct_count, 0) AS correct_count,
+              COALESCE(r.wrong_count, 0) AS wrong_count
+          FROM words_fts
+          JOIN words w ON w.id = words_fts.rowid
+          LEFT JOIN word_reviews r ON w.id = r.word_id
+          WHERE words_fts MATCH :phrase
+          ORDER BY (w.kanji = :q COLLATE NOCASE OR w.romaji = :q COLLATE NOCASE OR w.english = :q COLLATE NOCASE) DESC, bm25(words_fts)
+          LIMIT :limit
+        ''', {"q": query, "phrase": phrase, "limit": limit})
+      else:
+        # Trigrams need 3 characters, so short queries (e.g. a single kanji)
+        # are prefix matches through the NOCASE kanji/romaji/english indexes
+        # instead, case-insensitive like the trigram match
+        upper = query + '\U0010ffff'
+        cursor.execute('''
+          SELECT w.id, w.kanji, w.romaji, w.english,
+              COALESCE(r.correct_count, 0) AS correct_count,
+              COALESCE(r.wrong_count, 0) AS wrong_count
+          FROM words w
+          LEFT JOIN word_reviews r ON w.id = r.word_id
+          WHERE w.id IN (
+            SELECT id FROM words WHERE kanji >= :q COLLATE NOCASE AND kanji < :upper COLLATE NOCASE
+            UNION
+            SELECT id FROM words WHERE romaji >= :q COLLATE NOCASE AND romaji < :upper COLLATE NOCASE
+            UNION
+            SELECT id FROM words WHERE english >= :q COLLATE NOCASE AND english < :upper COLLATE NOCASE
+          )
+          ORDER BY (w.kanji = :q COLLATE NOCASE OR w.romaji = :q COLLATE NOCASE OR w.english = :q COLLATE NOCASE) DESC, length(w.kanji), w.id
+          LIMIT :limit
+        ''', {"q": query, "upper": upper, "limit": limit})
+
+      words = cursor.fetchall()
+      return jsonify({
+        "query": query,
+        "words": [{
+          "id": word["id"],
+          "kanji": word["kanji"],
+          "romaji": word["romaji"],
+          "english": word["english"],
+          "correct_count": word["correct_count"],
+          "wrong_count": word["wrong_count"]
+        } for word in words]
+      })
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
 
   # Endpoint: GET /words/:id to get a single word with its details
   @app.route('/words/<int:word_id>', methods=['GET'])
   @cross_origin()
+  @conditional('words', 'word_reviews', 'word_groups', 'groups')
   def get_word(word_id):
     try:
       cursor = app.db.cursor()
       
       # Query to fetch the word and its details
-      cursor.execute('''
-        SELECT w.id, w.kanji, w.romaji, w.english,
-               COALESCE(r.correct_count, 0) AS correct_count,
-               COALESCE(r.wrong_count, 0) AS wrong_count,
-               GROUP_CONCAT(DISTINCT g.id || '::' || g.name) as groups
-        FROM words w
-        LEFT JOIN word_reviews r ON w.id = r.word_id
-        LEFT JOIN word_groups wg ON w.id = wg.word_id
-        LEFT JOIN groups g ON wg.group_id = g.id
-        WHERE w.id = ?
-        GROUP BY w.id
-      ''', (word_id,))
+      cursor.execute(WORD_DETAIL_SQL.format(ids='?'), (word_id,))
       
       word = cursor.fetchone()
       
       if not word:
         return jsonify({"error": "Word not found"}), 404
       
-      # Parse the groups string into a list of group objects
-      groups = []
-      if word["groups"]:
-        for group_str in word["groups"].split(','):
-          group_id, group_name = group_str.split('::')
-          groups.append({
-            "id": int(group_id),
-            "name": group_name
-          })
-      
-      return jsonify({
-        "word": {
-          "id": word["id"],
-          "kanji": word["kanji"],
-          "romaji": word["romaji"],
-          "english": word["english"],
-          "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"],
-          "groups": groups
-        }
-      })
+      return jsonify({"word": word_detail_json(word)})
       
     except Exception as e:
       return jsonify({"error": str(e)}), 500
\ No newline at end of file
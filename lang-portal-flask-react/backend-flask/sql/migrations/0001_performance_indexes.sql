@@ -0,0 +1,29 @@
+-- Secondary indexes for the hot route queries, which were all full table scans
+
+-- Group membership is looked up from both sides
+CREATE INDEX IF NOT EXISTS idx_word_groups_group_id_word_id ON word_groups(group_id, word_id);
+CREATE INDEX IF NOT EXISTS idx_word_groups_word_id ON word_groups(word_id);
+
+-- Review items are fetched per session and aggregated per word
+CREATE INDEX IF NOT EXISTS idx_word_review_items_study_session_id ON word_review_items(study_session_id);
+CREATE INDEX IF NOT EXISTS idx_word_review_items_word_id ON word_review_items(word_id);
+
+-- Group session listings filter by group and sort by start time
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group_id_created_at ON study_sessions(group_id, created_at);
+
+-- word_reviews holds one aggregate row per word. Fold any duplicates
+-- (possible with the old select-then-insert logging) into the oldest row
+-- before enforcing that with a unique index.
+UPDATE word_reviews
+SET
+  correct_count = (SELECT SUM(r.correct_count) FROM word_reviews r WHERE r.word_id = word_reviews.word_id),
+  wrong_count = (SELECT SUM(r.wrong_count) FROM word_reviews r WHERE r.word_id = word_reviews.word_id),
+  last_reviewed = (SELECT MAX(r.last_reviewed) FROM word_reviews r WHERE r.word_id = word_reviews.word_id)
+WHERE id IN (
+  SELECT MIN(id) FROM word_reviews GROUP BY word_id HAVING COUNT(*) > 1
+);
+
+DELETE FROM word_reviews
+WHERE id NOT IN (SELECT MIN(id) FROM word_reviews GROUP BY word_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_reviews_word_id ON word_reviews(word_id);
@@ -0,0 +1,6 @@
+-- Indexes backing keyset pagination on (sort column, id). The rowid is
+-- implicitly the last column of every index, so these cover the id tie-breaker.
+CREATE INDEX IF NOT EXISTS idx_words_kanji ON words(kanji);
+CREATE INDEX IF NOT EXISTS idx_words_romaji ON words(romaji);
+CREATE INDEX IF NOT EXISTS idx_words_english ON words(english);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_created_at ON study_sessions(created_at);
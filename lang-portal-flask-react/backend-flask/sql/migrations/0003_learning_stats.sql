@@ -0,0 +1,39 @@
+-- Materialized dashboard statistics, maintained in the same transaction as
+-- each review insert (see lib/stats.py) instead of aggregating
+-- word_review_items on every dashboard load
+
+-- Per word attempt counts over the current review history. Unlike
+-- word_reviews these are cleared together with the history on reset.
+CREATE TABLE IF NOT EXISTS word_stats (
+  word_id INTEGER PRIMARY KEY,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  correct INTEGER NOT NULL DEFAULT 0,
+  FOREIGN KEY (word_id) REFERENCES words(id)
+);
+
+-- Single row summary read by /dashboard/stats
+CREATE TABLE IF NOT EXISTS learning_stats (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  total_reviews INTEGER NOT NULL DEFAULT 0,
+  correct_reviews INTEGER NOT NULL DEFAULT 0,
+  words_studied INTEGER NOT NULL DEFAULT 0,
+  mastered_words INTEGER NOT NULL DEFAULT 0,  -- >= 5 attempts with >= 80% correct
+  total_sessions INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO learning_stats (id) VALUES (1);
+
+-- Backfill from the existing history
+INSERT OR REPLACE INTO word_stats (word_id, attempts, correct)
+SELECT wri.word_id, COUNT(*), SUM(CASE WHEN wri.correct = 1 THEN 1 ELSE 0 END)
+FROM word_review_items wri
+JOIN study_sessions ss ON wri.study_session_id = ss.id
+GROUP BY wri.word_id;
+
+UPDATE learning_stats SET
+  total_reviews = (SELECT COALESCE(SUM(attempts), 0) FROM word_stats),
+  correct_reviews = (SELECT COALESCE(SUM(correct), 0) FROM word_stats),
+  words_studied = (SELECT COUNT(*) FROM word_stats),
+  mastered_words = (SELECT COUNT(*) FROM word_stats WHERE attempts >= 5 AND correct * 1.0 / attempts >= 0.8),
+  total_sessions = (SELECT COUNT(*) FROM study_sessions)
+WHERE id = 1;
@@ -0,0 +1,24 @@
+-- Per day rollup of study activity, maintained on write (see lib/activity.py)
+-- and read by the streak and the activity calendar with a primary key range scan
+CREATE TABLE IF NOT EXISTS daily_activity (
+  day TEXT PRIMARY KEY,  -- YYYY-MM-DD in the configured ACTIVITY_TIMEZONE
+  sessions INTEGER NOT NULL DEFAULT 0,
+  reviews INTEGER NOT NULL DEFAULT 0,
+  correct INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+
+-- Backfill using the stored dates as is, `invoke rebuild-stats --timezone`
+-- re-buckets the history into another timezone
+INSERT OR REPLACE INTO daily_activity (day, sessions, reviews, correct)
+SELECT day, SUM(sessions), SUM(reviews), SUM(correct)
+FROM (
+  SELECT date(created_at) as day, COUNT(*) as sessions, 0 as reviews, 0 as correct
+  FROM study_sessions
+  GROUP BY date(created_at)
+  UNION ALL
+  SELECT date(wri.created_at), 0, COUNT(*), SUM(CASE WHEN wri.correct = 1 THEN 1 ELSE 0 END)
+  FROM word_review_items wri
+  JOIN study_sessions ss ON wri.study_session_id = ss.id
+  GROUP BY date(wri.created_at)
+)
+GROUP BY day;
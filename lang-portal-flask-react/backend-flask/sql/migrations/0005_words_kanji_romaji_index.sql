@@ -0,0 +1,2 @@
+-- Lets the bulk importer dedupe incoming words by (kanji, romaji) with an index lookup
+CREATE INDEX IF NOT EXISTS idx_words_kanji_romaji ON words(kanji, romaji);
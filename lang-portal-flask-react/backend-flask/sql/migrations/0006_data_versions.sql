@@ -0,0 +1,118 @@
+-- Per table data versions, bumped by triggers on every write so read routes
+-- can derive ETags (see lib/conditional.py) without running their queries
+CREATE TABLE IF NOT EXISTS data_versions (
+  table_name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 0,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO data_versions (table_name) VALUES
+  ('words'),
+  ('groups'),
+  ('word_groups'),
+  ('word_reviews'),
+  ('word_review_items'),
+  ('study_sessions'),
+  ('study_activities');
+
+-- Random per database epoch, part of every ETag so a recreated database
+-- never reuses the ETags of the old one
+INSERT OR IGNORE INTO data_versions (table_name, version) VALUES ('database', abs(random()));
+
+-- words
+CREATE TRIGGER IF NOT EXISTS words_version_insert AFTER INSERT ON words
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'words';
+END;
+CREATE TRIGGER IF NOT EXISTS words_version_update AFTER UPDATE ON words
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'words';
+END;
+CREATE TRIGGER IF NOT EXISTS words_version_delete AFTER DELETE ON words
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'words';
+END;
+
+-- groups
+CREATE TRIGGER IF NOT EXISTS groups_version_insert AFTER INSERT ON groups
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'groups';
+END;
+CREATE TRIGGER IF NOT EXISTS groups_version_update AFTER UPDATE ON groups
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'groups';
+END;
+CREATE TRIGGER IF NOT EXISTS groups_version_delete AFTER DELETE ON groups
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'groups';
+END;
+
+-- word_groups
+CREATE TRIGGER IF NOT EXISTS word_groups_version_insert AFTER INSERT ON word_groups
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'word_groups';
+END;
+CREATE TRIGGER IF NOT EXISTS word_groups_version_update AFTER UPDATE ON word_groups
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'word_groups';
+END;
+CREATE TRIGGER IF NOT EXISTS word_groups_version_delete AFTER DELETE ON word_groups
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'word_groups';
+END;
+
+-- word_reviews
+CREATE TRIGGER IF NOT EXISTS word_reviews_version_insert AFTER INSERT ON word_reviews
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'word_reviews';
+END;
+CREATE TRIGGER IF NOT EXISTS word_reviews_version_update AFTER UPDATE ON word_reviews
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'word_reviews';
+END;
+CREATE TRIGGER IF NOT EXISTS word_reviews_version_delete AFTER DELETE ON word_reviews
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'word_reviews';
+END;
+
+-- word_review_items
+CREATE TRIGGER IF NOT EXISTS word_review_items_version_insert AFTER INSERT ON word_review_items
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'word_review_items';
+END;
+CREATE TRIGGER IF NOT EXISTS word_review_items_version_update AFTER UPDATE ON word_review_items
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'word_review_items';
+END;
+CREATE TRIGGER IF NOT EXISTS word_review_items_version_delete AFTER DELETE ON word_review_items
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'word_review_items';
+END;
+
+-- study_sessions
+CREATE TRIGGER IF NOT EXISTS study_sessions_version_insert AFTER INSERT ON study_sessions
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'study_sessions';
+END;
+CREATE TRIGGER IF NOT EXISTS study_sessions_version_update AFTER UPDATE ON study_sessions
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'study_sessions';
+END;
+CREATE TRIGGER IF NOT EXISTS study_sessions_version_delete AFTER DELETE ON study_sessions
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'study_sessions';
+END;
+
+-- study_activities
+CREATE TRIGGER IF NOT EXISTS study_activities_version_insert AFTER INSERT ON study_activities
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'study_activities';
+END;
+CREATE TRIGGER IF NOT EXISTS study_activities_version_update AFTER UPDATE ON study_activities
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'study_activities';
+END;
+CREATE TRIGGER IF NOT EXISTS study_activities_version_delete AFTER DELETE ON study_activities
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'study_activities';
+END;
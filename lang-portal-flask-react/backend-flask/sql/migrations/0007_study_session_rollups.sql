@@ -0,0 +1,14 @@
+-- Per session aggregates maintained when reviews are logged (see lib/reviews.py),
+-- so session listings no longer aggregate word_review_items per row
+ALTER TABLE study_sessions ADD COLUMN last_activity_at DATETIME;  -- Timestamp of the latest review
+ALTER TABLE study_sessions ADD COLUMN review_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE study_sessions ADD COLUMN correct_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE study_sessions ADD COLUMN ended_at DATETIME;  -- Set by POST /study_sessions/<id>/end
+
+UPDATE study_sessions SET
+  last_activity_at = (SELECT MAX(created_at) FROM word_review_items WHERE study_session_id = study_sessions.id),
+  review_count = (SELECT COUNT(*) FROM word_review_items WHERE study_session_id = study_sessions.id),
+  correct_count = (SELECT COUNT(*) FROM word_review_items WHERE study_session_id = study_sessions.id AND correct = 1);
+
+-- Study activity session listings filter by activity and sort by start time
+CREATE INDEX IF NOT EXISTS idx_study_sessions_study_activity_id_created_at ON study_sessions(study_activity_id, created_at);
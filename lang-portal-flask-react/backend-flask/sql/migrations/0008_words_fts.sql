@@ -0,0 +1,31 @@
+-- Full text index over the vocabulary for /words/search. The trigram tokenizer
+-- matches any substring of 3+ characters (partial kanji, romaji and English),
+-- case-insensitively. It is an external content table over words, kept in
+-- sync by the triggers below.
+CREATE VIRTUAL TABLE IF NOT EXISTS words_fts USING fts5(
+  kanji,
+  romaji,
+  english,
+  content='words',
+  content_rowid='id',
+  tokenize='trigram'
+);
+
+CREATE TRIGGER IF NOT EXISTS words_fts_insert AFTER INSERT ON words
+BEGIN
+  INSERT INTO words_fts (rowid, kanji, romaji, english) VALUES (new.id, new.kanji, new.romaji, new.english);
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_fts_delete AFTER DELETE ON words
+BEGIN
+  INSERT INTO words_fts (words_fts, rowid, kanji, romaji, english) VALUES ('delete', old.id, old.kanji, old.romaji, old.english);
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_fts_update AFTER UPDATE OF kanji, romaji, english ON words
+BEGIN
+  INSERT INTO words_fts (words_fts, rowid, kanji, romaji, english) VALUES ('delete', old.id, old.kanji, old.romaji, old.english);
+  INSERT INTO words_fts (rowid, kanji, romaji, english) VALUES (new.id, new.kanji, new.romaji, new.english);
+END;
+
+-- Index the existing vocabulary
+INSERT INTO words_fts (words_fts) VALUES ('rebuild');
@@ -0,0 +1,35 @@
+-- Canonical pre-encoded JSON object of each word ({english, id, kanji, parts,
+-- romaji}), spliced as-is into /api/groups/<id>/words/raw instead of parsing
+-- `parts` and re-encoding every row. Kept current by the triggers below.
+ALTER TABLE words ADD COLUMN payload_json TEXT;
+
+CREATE TRIGGER IF NOT EXISTS words_payload_json_insert AFTER INSERT ON words
+BEGIN
+  UPDATE words SET payload_json = json_object(
+    'english', new.english,
+    'id', new.id,
+    'kanji', new.kanji,
+    'parts', json(new.parts),
+    'romaji', new.romaji
+  ) WHERE id = new.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS words_payload_json_update AFTER UPDATE OF kanji, romaji, english, parts ON words
+BEGIN
+  UPDATE words SET payload_json = json_object(
+    'english', new.english,
+    'id', new.id,
+    'kanji', new.kanji,
+    'parts', json(new.parts),
+    'romaji', new.romaji
+  ) WHERE id = new.id;
+END;
+
+-- Encode the existing vocabulary
+UPDATE words SET payload_json = json_object(
+  'english', english,
+  'id', id,
+  'kanji', kanji,
+  'parts', json(parts),
+  'romaji', romaji
+);
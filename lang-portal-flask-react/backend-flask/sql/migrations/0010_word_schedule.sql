@@ -0,0 +1,23 @@
+-- SM-2 spaced repetition state, updated with every review (see lib/scheduler.py)
+CREATE TABLE IF NOT EXISTS word_schedule (
+  word_id INTEGER PRIMARY KEY,
+  ease REAL NOT NULL DEFAULT 2.5,
+  interval_days REAL NOT NULL DEFAULT 0,
+  repetitions INTEGER NOT NULL DEFAULT 0,  -- consecutive correct reviews
+  lapses INTEGER NOT NULL DEFAULT 0,
+  due_at DATETIME,
+  FOREIGN KEY (word_id) REFERENCES words(id)
+);
+
+-- The word's due_at copied onto each of its group memberships, so a group's
+-- due queue is a range scan over (group_id, due_at). NULL means never reviewed.
+ALTER TABLE word_groups ADD COLUMN due_at DATETIME;
+CREATE INDEX IF NOT EXISTS idx_word_groups_group_id_due_at ON word_groups(group_id, due_at);
+
+-- Rescheduling changes no word_groups data any read route serves, so only
+-- membership changes bump its data version
+DROP TRIGGER IF EXISTS word_groups_version_update;
+CREATE TRIGGER IF NOT EXISTS word_groups_version_update AFTER UPDATE OF word_id, group_id ON word_groups
+BEGIN
+  UPDATE data_versions SET version = version + 1, updated_at = CURRENT_TIMESTAMP WHERE table_name = 'word_groups';
+END;
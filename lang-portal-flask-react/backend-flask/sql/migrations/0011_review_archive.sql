@@ -0,0 +1,16 @@
+-- Review history retention (lib/archive.py): review items of idle sessions are
+-- moved to an attached archive database and leave per (word, day) aggregates
+-- behind, so the materialized statistics still rebuild from the hot database
+CREATE TABLE IF NOT EXISTS word_review_daily (
+  word_id INTEGER NOT NULL,
+  day DATE NOT NULL,  -- Day of the reviews in ACTIVITY_TIMEZONE when they were archived
+  attempts INTEGER NOT NULL,
+  correct INTEGER NOT NULL,
+  last_reviewed DATETIME,
+  PRIMARY KEY (word_id, day)
+) WITHOUT ROWID;
+
+ALTER TABLE study_sessions ADD COLUMN archived_at DATETIME;  -- Set when the review items were archived
+
+-- The archive job walks sessions by their last review
+CREATE INDEX IF NOT EXISTS idx_study_sessions_last_activity_at ON study_sessions(last_activity_at);
@@ -0,0 +1,28 @@
+-- Group membership is a set: drop repeated (word_id, group_id) rows, keeping
+-- the first, and let a unique index reject new ones. Its word_id prefix
+-- also serves the lookups idx_word_groups_word_id was for.
+DELETE FROM word_groups
+WHERE rowid NOT IN (SELECT MIN(rowid) FROM word_groups GROUP BY word_id, group_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_groups_word_id_group_id ON word_groups(word_id, group_id);
+DROP INDEX IF EXISTS idx_word_groups_word_id;
+
+-- groups.words_count is kept exact by triggers on word_groups from here on
+UPDATE groups SET words_count = (SELECT COUNT(*) FROM word_groups WHERE group_id = groups.id);
+
+CREATE TRIGGER IF NOT EXISTS word_groups_words_count_insert AFTER INSERT ON word_groups
+BEGIN
+  UPDATE groups SET words_count = COALESCE(words_count, 0) + 1 WHERE id = NEW.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_groups_words_count_delete AFTER DELETE ON word_groups
+BEGIN
+  UPDATE groups SET words_count = COALESCE(words_count, 0) - 1 WHERE id = OLD.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_groups_words_count_update AFTER UPDATE OF group_id ON word_groups
+WHEN OLD.group_id IS NOT NEW.group_id
+BEGIN
+  UPDATE groups SET words_count = COALESCE(words_count, 0) - 1 WHERE id = OLD.group_id;
+  UPDATE groups SET words_count = COALESCE(words_count, 0) + 1 WHERE id = NEW.group_id;
+END
@@ -0,0 +1,5 @@
+-- Case-insensitive prefix search for queries too short for the trigram index
+-- (GET /words/search), which matches ASCII case-insensitively as well
+CREATE INDEX IF NOT EXISTS idx_words_kanji_nocase ON words(kanji COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_words_romaji_nocase ON words(romaji COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_words_english_nocase ON words(english COLLATE NOCASE);
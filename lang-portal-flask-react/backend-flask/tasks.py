@@ -1,3 +1,4 @@
+import os
 from invoke import task
 from lib.db import db
 
@@ -6,4 +7,87 @@ def init_db(c):
   from flask import Flask
   app = Flask(__name__)
   db.init(app)
-  print("Database initialized successfully.")
\ No newline at end of file
+  print("Database initialized successfully.")
+
+@task
+def import_words(c, group, path, batch_size=5000):
+  from flask import Flask
+  from lib.importer import import_words as bulk_import_words
+  app = Flask(__name__)
+  with app.app_context():
+    stats = bulk_import_words(db.get(), group, path, batch_size=batch_size)
+  print(f"Imported {stats['parsed']} words into '{group}' in {stats['seconds']:.2f}s ({stats['rows_per_sec']:.0f} rows/sec).")
+  print(f"{stats['inserted']} new words, {stats['skipped']} already present, {stats['added_to_group']} added to the group.")
+
+@task
+def migrate(c, explain=False, shards=None):
+  from migrate import run_migrations
+  run_migrations(db.database, explain)
+  # Learner shards carry the full schema, so they take the same migrations
+  if shards:
+    import glob
+    for path in sorted(glob.glob(os.path.join(shards, 'learner-*.db'))):
+      print(f"Shard {path}:")
+      run_migrations(path, explain)
+
+
+# Flask app with the API's settings (ACTIVITY_TIMEZONE, REVIEW_ARCHIVE_DATABASE, ...)
+def configured_app():
+  from flask import Flask
+  from app import load_config
+  app = Flask(__name__)
+  load_config(app)
+  return app
+
+@task
+def rebuild_stats(c, check=False, timezone=None, archive=None):
+  from lib.stats import rebuild_learning_stats, rebuild_session_rollups
+  from lib.scheduler import rebuild_schedule
+  from lib.archive import review_items_source
+  import lib.activity
+  app = configured_app()
+  lib.activity.configure(timezone or app.config['ACTIVITY_TIMEZONE'])
+  archive = archive or app.config['REVIEW_ARCHIVE_DATABASE']
+  with app.app_context():
+    # The schedule replays raw history, archived items included
+    source = review_items_source(db.get(), archive, include_archive=True)
+    cursor = db.cursor()
+    drift = rebuild_learning_stats(cursor, check=check)
+    drift += lib.activity.rebuild_daily_activity(cursor, check=check)
+    drift += rebuild_session_rollups(cursor, check=check)
+    drift += rebuild_schedule(cursor, check=check, source=source)
+    if not check:
+      db.commit()
+    for line in drift:
+      print(line)
+    if not drift:
+      print("Materialized statistics match the review history.")
+    elif check:
+      print(f"{len(drift)} differences found, run without --check to rebuild.")
+    else:
+      print(f"Rebuilt materialized statistics, fixed {len(drift)} differences.")
+
+@task
+def archive_reviews(c, days=90, archive=None, timezone=None, vacuum=False):
+  from datetime import timedelta
+  from lib.archive import archive_reviews as move_reviews
+  from lib.scheduler import utc_now
+  import lib.activity
+  app = configured_app()
+  lib.activity.configure(timezone or app.config['ACTIVITY_TIMEZONE'])
+  archive = archive or app.config['REVIEW_ARCHIVE_DATABASE']
+  with app.app_context():
+    stats = move_reviews(db.get(), archive, utc_now() - timedelta(days=days))
+    if vacuum:
+      # Hand the freed pages back so the hot database shrinks on disk
+      db.get().execute('VACUUM main')
+  print(f"Archived {stats['reviews']} reviews of {stats['sessions']} sessions older than {days} days to {archive} in {stats['seconds']:.1f}s.")
+
+@task
+def generate_data(c, words=10000, groups=50, sessions=100000, reviews=10000000, days=365, alpha=1.5, seed=0):
+  from flask import Flask
+  from lib.synthetic import generate
+  app = Flask(__name__)
+  with app.app_context():
+    stats = generate(db.get(), words=words, groups=groups, sessions=sessions, reviews=reviews, days=days, alpha=alpha, seed=seed)
+  print(f"Generated {stats['words']} words, {stats['groups']} groups, {stats['sessions']} sessions and {stats['reviews']} reviews in {stats['seconds']:.1f}s.")
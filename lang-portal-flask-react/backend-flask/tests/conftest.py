@@ -0,0 +1,96 @@
+import os
+import sqlite3
+import sys
+
+import pytest
+from flask import Flask
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from app import create_app
+from lib.db import Db
+from lib.stats import rebuild_learning_stats, rebuild_session_rollups
+from lib.scheduler import rebuild_schedule
+from lib.archive import review_items_source
+import lib.activity
+
+# pytest-flask pushes a request context around every test, and requests made
+# while it is active share its app context: the first request's pooled
+# connection (read-only for a GET) would serve every later request of the
+# test. Each test client request gets its own app context, as it does when
+# served.
+@pytest.fixture(autouse=True)
+def _push_request_context():
+  pass
+
+# The seeded database (tables, migrations, seed words and activities) is built
+# once per session, each test gets its own copy
+@pytest.fixture(scope='session')
+def seeded_database(tmp_path_factory):
+  path = str(tmp_path_factory.mktemp('seed') / 'words.db')
+  cwd = os.getcwd()
+  os.chdir(BACKEND_DIR)  # Db.init reads seed/ relative to the working directory
+  try:
+    db = Db(database=path)
+    db.init(Flask(__name__))
+    db.dispose()
+  finally:
+    os.chdir(cwd)
+  return path
+
+@pytest.fixture
+def config(seeded_database, tmp_path):
+  database = str(tmp_path / 'words.db')
+  # Through the backup API, the seed may still have pages in its WAL
+  source, target = sqlite3.connect(seeded_database), sqlite3.connect(database)
+  try:
+    source.backup(target)
+  finally:
+    source.close()
+    target.close()
+  return {
+    'TESTING': True,
+    'DATABASE': database,
+    'REVIEW_ARCHIVE_DATABASE': str(tmp_path / 'words-archive.db'),
+    'SNAPSHOT_DATABASE': str(tmp_path / 'words-snapshot.db'),
+  }
+
+# Used by pytest-flask's client fixture
+@pytest.fixture
+def app(config):
+  app = create_app(config)
+  yield app
+  app.db.dispose()
+
+@pytest.fixture
+def session_id(client):
+  response = client.post('/study_sessions', json={'group_id': 1, 'study_activity_id': 1})
+  assert response.status_code == 201
+  return response.get_json()['session_id']
+
+# Rows of a query against the test database, on a connection of its own
+@pytest.fixture
+def query(app):
+  connection = sqlite3.connect(app.config['DATABASE'])
+  def run(sql, params=()):
+    return [tuple(row) for row in connection.execute(sql, params).fetchall()]
+  yield run
+  connection.close()
+
+# What `invoke rebuild-stats --check` reports: the differences between the
+# materialized statistics and the ones rebuilt from the review history
+@pytest.fixture
+def drift(app):
+  def run():
+    # The checks only read, and the test's app context may hold the writer
+    with app.db.connection(readonly=True) as connection:
+      source = review_items_source(connection, app.config['REVIEW_ARCHIVE_DATABASE'], include_archive=True)
+      cursor = connection.cursor()
+      return (
+        rebuild_learning_stats(cursor, check=True) +
+        lib.activity.rebuild_daily_activity(cursor, check=True) +
+        rebuild_session_rollups(cursor, check=True) +
+        rebuild_schedule(cursor, check=True, source=source)
+      )
+  return run
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import create_app
+from lib.activity import day_of
+
+# Every test runs with days bucketed in UTC and in a zone ahead of it
+@pytest.fixture(params=['UTC', 'Asia/Tokyo'])
+def app(config, request):
+  app = create_app({**config, 'ACTIVITY_TIMEZONE': request.param})
+  yield app
+  app.db.dispose()
+
+def utc(days_ago, hour):
+  moment = datetime.now(timezone.utc).replace(hour=hour, minute=0, second=0, microsecond=0) - timedelta(days=days_ago)
+  return moment.isoformat()
+
+def test_reviews_are_bucketed_into_days(client, session_id, drift):
+  reviews = [
+    {"word_id": 1, "correct": True, "created_at": utc(2, 1)},
+    {"word_id": 2, "correct": False, "created_at": utc(2, 20)},
+    {"word_id": 3, "correct": True, "created_at": utc(1, 12)},
+    {"word_id": 4, "correct": True},
+  ]
+  assert client.post(f'/study_sessions/{session_id}/reviews', json=reviews).status_code == 200
+
+  expected = {}
+  for review in reviews:
+    day = day_of(review.get("created_at") and datetime.fromisoformat(review["created_at"]))
+    count, correct = expected.get(day, (0, 0))
+    expected[day] = (count + 1, correct + (1 if review["correct"] else 0))
+
+  days = client.get('/dashboard/calendar?days=5').get_json()['days']
+  assert len(days) == 5
+  assert {entry['date']: (entry['reviews'], entry['correct']) for entry in days if entry['reviews']} == expected
+  assert sum(entry['sessions'] for entry in days) == 1
+  assert drift() == []
+
+def test_streak_counts_today(client):
+  assert client.get('/dashboard/stats').get_json()['current_streak'] == 0
+  client.post('/study_sessions', json={'group_id': 1, 'study_activity_id': 1})
+  client.post('/study_sessions', json={'group_id': 2, 'study_activity_id': 1})
+  assert client.get('/dashboard/stats').get_json()['current_streak'] == 1
+
+def test_calendar_range_is_validated(client):
+  assert client.get('/dashboard/calendar?days=0').status_code == 400
+  assert client.get('/dashboard/calendar?days=1001').status_code == 400
+
+def test_reset_clears_the_rollup(client, session_id, query, drift):
+  client.post(f'/study_sessions/{session_id}/reviews', json=[{"word_id": 1, "correct": True}])
+  assert client.post('/api/study-sessions/reset').status_code == 200
+  assert query('SELECT COUNT(*) FROM daily_activity') == [(0,)]
+  assert drift() == []
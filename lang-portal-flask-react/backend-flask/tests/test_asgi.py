@@ -0,0 +1,135 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('aiosqlite')
+pytest.importorskip('asgiref')
+
+from lib.asgi import AsgiApp
+
+# Run one request through the ASGI app, returns (status, headers, body)
+async def asgi_request(asgi_app, method, path, headers=(), body=b''):
+  path, _, query = path.partition('?')
+  headers = list(headers)
+  if body:
+    headers.append(('Content-Length', str(len(body))))
+  scope = {
+    'type': 'http',
+    'http_version': '1.1',
+    'method': method,
+    'scheme': 'http',
+    'path': path,
+    'root_path': '',
+    'query_string': query.encode('latin-1'),
+    'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    'server': ('testserver', 80),
+  }
+  messages = [{'type': 'http.request', 'body': body}]
+  sent = []
+
+  async def receive():
+    return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+  async def send(message):
+    sent.append(message)
+
+  await asgi_app(scope, receive, send)
+  start = sent[0]
+  return (
+    start['status'],
+    {name.decode('latin-1'): value.decode('latin-1') for name, value in start['headers']},
+    b''.join(message.get('body', b'') for message in sent[1:])
+  )
+
+# Run coroutine(asgi_app) on a fresh loop and close the app's pool after it
+def run(app, coroutine):
+  async def main():
+    asgi_app = AsgiApp(app)
+    try:
+      return await coroutine(asgi_app)
+    finally:
+      await asgi_app.close()
+  return asyncio.run(main())
+
+def test_raw_words_match_the_flask_route(app, client):
+  flask_response = client.get('/api/groups/1/words/raw', headers={'Origin': 'http://localhost:8080'})
+
+  async def scenario(asgi_app):
+    return await asgi_request(asgi_app, 'GET', '/api/groups/1/words/raw', [('Origin', 'http://localhost:8080')])
+  status, headers, body = run(app, scenario)
+
+  assert status == 200
+  assert body == flask_response.get_data()
+  assert headers['etag'] == flask_response.headers['ETag']
+  assert headers['access-control-allow-origin'] == flask_response.headers['Access-Control-Allow-Origin']
+  # The Flask request already cached the body
+  assert headers['x-cache'] == 'HIT'
+
+def test_raw_words_not_modified(app):
+  async def scenario(asgi_app):
+    _, headers, _ = await asgi_request(asgi_app, 'GET', '/api/groups/1/words/raw')
+    return await asgi_request(asgi_app, 'GET', '/api/groups/1/words/raw', [('If-None-Match', headers['etag'])])
+  status, headers, body = run(app, scenario)
+
+  assert status == 304
+  assert body == b''
+  assert headers['cache-control'] == 'no-cache'
+
+def test_raw_words_unknown_group(app):
+  async def scenario(asgi_app):
+    return await asgi_request(asgi_app, 'GET', '/api/groups/999/words/raw')
+  status, _, body = run(app, scenario)
+
+  assert status == 404
+  assert json.loads(body) == {"error": "Group not found"}
+
+def test_next_words_match_the_flask_route(app, client, session_id):
+  flask_response = client.get(f'/study_sessions/{session_id}/next-words?n=5')
+
+  async def scenario(asgi_app):
+    return await asgi_request(asgi_app, 'GET', f'/study_sessions/{session_id}/next-words?n=5')
+  status, _, body = run(app, scenario)
+
+  assert status == 200
+  assert body == flask_response.get_data()
+
+def test_native_requests_are_counted(app):
+  async def scenario(asgi_app):
+    await asgi_request(asgi_app, 'GET', '/api/groups/1/words/raw')
+    await asgi_request(asgi_app, 'GET', '/api/groups/999/words/raw')
+  run(app, scenario)
+
+  requests, _, _, in_flight = app.metrics.collect()
+  assert requests[('get_group_words_raw', 'GET', 200)] == 1
+  assert requests[('get_group_words_raw', 'GET', 404)] == 1
+  assert in_flight == 0
+
+def test_writes_go_to_flask(app):
+  async def scenario(asgi_app):
+    body = json.dumps({'group_id': 1, 'study_activity_id': 1}).encode('utf-8')
+    return await asgi_request(asgi_app, 'POST', '/study_sessions', [('Content-Type', 'application/json')], body)
+  status, _, body = run(app, scenario)
+
+  assert status == 201
+  assert 'session_id' in json.loads(body)
+
+def test_flask_requests_run_concurrently(app):
+  threads = set()
+
+  @app.route('/test/slow')
+  def slow():
+    threads.add(threading.get_ident())
+    time.sleep(0.2)
+    return 'ok'
+
+  async def scenario(asgi_app):
+    started = time.perf_counter()
+    await asyncio.gather(*(asgi_request(asgi_app, 'GET', '/test/slow') for _ in range(4)))
+    return time.perf_counter() - started
+  seconds = run(app, scenario)
+
+  assert len(threads) == 4
+  assert seconds < 0.6
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from app import create_app
+from routes.batch import MAX_BATCH_REQUESTS
+from routes.words import MAX_WORD_IDS
+
+def test_words_by_id_keep_the_request_order(client):
+  response = client.get('/words?ids=3,1,999999,3,2')
+  assert response.status_code == 200
+  body = response.get_json()
+  assert [word['id'] for word in body['words']] == [3, 1, 2]
+  assert body['missing'] == [999999]
+  assert body['words'][0] == client.get('/words/3').get_json()['word']
+
+@pytest.mark.parametrize('ids', ['', 'a', '1,x', ','.join(str(i) for i in range(1, MAX_WORD_IDS + 2))])
+def test_invalid_ids(client, ids):
+  response = client.get(f'/words?ids={ids}')
+  assert response.status_code == 400
+  assert 'error' in response.get_json()
+
+def test_batch_matches_the_single_requests(client, session_id):
+  paths = ['/dashboard/stats', '/groups?page=1', f'/api/study-sessions/{session_id}', '/words?ids=1,2']
+  response = client.post('/batch', json={"requests": paths[:2] + [{"path": path} for path in paths[2:]]})
+  assert response.status_code == 200
+  responses = json.loads(response.get_data())['responses']
+  assert [(entry['path'], entry['status']) for entry in responses] == [(path, 200) for path in paths]
+  for path, entry in zip(paths, responses):
+    assert entry['body'] == client.get(path).get_json()
+
+def test_failed_sub_requests_are_entries(client):
+  # Sub-requests are GETs, write routes answer 405
+  response = client.post('/batch', json=['/groups/999999', '/no-such-route', '/study_sessions/1/end'])
+  assert response.status_code == 200
+  responses = response.get_json()['responses']
+  assert [entry['status'] for entry in responses] == [404, 404, 405]
+  assert all('error' in entry['body'] for entry in responses)
+
+@pytest.mark.parametrize('payload', [
+  None,
+  [],
+  {"requests": "/groups"},
+  ['groups'],
+  [{"url": "/groups"}],
+  ['/groups'] * (MAX_BATCH_REQUESTS + 1),
+])
+def test_invalid_batch(client, payload):
+  response = client.post('/batch', json=payload)
+  assert response.status_code == 400
+  assert 'error' in response.get_json()
+
+def test_batch_is_not_counted_as_a_write(config):
+  app = create_app({**config, 'SNAPSHOT_READS': True})
+  try:
+    client = app.test_client()
+    assert client.post('/batch', json=['/groups']).status_code == 200
+    assert app.db.snapshot.writes == 0
+    client.post('/study_sessions', json={'group_id': 1, 'study_activity_id': 1})
+    assert app.db.snapshot.writes == 1
+  finally:
+    app.db.snapshot.close()
+    app.db.dispose()
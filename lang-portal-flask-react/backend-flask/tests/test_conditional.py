@@ -0,0 +1,77 @@
+import pytest
+
+from app import create_app
+
+# With learner shards, requests without X-Learner-Id use the main database
+@pytest.fixture
+def app(config, tmp_path):
+  app = create_app({**config, 'SHARD_DIRECTORY': str(tmp_path / 'learners')})
+  yield app
+  app.db.dispose()
+
+def test_etag_and_not_modified(client):
+  first = client.get('/groups/1')
+  assert first.status_code == 200
+  assert first.headers['Cache-Control'] == 'no-cache'
+  assert first.headers['X-Cache'] == 'MISS'
+  etag = first.headers['ETag']
+
+  revalidated = client.get('/groups/1', headers={'If-None-Match': etag})
+  assert revalidated.status_code == 304
+  assert revalidated.get_data() == b''
+  assert revalidated.headers['ETag'] == etag
+
+  cached = client.get('/groups/1')
+  assert cached.headers['X-Cache'] == 'HIT'
+  assert cached.get_data() == first.get_data()
+
+  assert client.get('/groups/1', headers={'If-None-Match': '"stale"'}).status_code == 200
+
+def test_writes_change_the_etag_of_dependent_reads(client, session_id):
+  words = client.get('/groups/1/words')
+  activities = client.get('/api/study-activities')
+  client.post(f'/study_sessions/{session_id}/reviews', json=[{"word_id": 1, "correct": True}])
+
+  # word_reviews changed, study_activities did not
+  after = client.get('/groups/1/words', headers={'If-None-Match': words.headers['ETag']})
+  assert after.status_code == 200
+  assert after.headers['ETag'] != words.headers['ETag']
+  assert after.headers['X-Cache'] == 'MISS'
+  assert client.get('/api/study-activities', headers={'If-None-Match': activities.headers['ETag']}).status_code == 304
+
+def test_query_args_are_part_of_the_etag(client):
+  first = client.get('/groups?page=1')
+  second = client.get('/groups?page=2')
+  assert first.headers['ETag'] != second.headers['ETag']
+  assert client.get('/groups?page=2', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+
+def test_if_modified_since(client, session_id):
+  response = client.get('/api/study-sessions')
+  last_modified = response.headers['Last-Modified']
+  assert client.get('/api/study-sessions', headers={'If-Modified-Since': last_modified}).status_code == 304
+  # If-None-Match takes precedence
+  assert client.get('/api/study-sessions', headers={
+    'If-Modified-Since': last_modified,
+    'If-None-Match': '"stale"'
+  }).status_code == 200
+
+def test_errors_are_not_cached(client):
+  response = client.get('/groups/999999')
+  assert response.status_code == 404
+  assert 'ETag' not in response.headers
+  assert 'X-Cache' not in response.headers
+
+def test_etags_are_per_learner(client):
+  shared = client.get('/api/study-sessions')
+  alice = client.get('/api/study-sessions', headers={'X-Learner-Id': 'alice'})
+  assert alice.headers['ETag'] != shared.headers['ETag']
+  assert client.get('/api/study-sessions', headers={'If-None-Match': alice.headers['ETag']}).status_code == 200
+
+  # A write in a learner's shard leaves the other cached reads in place
+  response = client.post('/study_sessions', json={'group_id': 1, 'study_activity_id': 1}, headers={'X-Learner-Id': 'alice'})
+  assert response.status_code == 201
+  assert client.get('/api/study-sessions').headers['X-Cache'] == 'HIT'
+  assert client.get('/api/study-sessions', headers={'X-Learner-Id': 'bob'}).headers['X-Cache'] == 'MISS'
+  after = client.get('/api/study-sessions', headers={'X-Learner-Id': 'alice', 'If-None-Match': alice.headers['ETag']})
+  assert after.status_code == 200
+  assert len(after.get_json()['items']) == 1
@@ -0,0 +1,37 @@
+import gzip
+import json
+
+import routes.export
+
+def lines(data):
+  return [json.loads(line) for line in data.decode('utf-8').splitlines()]
+
+def test_export_pages_by_id(client, session_id, monkeypatch):
+  monkeypatch.setattr(routes.export, 'EXPORT_CHUNK_ROWS', 2)
+  client.post(f'/study_sessions/{session_id}/reviews', json=[{"word_id": word_id, "correct": True} for word_id in range(1, 6)])
+
+  rows = lines(client.get('/export/reviews.ndjson').get_data())
+  assert [row['word_id'] for row in rows] == [1, 2, 3, 4, 5]
+  assert rows[0]['group_name'] == 'Core Verbs'
+
+  since = rows[1]['id']
+  assert [row['id'] for row in lines(client.get(f'/export/reviews.ndjson?since={since}').get_data())] == [row['id'] for row in rows[2:]]
+  assert client.get('/export/reviews.ndjson?since=-1').status_code == 400
+
+def test_export_gzip(client, session_id):
+  client.post(f'/study_sessions/{session_id}/reviews', json=[{"word_id": 1, "correct": False}])
+  response = client.get('/export/reviews.ndjson', headers={'Accept-Encoding': 'gzip'})
+  assert response.headers['Content-Encoding'] == 'gzip'
+  assert [row['correct'] for row in lines(gzip.decompress(response.get_data()))] == [0]
+
+def test_export_releases_its_connection_between_chunks(app, client, session_id, monkeypatch):
+  monkeypatch.setattr(routes.export, 'EXPORT_CHUNK_ROWS', 1)
+  client.post(f'/study_sessions/{session_id}/reviews', json=[{"word_id": 1, "correct": True}, {"word_id": 2, "correct": True}])
+
+  response = client.get('/export/reviews.ndjson', buffered=False)
+  chunks = iter(response.response)
+  assert json.loads(next(chunks))['word_id'] == 1
+  pool = app.db.pools()['read']
+  assert pool.idle.qsize() == pool.opened
+  assert json.loads(next(chunks))['word_id'] == 2
+  response.close()
@@ -0,0 +1,81 @@
+import pytest
+
+from app import create_app
+from lib.groups import MAX_MEMBERSHIP_BATCH
+
+def word_count(query, group_id):
+  stored = query('SELECT words_count FROM groups WHERE id = ?', (group_id,))[0][0]
+  assert stored == query('SELECT COUNT(*) FROM word_groups WHERE group_id = ?', (group_id,))[0][0]
+  return stored
+
+def test_add_and_remove_words(client, query):
+  before = word_count(query, 1)
+  # Words 61-63 are in group 2 only
+  response = client.post('/groups/1/words', json={"word_ids": [61, 62, 62, 1]})
+  assert response.status_code == 200
+  assert response.get_json() == {"group_id": 1, "added": 2, "word_count": before + 2}
+  assert word_count(query, 1) == before + 2
+
+  # Already members are ignored
+  assert client.post('/groups/1/words', json=[61, 62]).get_json()['added'] == 0
+
+  response = client.delete('/groups/1/words', json=[61, 62, 63])
+  assert response.get_json() == {"group_id": 1, "removed": 2, "word_count": before}
+  assert word_count(query, 1) == before
+  assert client.get('/groups/1').get_json()['word_count'] == before
+
+def test_added_words_keep_their_schedule(client, session_id, query):
+  client.post(f'/study_sessions/{session_id}/reviews', json=[{"word_id": 1, "correct": True}])
+  client.post('/groups/2/words', json=[1])
+  assert query('SELECT due_at FROM word_groups WHERE word_id = 1 AND group_id = 2') == \
+    query('SELECT due_at FROM word_schedule WHERE word_id = 1')
+
+@pytest.mark.parametrize('payload', [
+  None,
+  [],
+  {"word_ids": []},
+  {"word_ids": "1"},
+  [1, "2"],
+  [True],
+  list(range(1, MAX_MEMBERSHIP_BATCH + 2)),
+])
+def test_invalid_word_ids(client, payload):
+  response = client.post('/groups/1/words', json=payload)
+  assert response.status_code == 400
+  assert 'error' in response.get_json()
+
+def test_unknown_group_and_words(client, query):
+  before = word_count(query, 1)
+  assert client.post('/groups/999999/words', json=[1]).status_code == 404
+  assert client.delete('/groups/999999/words', json=[1]).status_code == 404
+
+  response = client.post('/groups/1/words', json=[61, 999999])
+  assert response.status_code == 404
+  assert response.get_json()['word_ids'] == [999999]
+  # Nothing is added when any word is missing
+  assert word_count(query, 1) == before
+
+  # Removing words that are not in the group is not an error
+  assert client.delete('/groups/1/words', json=[999999]).get_json()['removed'] == 0
+
+def test_triggers_keep_the_counter(app, query):
+  before = (word_count(query, 1), word_count(query, 2))
+  query('INSERT INTO word_groups (word_id, group_id) VALUES (61, 1)')
+  query('UPDATE word_groups SET group_id = 1 WHERE word_id = 62 AND group_id = 2')
+  query('DELETE FROM word_groups WHERE word_id = 1 AND group_id = 1')
+  assert (word_count(query, 1), word_count(query, 2)) == (before[0] + 1, before[1] - 1)
+
+def test_learner_requests_change_the_shared_groups(config, tmp_path):
+  app = create_app({**config, 'SHARD_DIRECTORY': str(tmp_path / 'learners')})
+  try:
+    client = app.test_client()
+    learner = {'X-Learner-Id': 'alice'}
+    before = client.get('/groups/1', headers=learner).get_json()['word_count']
+    response = client.post('/groups/1/words', json=[61], headers=learner)
+    assert response.status_code == 200
+    assert response.get_json()['word_count'] == before + 1
+    assert client.get('/groups/1', headers=learner).get_json()['word_count'] == before + 1
+    assert client.get('/groups/1', headers={'X-Learner-Id': 'bob'}).get_json()['word_count'] == before + 1
+    assert client.get('/groups/1').get_json()['word_count'] == before + 1
+  finally:
+    app.db.dispose()
@@ -0,0 +1,50 @@
+from lib.stats import MASTERY_MIN_ATTEMPTS, is_mastered
+
+def stats(client):
+  return client.get('/dashboard/stats').get_json()
+
+def review(client, session_id, word_id, correct, times=1):
+  response = client.post(f'/study_sessions/{session_id}/reviews', json=[{"word_id": word_id, "correct": correct}] * times)
+  assert response.status_code == 200
+
+def test_empty_history(client, drift):
+  assert stats(client) == {
+    "total_vocabulary": 123,
+    "total_words_studied": 0,
+    "mastered_words": 0,
+    "success_rate": 0,
+    "total_sessions": 0,
+    "active_groups": 0,
+    "current_streak": 0
+  }
+  assert drift() == []
+
+def test_reviews_update_the_summary(client, session_id, drift):
+  review(client, session_id, 1, True, times=3)
+  review(client, session_id, 2, False)
+  summary = stats(client)
+  assert summary['total_words_studied'] == 2
+  assert summary['success_rate'] == 0.75
+  assert summary['total_sessions'] == 1
+  assert drift() == []
+
+def test_mastery_is_gained_and_lost(client, session_id, query, drift):
+  review(client, session_id, 1, True, times=MASTERY_MIN_ATTEMPTS - 1)
+  assert stats(client)['mastered_words'] == 0
+  review(client, session_id, 1, True)
+  assert stats(client)['mastered_words'] == 1
+
+  # 5 of 7 correct is below the success rate
+  review(client, session_id, 1, False, times=2)
+  assert not is_mastered(MASTERY_MIN_ATTEMPTS + 2, MASTERY_MIN_ATTEMPTS)
+  assert stats(client)['mastered_words'] == 0
+  assert query('SELECT attempts, correct FROM word_stats WHERE word_id = 1') == [(MASTERY_MIN_ATTEMPTS + 2, MASTERY_MIN_ATTEMPTS)]
+  assert drift() == []
+
+def test_reset_clears_the_summary(client, session_id, query, drift):
+  review(client, session_id, 1, True, times=MASTERY_MIN_ATTEMPTS)
+  assert client.post('/api/study-sessions/reset').status_code == 200
+  summary = stats(client)
+  assert (summary['total_words_studied'], summary['mastered_words'], summary['total_sessions']) == (0, 0, 0)
+  assert query('SELECT COUNT(*) FROM word_stats') == [(0,)]
+  assert drift() == []
@@ -0,0 +1,85 @@
+import pytest
+
+from lib.pagination import Keyset, InvalidCursor, encode_cursor
+
+# Follow next_cursor from the first page to the last, returns every id seen
+def walk(client, path, key):
+  ids, cursor = [], None
+  while True:
+    response = client.get(path + (f'&cursor={cursor}' if cursor else ''))
+    assert response.status_code == 200
+    data = response.get_json()
+    ids.extend(item['id'] for item in data[key])
+    cursor = data['next_cursor']
+    if cursor is None:
+      return ids
+
+# Every id by the legacy page numbers
+def pages(client, path, key):
+  ids, page = [], 1
+  while True:
+    data = client.get(f'{path}&page={page}').get_json()
+    if not data[key]:
+      return ids
+    ids.extend(item['id'] for item in data[key])
+    page += 1
+
+@pytest.mark.parametrize('sort_by', ['kanji', 'romaji', 'english', 'correct_count'])
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_words_cursor_matches_pages(client, sort_by, order):
+  path = f'/words?sort_by={sort_by}&order={order}'
+  ids = walk(client, path, 'words')
+  assert ids == pages(client, path, 'words')
+  assert len(ids) == len(set(ids)) == 123
+
+def test_group_words_cursor_matches_pages(client):
+  path = '/groups/1/words?sort_by=romaji&order=desc'
+  ids = walk(client, path, 'words')
+  assert ids == pages(client, path, 'words')
+  assert len(ids) == 60
+
+def test_study_sessions_cursor(client):
+  for _ in range(12):
+    client.post('/study_sessions', json={'group_id': 1, 'study_activity_id': 1})
+  ids = walk(client, '/api/study-sessions?include_total=false', 'items')
+  assert sorted(ids, reverse=True) == ids
+  assert len(ids) == 12
+
+@pytest.mark.parametrize('per_page, expected', [('0', 1), ('-1', 1), ('x', 10), ('1000', 100)])
+def test_per_page_is_clamped(client, session_id, per_page, expected):
+  for path in ('/api/study-sessions', f'/api/study-sessions/{session_id}', '/api/study-activities/1/sessions'):
+    response = client.get(f'{path}?per_page={per_page}')
+    assert response.status_code == 200
+    assert response.get_json()['per_page'] == expected
+
+def test_cursor_page_has_no_page_number(client):
+  first = client.get('/words').get_json()
+  assert first['current_page'] == 1
+  second = client.get(f'/words?cursor={first["next_cursor"]}').get_json()
+  assert second['current_page'] is None
+  assert second['words'][0]['id'] not in {word['id'] for word in first['words']}
+
+def test_include_total_false(client):
+  data = client.get('/words?include_total=false').get_json()
+  assert data['total_words'] is None
+  assert data['total_pages'] is None
+  assert len(data['words']) == 50
+
+def test_invalid_cursor(client):
+  response = client.get('/words?cursor=not-a-cursor')
+  assert response.status_code == 400
+  assert response.get_json() == {"error": "Invalid cursor"}
+
+def test_cursor_for_another_sort(client):
+  cursor = client.get('/words?sort_by=kanji').get_json()['next_cursor']
+  response = client.get(f'/words?sort_by=english&cursor={cursor}')
+  assert response.status_code == 400
+  assert response.get_json() == {"error": "Cursor does not match sort_by and order"}
+
+def test_keyset_condition():
+  cursor = encode_cursor('kanji', 'desc', ['b', 7])
+  keyset = Keyset({'cursor': cursor}, 'kanji', 'desc', 'w.kanji', 'w.id', 10)
+  assert keyset.condition() == ('(w.kanji, w.id) < (?, ?)', ['b', 7])
+  assert keyset.limit_params() == [11, 0]
+  with pytest.raises(InvalidCursor):
+    Keyset({'cursor': cursor}, 'kanji', 'asc', 'w.kanji', 'w.id', 10)
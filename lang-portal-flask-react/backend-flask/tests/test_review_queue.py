@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from app import create_app
+from lib.review_queue import ReviewQueue, FlushTimeout
+
+@pytest.fixture
+def app(config):
+  app = create_app({**config, 'REVIEW_WRITE_BEHIND': True})
+  yield app
+  app.review_queue.close()
+  app.db.dispose()
+
+def test_flush_waits_for_the_writer(client, session_id, query):
+  client.post(f'/study_sessions/{session_id}/reviews', json=[{"word_id": 1, "correct": True}])
+  client.application.review_queue.flush()
+  assert query('SELECT COUNT(*) FROM word_review_items') == [(1,)]
+
+def test_flush_without_a_writer(app):
+  writer = ReviewQueue(app.db)
+  writer.flush()  # nothing queued
+  writer.put(1, [(1, 1, None)])
+  with pytest.raises(FlushTimeout, match='not running'):
+    writer.flush()
+
+def test_flush_times_out_behind_a_stuck_writer(app, monkeypatch):
+  release = threading.Event()
+  monkeypatch.setattr(ReviewQueue, 'commit', lambda self, connection, batch: release.wait())
+  writer = ReviewQueue(app.db).start()
+  try:
+    writer.put(1, [(1, 1, None)])
+    with pytest.raises(FlushTimeout, match='within 0.2s'):
+      writer.flush(timeout=0.2)
+  finally:
+    release.set()
+
+def test_dead_writer_fails_reset_and_end(client, session_id):
+  writer = client.application.review_queue
+  client.post(f'/study_sessions/{session_id}/reviews', json=[{"word_id": 1, "correct": True}])
+  writer.flush()
+  # Stop the writer, then queue behind it
+  writer.close()
+  writer.closed = False
+  writer.put(session_id, [(1, 1, None)])
+
+  for path in (f'/study_sessions/{session_id}/end', '/api/study-sessions/reset'):
+    response = client.post(path)
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert response.get_json() == {"error": "review writer is not running"}
@@ -0,0 +1,96 @@
+import pytest
+
+from lib.reviews import MAX_BATCH_SIZE
+
+def post_reviews(client, session_id, payload):
+  return client.post(f'/study_sessions/{session_id}/reviews', json=payload)
+
+def test_batch_is_recorded_and_folded_per_word(client, session_id, query):
+  reviews = [
+    {"word_id": 1, "correct": True},
+    {"word_id": 1, "correct": False},
+    {"word_id": 1, "correct": True},
+    {"word_id": 2, "correct": False},
+  ]
+  response = post_reviews(client, session_id, {"reviews": reviews})
+  assert response.status_code == 200
+  assert response.get_json() == {"message": "Reviews logged successfully", "count": 4}
+
+  assert query('SELECT COUNT(*) FROM word_review_items WHERE study_session_id = ?', (session_id,)) == [(4,)]
+  assert query('SELECT word_id, correct_count, wrong_count FROM word_reviews ORDER BY word_id') == [(1, 2, 1), (2, 0, 1)]
+  assert query('SELECT review_count, correct_count FROM study_sessions WHERE id = ?', (session_id,)) == [(4, 2)]
+
+  # A second batch adds to the same aggregate rows
+  assert post_reviews(client, session_id, [{"word_id": 2, "correct": True}]).status_code == 200
+  assert query('SELECT word_id, correct_count, wrong_count FROM word_reviews ORDER BY word_id') == [(1, 2, 1), (2, 1, 1)]
+
+def test_correct_accepts_zero_and_one(client, session_id, query):
+  assert post_reviews(client, session_id, [{"word_id": 1, "correct": 1}, {"word_id": 1, "correct": 0}]).status_code == 200
+  assert query('SELECT correct_count, wrong_count FROM word_reviews WHERE word_id = 1') == [(1, 1)]
+
+def test_last_reviewed_is_the_latest_review(client, session_id, query):
+  post_reviews(client, session_id, [
+    {"word_id": 1, "correct": True, "created_at": "2025-01-02T09:30:00+09:00"},
+    {"word_id": 1, "correct": True, "created_at": "2025-01-01T12:00:00Z"},
+    {"word_id": 2, "correct": True, "created_at": "2025-01-01T12:00:00Z"},
+    {"word_id": 2, "correct": True},
+  ])
+  # An older backfilled review does not move it back
+  post_reviews(client, session_id, [{"word_id": 1, "correct": True, "created_at": "2024-06-01T00:00:00Z"}])
+  assert query('SELECT last_reviewed FROM word_reviews WHERE word_id = 1') == [('2025-01-02 00:30:00',)]
+  # Now, in UTC, when one of the word's reviews has no created_at
+  last_reviewed = query('SELECT last_reviewed FROM word_reviews WHERE word_id = 2')[0][0]
+  assert last_reviewed > '2025-01-01 12:00:00'
+  assert last_reviewed == query("SELECT strftime('%Y-%m-%d %H:%M:%S', ?)", (last_reviewed,))[0][0]
+
+def test_created_at_is_normalized_to_utc(client, session_id, query):
+  response = post_reviews(client, session_id, [{"word_id": 3, "correct": True, "created_at": "2025-01-02T09:30:00+09:00"}])
+  assert response.status_code == 200
+  assert query('SELECT created_at FROM word_review_items WHERE word_id = 3') == [('2025-01-02 00:30:00',)]
+
+@pytest.mark.parametrize('payload, error', [
+  ([], 'a non-empty array of reviews is required'),
+  ({"reviews": "nope"}, 'a non-empty array of reviews is required'),
+  ([{"word_id": 1, "correct": True}] * (MAX_BATCH_SIZE + 1), f'at most {MAX_BATCH_SIZE} reviews can be logged per request'),
+  ([1], 'review 0 must be an object'),
+  ([{"word_id": 1, "correct": True}, {"word_id": 1}], 'review 1: word_id and correct fields are required'),
+  ([{"word_id": "1", "correct": True}], 'review 0: word_id must be an integer'),
+  ([{"word_id": True, "correct": True}], 'review 0: word_id must be an integer'),
+  ([{"word_id": 1, "correct": "false"}], 'review 0: correct must be a boolean'),
+  ([{"word_id": 1, "correct": 2}], 'review 0: correct must be a boolean'),
+  ([{"word_id": 1, "correct": True, "created_at": 5}], 'review 0: created_at must be an ISO 8601 string'),
+])
+def test_invalid_batch(client, session_id, query, payload, error):
+  response = post_reviews(client, session_id, payload)
+  assert response.status_code == 400
+  assert response.get_json() == {"error": error}
+  assert query('SELECT COUNT(*) FROM word_review_items') == [(0,)]
+
+def test_unknown_words_reject_the_whole_batch(client, session_id, query):
+  response = post_reviews(client, session_id, [
+    {"word_id": 1, "correct": True},
+    {"word_id": 99999, "correct": True},
+    {"word_id": 88888, "correct": False},
+  ])
+  assert response.status_code == 404
+  assert response.get_json() == {"error": "Word not found", "word_ids": [88888, 99999]}
+  assert query('SELECT COUNT(*) FROM word_review_items') == [(0,)]
+  assert query('SELECT COUNT(*) FROM word_reviews') == [(0,)]
+
+def test_unknown_session(client):
+  response = post_reviews(client, 12345, [{"word_id": 1, "correct": True}])
+  assert response.status_code == 404
+  assert response.get_json() == {"error": "Study session not found"}
+
+def test_ended_session(client, session_id):
+  assert client.post(f'/study_sessions/{session_id}/end').status_code == 200
+  response = post_reviews(client, session_id, [{"word_id": 1, "correct": True}])
+  assert response.status_code == 409
+
+def test_single_review_route(client, session_id, query):
+  response = client.post(f'/study_sessions/{session_id}/review', json={"word_id": 5, "correct": False})
+  assert response.status_code == 200
+  assert query('SELECT word_id, correct_count, wrong_count FROM word_reviews') == [(5, 0, 1)]
+  assert client.post(f'/study_sessions/{session_id}/review', json={"word_id": 99999, "correct": True}).status_code == 404
+  assert client.post(f'/study_sessions/{session_id}/review', json={"word_id": 5}).status_code == 400
+  assert client.post(f'/study_sessions/{session_id}/review', json={"word_id": 5, "correct": "false"}).status_code == 400
@@ -0,0 +1,20 @@
+import pytest
+
+def ids(client, q):
+  response = client.get('/words/search', query_string={'q': q})
+  assert response.status_code == 200
+  return [word['id'] for word in response.get_json()['words']]
+
+# Short queries are prefix matches, longer ones trigram substring matches;
+# both ignore ASCII case
+@pytest.mark.parametrize('q', ['ik', 'iku', 'harau', 'to pay'])
+def test_search_ignores_case(client, q):
+  found = ids(client, q)
+  assert found
+  assert ids(client, q.upper()) == found
+
+def test_exact_match_first(client):
+  assert ids(client, 'IKU')[0] == ids(client, 'iku')[0] == 2
+
+def test_query_is_required(client):
+  assert client.get('/words/search?q=%20').status_code == 400
@@ -0,0 +1,61 @@
+from app import create_app
+
+def rollup(query, session_id):
+  return query('SELECT review_count, correct_count, last_activity_at FROM study_sessions WHERE id = ?', (session_id,))[0]
+
+def test_reviews_fold_into_the_session(client, session_id, query, drift):
+  assert client.post(f'/study_sessions/{session_id}/review', json={"word_id": 1, "correct": True}).status_code == 200
+  assert client.post(f'/study_sessions/{session_id}/reviews', json=[
+    {"word_id": 2, "correct": False},
+    {"word_id": 3, "correct": True, "created_at": "2026-01-02T03:04:05+00:00"},
+  ]).status_code == 200
+
+  latest = query('SELECT MAX(created_at) FROM word_review_items WHERE study_session_id = ?', (session_id,))[0][0]
+  assert rollup(query, session_id) == (3, 2, latest)
+
+  session = client.get(f'/api/study-sessions/{session_id}').get_json()['session']
+  assert (session['review_items_count'], session['correct_count'], session['end_time']) == (3, 2, latest)
+  assert drift() == []
+
+def test_end_seals_the_aggregates(client, session_id, drift):
+  client.post(f'/study_sessions/{session_id}/reviews', json=[
+    {"word_id": 1, "correct": True},
+    {"word_id": 1, "correct": False},
+  ])
+  response = client.post(f'/study_sessions/{session_id}/end')
+  assert response.status_code == 200
+  ended = response.get_json()
+  assert (ended['review_items_count'], ended['correct_count'], ended['wrong_count']) == (2, 1, 1)
+  assert ended['end_time'] is not None
+
+  assert client.post(f'/study_sessions/{session_id}/end').status_code == 409
+  assert client.post(f'/study_sessions/{session_id}/reviews', json=[{"word_id": 1, "correct": True}]).status_code == 409
+  assert client.post('/study_sessions/999999/end').status_code == 404
+  assert drift() == []
+
+def test_empty_session_has_no_activity(client, session_id, query, drift):
+  client.post(f'/study_sessions/{session_id}/end')
+  assert rollup(query, session_id) == (0, 0, None)
+  assert drift() == []
+
+def test_drift_is_reported(client, session_id, query, drift):
+  client.post(f'/study_sessions/{session_id}/reviews', json=[{"word_id": 1, "correct": True}])
+  query('UPDATE study_sessions SET review_count = 5 WHERE id = ?', (session_id,))
+  query('COMMIT')
+  assert [line.split(':')[0] for line in drift()] == [f'study_sessions[{session_id}]']
+
+def test_write_behind_rollups(config):
+  app = create_app({**config, 'REVIEW_WRITE_BEHIND': True})
+  try:
+    client = app.test_client()
+    session_id = client.post('/study_sessions', json={'group_id': 1, 'study_activity_id': 1}).get_json()['session_id']
+    for word_id in (1, 2, 3):
+      response = client.post(f'/study_sessions/{session_id}/reviews', json=[{"word_id": word_id, "correct": word_id != 2}])
+      assert response.status_code == 202
+
+    # Ending a session waits for its queued reviews
+    ended = client.post(f'/study_sessions/{session_id}/end').get_json()
+    assert (ended['review_items_count'], ended['correct_count']) == (3, 2)
+  finally:
+    app.review_queue.close()
+    app.db.dispose()
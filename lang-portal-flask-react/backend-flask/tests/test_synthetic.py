@@ -0,0 +1,25 @@
+from lib.synthetic import generate
+
+def run_generate(app, **kwargs):
+  with app.db.connection() as connection:
+    return generate(connection, words=200, groups=4, sessions=100, reviews=3000, days=30, verbose=False, **kwargs)
+
+def test_generated_statistics_do_not_drift(app, query, drift):
+  run_generate(app)
+  assert query('SELECT COUNT(*) FROM word_review_items') == [(3000,)]
+  assert query('SELECT COUNT(*) FROM word_schedule')[0][0] > 0
+  assert query('SELECT COUNT(*) FROM word_groups WHERE due_at IS NOT NULL')[0][0] > 0
+  assert drift() == []
+
+def test_generating_again_extends_the_schedule(app, query, drift):
+  run_generate(app)
+  run_generate(app, seed=1)
+  assert query('SELECT COUNT(*) FROM word_review_items') == [(6000,)]
+  assert drift() == []
+
+def test_dense_reviews_match_the_replay(app, query, drift):
+  # Hundreds of reviews per word: the ease bottoms out and runs get long
+  with app.db.connection() as connection:
+    generate(connection, words=10, groups=1, sessions=50, reviews=4000, days=30, verbose=False)
+  assert query('SELECT MIN(ease) FROM word_schedule') == [(1.3,)]
+  assert drift() == []
@@ -1,7 +1,7 @@
 import { useState, useEffect } from 'react'
 import { Link } from 'react-router-dom'
 import { BookOpen, Trophy, Clock, ArrowRight, Activity } from 'lucide-react'
-import { fetchRecentStudySession, fetchStudyStats, type StudyStats, type RecentSession } from '@/services/api'
+import { fetchDashboard, type StudyStats, type RecentSession } from '@/services/api'
 
 interface DashboardCardProps {
   title: string
@@ -30,10 +30,7 @@ export default function Dashboard() {
   useEffect(() => {
     const loadDashboardData = async () => {
       try {
-        const [sessionData, statsData] = await Promise.all([
-          fetchRecentStudySession(),
-          fetchStudyStats()
-        ])
+        const { recentSession: sessionData, stats: statsData } = await fetchDashboard()
         setRecentSession(sessionData)
         setStats(statsData)
       } catch (error) {
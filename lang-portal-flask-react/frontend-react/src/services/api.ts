@@ -253,3 +253,34 @@ export const fetchStudyStats = async (): Promise<StudyStats> => {
   }
   return response.json();
 };
+
+// Run several read routes in one round trip through POST /batch
+interface BatchResponse {
+  path: string;
+  status: number;
+  body: any;
+}
+
+export const fetchBatch = async (paths: string[]): Promise<BatchResponse[]> => {
+  const response = await fetch(`${API_BASE_URL}/batch`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+    body: JSON.stringify({ requests: paths }),
+  });
+  if (!response.ok) {
+    throw new Error('Failed to fetch batch');
+  }
+  const data = await response.json();
+  return data.responses;
+};
+
+// Everything the dashboard shows on first paint, in one request
+export const fetchDashboard = async (): Promise<{ recentSession: RecentSession | null; stats: StudyStats }> => {
+  const [recentSession, stats] = await fetchBatch(['/dashboard/recent-session', '/dashboard/stats']);
+  if (recentSession.status !== 200 || stats.status !== 200) {
+    throw new Error('Failed to fetch dashboard');
+  }
+  return { recentSession: recentSession.body, stats: stats.body };
+};
@@ -39,17 +39,20 @@ class StudyService:
             .distinct(Group.id)\
             .count()
         
-        # Calculate study streak
+        # Calculate study streak from the distinct study dates, newest first,
+        # in a single query rather than one query per day
         today = datetime.utcnow().date()
         streak = 0
         current_date = today
         
-        while True:
-            session_exists = StudySession.query\
-                .filter(func.date(StudySession.created_at) == current_date)\
-                .first() is not None
-            
-            if not session_exists:
+        study_dates = StudySession.query\
+            .with_entities(func.date(StudySession.created_at))\
+            .filter(func.date(StudySession.created_at) <= today.isoformat())\
+            .distinct()\
+            .order_by(func.date(StudySession.created_at).desc())
+        
+        for (study_date,) in study_dates:
+            if study_date != current_date.isoformat():
                 break
                 
             streak += 1